@@ -4,9 +4,6 @@
 import os
 import datetime
 import asyncio
-import uvicorn
-import time
-import json
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -16,40 +13,35 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import APIKeyHeader
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
 from copilotkit import CopilotKitRemoteEndpoint, LangGraphAgent
-from agent.graph.graph import app as agent_app
-from agent.graph.state import GraphState
-from agent.graph.models.config import with_concurrency_limit
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from fastapi.responses import JSONResponse
-from collections import defaultdict
-from agent.graph.utils.api_utils import (
-    _sanitize_sensitive_data,
-    extract_properties_and_update_state
-)
-
-# Configure root logger
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
-    force=True
-)
-
-# Configure specific loggers
-logging.getLogger("graph.graph").setLevel(logging.DEBUG)
-logging.getLogger("uvicorn").setLevel(logging.DEBUG)
-logging.getLogger("fastapi").setLevel(logging.DEBUG)
-logging.getLogger("copilotkit").setLevel(logging.DEBUG)
+from agent.graph.graph import app as agent_app, checkpointer
+from agent.graph.models.config import USE_OLLAMA
+from agent.graph.utils.circuit_breaker import get_breaker_states
+from agent.graph.utils.single_flight import get_single_flight_stats
+from agent.graph.utils.redis_client import close_redis_clients
+from agent.graph.utils.rate_limiter import get_rate_limiter
+from agent.graph.utils.middleware import AdmissionMiddleware, RequestContextMiddleware, RequestGuardMiddleware
+from agent.graph.utils.admission import get_admission_stats
+from agent.graph.utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_ENABLED, register_runtime_collectors, render_metrics, start_metrics_flush, stop_metrics_flush
+from agent.graph.utils.request_body import ParsedBodyRoute
+from agent.graph.utils.logging_setup import setup_logging
+from fastapi.responses import JSONResponse, Response
+from agent.graph.utils.api_utils import cost_tracker, _sanitize_sensitive_data
+from agent.graph.utils.prompt_registry import prompt_registry
+from agent.graph.utils.warmup import WARMUP_ON_STARTUP, run_warmup, get_last_warmup
+
+# Route all logging through the non-blocking queue, with levels, sampling and format from the environment
+setup_logging()
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 logger.info("Initializing FastAPI application for Vercel...")
 
-# Create FastAPI app
+# Create FastAPI app; its routes get the request body the middleware already parsed
 app = FastAPI()
+app.router.route_class = ParsedBodyRoute
 
 # Debug log the app instance
-logger.info(f"FastAPI app instance: {id(app)} at {app}")
+logger.debug("FastAPI app instance: %s at %s", id(app), app)
 
 # Security Configuration
 MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", "1048576"))  # 1MB
@@ -60,83 +52,18 @@ MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))
 CIRCUIT_BREAKER_THRESHOLD = float(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "0.8"))  # 80% error rate
 CIRCUIT_BREAKER_RESET = int(os.getenv("CIRCUIT_BREAKER_RESET", "60"))
 
-# Enhanced Rate Limit Middleware
-class EnhancedRateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self.requests = defaultdict(list)
-        self.error_counts = defaultdict(int)
-        self.circuit_breaker_state = defaultdict(lambda: {"open": False, "last_failure": 0})
-        self.lock = asyncio.Lock()
-
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
-        current_time = time.time()
-
-        # Check circuit breaker
-        async with self.lock:
-            if self.circuit_breaker_state[client_ip]["open"]:
-                if current_time - self.circuit_breaker_state[client_ip]["last_failure"] < CIRCUIT_BREAKER_RESET:
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Service temporarily unavailable due to high error rate"
-                    )
-                else:
-                    self.circuit_breaker_state[client_ip]["open"] = False
-                    self.error_counts[client_ip] = 0
-
-        # Check request size
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > MAX_REQUEST_SIZE:
-            raise HTTPException(
-                status_code=413,
-                detail="Request too large"
-            )
+# Admit agent runs through a bounded priority queue; overload gets 503 with Retry-After
+app.add_middleware(AdmissionMiddleware)
 
-        # Clean up old requests
-        async with self.lock:
-            self.requests[client_ip] = [
-                t for t in self.requests[client_ip]
-                if current_time - t < RATE_LIMIT_WINDOW
-            ]
-
-            # Check rate limit
-            if len(self.requests[client_ip]) >= RATE_LIMIT_REQUESTS:
-                raise HTTPException(
-                    status_code=429,
-                    detail="Too many requests"
-                )
-
-            # Add current request
-            self.requests[client_ip].append(current_time)
-
-        try:
-            # Add timeout to request handling
-            response = await asyncio.wait_for(call_next(request), timeout=REQUEST_TIMEOUT)
-            
-            # Update circuit breaker on success
-            async with self.lock:
-                if self.error_counts[client_ip] > 0:
-                    self.error_counts[client_ip] = max(0, self.error_counts[client_ip] - 1)
-
-            return response
-
-        except asyncio.TimeoutError:
-            raise HTTPException(
-                status_code=504,
-                detail="Request timeout"
-            )
-        except Exception as e:
-            # Update error counts and circuit breaker
-            async with self.lock:
-                self.error_counts[client_ip] += 1
-                if self.error_counts[client_ip] / RATE_LIMIT_REQUESTS > CIRCUIT_BREAKER_THRESHOLD:
-                    self.circuit_breaker_state[client_ip]["open"] = True
-                    self.circuit_breaker_state[client_ip]["last_failure"] = current_time
-            raise
-
-# Add enhanced rate limiting middleware
-app.add_middleware(EnhancedRateLimitMiddleware)
+# Guard requests: per-client circuit breaker, size and rate limits, per-route deadlines
+app.add_middleware(
+    RequestGuardMiddleware,
+    rate_limiter=get_rate_limiter(RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW),
+    max_request_size=MAX_REQUEST_SIZE,
+    default_timeout=REQUEST_TIMEOUT,
+    circuit_breaker_threshold=CIRCUIT_BREAKER_THRESHOLD,
+    circuit_breaker_reset=CIRCUIT_BREAKER_RESET,
+)
 
 # API Key security
 API_KEY_HEADER = APIKeyHeader(name="X-API-Key", auto_error=False)
@@ -166,39 +93,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST"],
     allow_headers=["Content-Type", "Authorization", "X-API-Key"],
-    expose_headers=["Content-Length", "X-Request-ID"],
+    expose_headers=["Content-Length", "X-Request-ID", "Server-Timing"],
     max_age=3600,
 )
 
 # Add request logging middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Middleware to log requests and responses."""
-    # Log request details
-    logger.info(f"Request: {request.method} {request.url.path}")
-    logger.info(f"Headers: {dict(request.headers)}")
-    
-    # Get request body if it exists
-    try:
-        body = await request.json()
-        # Sanitize sensitive data before logging
-        sanitized_body = _sanitize_sensitive_data(body)
-        logger.info(f"Request body: {sanitized_body}")
-        
-        # Extract user_id and update state
-        updated_body = extract_properties_and_update_state(body)
-        # Update the request with the modified body
-        request._body = json.dumps(updated_body).encode()
-    except Exception as e:
-        logger.warning(f"Could not parse request body: {e}")
-    
-    # Process the request
-    response = await call_next(request)
-    
-    # Log response details
-    logger.info(f"Response status: {response.status_code}")
-    
-    return response
+app.add_middleware(RequestContextMiddleware, max_body_size=MAX_REQUEST_SIZE)
 
 # Create SDK instance
 sdk = CopilotKitRemoteEndpoint(
@@ -221,55 +121,86 @@ sdk = CopilotKitRemoteEndpoint(
 
 add_fastapi_endpoint(app, sdk, "/api/copilotkitagent")
 
+@app.on_event("startup")
+async def start_usage_flush():
+    """Start writing usage accounting to disk in the background."""
+    cost_tracker.start_background_flush()
+
+@app.on_event("shutdown")
+async def stop_usage_flush():
+    """Write out the usage recorded since the last background flush."""
+    await cost_tracker.stop_background_flush()
+
+@app.on_event("startup")
+async def start_checkpoint_flush():
+    """Start persisting write-behind checkpoints in the background."""
+    if hasattr(checkpointer, "start_background_flush"):
+        checkpointer.start_background_flush()
+
+@app.on_event("shutdown")
+async def stop_checkpoint_flush():
+    """Persist every checkpoint still buffered before the worker exits."""
+    if hasattr(checkpointer, "stop_background_flush"):
+        await checkpointer.stop_background_flush()
+
+@app.on_event("startup")
+async def start_checkpoint_compaction():
+    """Start trimming old checkpoints and intermediate writes in the background."""
+    if hasattr(checkpointer, "start_background_compaction"):
+        checkpointer.start_background_compaction()
+
+@app.on_event("shutdown")
+async def stop_checkpoint_compaction():
+    """Stop the background checkpoint compaction."""
+    if hasattr(checkpointer, "stop_background_compaction"):
+        await checkpointer.stop_background_compaction()
+
+@app.on_event("startup")
+async def start_metrics_sharing():
+    """Start sharing this worker's metrics with the other workers for /metrics."""
+    if METRICS_ENABLED:
+        start_metrics_flush()
+
+@app.on_event("shutdown")
+async def stop_metrics_sharing():
+    """Leave this worker's final counts for the other workers to report."""
+    if METRICS_ENABLED:
+        await asyncio.to_thread(stop_metrics_flush)
+
+@app.on_event("shutdown")
+async def close_redis():
+    """Close the shared Redis connection pools."""
+    await close_redis_clients()
+
+@app.on_event("startup")
+async def warm_up_worker():
+    """Check Ollama capacity settings and warm the worker up before serving traffic."""
+    if USE_OLLAMA:
+        from agent.graph.models.ollama_preload import check_ollama_capacity
+        check_ollama_capacity()
+    if WARMUP_ON_STARTUP:
+        await run_warmup()
+
 # Store the last warm-up time in memory (will reset on cold start)
 last_warmup_time = 0
 WARMUP_INTERVAL = 600 # 10 minutes
 
-async def warmup_function():
-    """Warm up the model and graph by making a lightweight request."""
-    try:
-        # Create a minimal state for warm-up
-        warmup_state = GraphState(
-            query="print: please ask me a question",
-            documents=[],
-            messages=[],
-            user_id="test",
-            language="python",
-            comments="",
-            current_node="",
-            rewritten_query="print: please ask me a question",
-            retry_count=0,
-            framework="",
-            pass_summarize=False,
-            summarized=False
-
-        )
-        
-        # Run a minimal graph iteration with concurrency limit
-        result = await with_concurrency_limit(agent_app.ainvoke, warmup_state)
-        
-        logger.info("Warm-up successful. Result: %s", result)
-        return True
-    except Exception as e:
-        logger.error(f"Warm-up failed: {str(e)}")
-        return False
-
 @app.get("/api/warmup")
 async def warmup():
-    """Endpoint to warm up the serverless function."""
+    """Endpoint to warm up the serverless function without running the graph."""
     global last_warmup_time
     current_time = asyncio.get_event_loop().time()
     
     # Only warm up if enough time has passed since last warm-up
     if current_time - last_warmup_time < WARMUP_INTERVAL:
-        return {"status": "already_warm", "last_warmup": last_warmup_time}
+        return {"status": "already_warm", "last_warmup": last_warmup_time, "report": get_last_warmup()}
     
-    success = await warmup_function()
-    if success:
+    report = await run_warmup()
+    if report["ok"]:
         last_warmup_time = current_time
-        return {"status": "warmed_up", "timestamp": last_warmup_time}
+        return {"status": "warmed_up", "timestamp": last_warmup_time, "report": report}
     else:
-        raise HTTPException(status_code=500, detail="Warm-up failed")
+        raise HTTPException(status_code=500, detail={"message": "Warm-up failed", "report": report})
 
 # Health check endpoint for Vercel
 @app.get("/api/health")
@@ -279,9 +210,45 @@ async def health_check():
     return {
         "status": "ok",
         "environment": os.getenv("ENVIRONMENT", "production"),
-        "timestamp": datetime.datetime.now().isoformat()
+        "timestamp": datetime.datetime.now().isoformat(),
+        "providers": get_breaker_states(),
+        "single_flight": get_single_flight_stats(),
+        "admission": get_admission_stats(),
+        "prompts": prompt_registry.get_versions(),
+        "checkpointer": checkpointer.get_stats() if hasattr(checkpointer, "get_stats") else {}
+    }
+
+# Prometheus metrics, merged across gunicorn workers
+register_runtime_collectors(checkpointer)
+
+@app.get("/metrics")
+async def metrics():
+    """Metrics of every worker in the Prometheus text format.
+
+    Under gunicorn counters and histograms are summed over the workers and
+    gauges carry a worker label; see agent/graph/utils/metrics.py.
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+# Usage accounting endpoints
+@app.get("/api/usage")
+async def usage_summary(limit: int = 20, api_key: str = Depends(verify_api_key)):
+    """Get usage totals per component and the usage of the most recent requests."""
+    return {
+        **cost_tracker.get_usage_summary(),
+        "recent_requests": cost_tracker.get_recent_requests(limit),
     }
 
+@app.get("/api/usage/{request_id}")
+async def request_usage(request_id: str, api_key: str = Depends(verify_api_key)):
+    """Get the usage of one request, by the X-Request-ID returned with its response."""
+    usage = cost_tracker.get_request_usage(request_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="Unknown request id")
+    return usage
+
 # Add conversation history endpoint
 @app.post("/api/conversation")
 async def save_conversation(
@@ -299,8 +266,9 @@ async def save_conversation(
     try:
         data = await request.json()
 
-        # Log the request data
-        logger.info(f"Conversation save request received: {data}")
+        # Sanitizing walks the whole body, so only do it when the log line is emitted
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Conversation save request received: %s", _sanitize_sensitive_data(data))
         
         # Import database utils
         from agent.graph.utils.firebase_utils import handle_conversation_history_request
@@ -354,36 +322,6 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", "8000"))
     logger.info(f"Starting server on port {port}")
     
-    # Configure uvicorn logging
-    log_config = uvicorn.config.LOGGING_CONFIG
-    log_config["formatters"]["default"]["fmt"] = "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s"
-    log_config["formatters"]["access"]["fmt"] = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    
-    # Add our graph logger to uvicorn's config
-    log_config["loggers"]["graph.graph"] = {
-        "handlers": ["default"],
-        "level": "DEBUG",
-        "propagate": False
-    }
-    
-    # Add more loggers to uvicorn's config
-    log_config["loggers"]["uvicorn"] = {
-        "handlers": ["default"],
-        "level": "DEBUG",
-        "propagate": False
-    }
-    
-    log_config["loggers"]["fastapi"] = {
-        "handlers": ["default"],
-        "level": "DEBUG",
-        "propagate": False
-    }
-    
-    log_config["loggers"]["copilotkit"] = {
-        "handlers": ["default"],
-        "level": "DEBUG",
-        "propagate": False
-    }
-    
-    logger.info("Starting uvicorn server with logging configuration")
-    uvicorn.run(app, host="0.0.0.0", port=port, log_config=log_config) 
\ No newline at end of file
+    # Logging is already set up; uvicorn's loggers propagate to the queue
+    logger.info("Starting uvicorn server")
+    uvicorn.run(app, host="0.0.0.0", port=port, log_config=None) 
\ No newline at end of file
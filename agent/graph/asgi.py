@@ -5,12 +5,10 @@ This module exports the FastAPI application for ASGI servers like Uvicorn, Hyper
 
 import logging
 from agent.graph.app import app
+from agent.graph.utils.logging_setup import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-)
+# Configure logging (a no-op if the app already did)
+setup_logging()
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
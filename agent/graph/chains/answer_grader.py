@@ -1,7 +1,8 @@
 from langchain_core.prompts.chat import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_core.runnables import RunnableSequence
+from langchain_core.runnables import Runnable
 from agent.graph.models.answer_grader import llm
+from agent.graph.utils.prompt_registry import register_prompt
 from agent.graph.utils.timeout import timeout
 import json
 
@@ -53,7 +54,8 @@ def grade_answer(query: str, answer: str) -> GradeAnswer:
     return answer_grader.invoke({"query": query, "answer": answer})
 
 # Create the chain with parsing
-answer_grader: RunnableSequence = answer_prompt | llm | parse_answer
+answer_grader_prompt = register_prompt("answer_grader_prompt", answer_prompt)
+answer_grader: Runnable = (answer_grader_prompt.template | llm | parse_answer).with_config(answer_grader_prompt.run_config())
 answer_grader.with_fallbacks(
     [answer_grader]
 )
@@ -1,7 +1,8 @@
 from langchain_core.prompts.chat import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_core.runnables import RunnableSequence
+from langchain_core.runnables import Runnable
 from agent.graph.models.hallucinate_grader import llm
+from agent.graph.utils.prompt_registry import register_prompt
 from agent.graph.utils.timeout import timeout
 import json
 
@@ -61,7 +62,8 @@ def grade_hallucinations(documents: str, generation: str) -> GradeHallucinations
     return hallucination_grader.invoke({"documents": documents, "generation": generation})
 
 # Create the chain with parsing
-hallucination_grader: RunnableSequence = hallucination_prompt | llm | parse_hallucination
+hallucination_grader_prompt = register_prompt("hallucination_grader_prompt", hallucination_prompt)
+hallucination_grader: Runnable = (hallucination_grader_prompt.template | llm | parse_hallucination).with_config(hallucination_grader_prompt.run_config())
 hallucination_grader.with_fallbacks(
     [hallucination_grader]
 )
\ No newline at end of file
@@ -3,6 +3,7 @@ from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from agent.graph.models.router import llm
+from agent.graph.utils.prompt_registry import register_prompt
 from functools import lru_cache
 
 class LanguageRoute(BaseModel):
@@ -39,7 +40,8 @@ route_prompt = ChatPromptTemplate.from_messages([
 
 # Create the chain with format instructions
 # language_router = route_prompt.partial(format_instructions=parser.get_format_instructions()) | llm | parser
-language_router = route_prompt | llm | parser
+language_router_prompt = register_prompt("language_router_prompt", route_prompt)
+language_router = (language_router_prompt.template | llm | parser).with_config(language_router_prompt.run_config())
 
 @lru_cache(maxsize=1000)
 def get_language_route(query: str) -> LanguageRoute:
@@ -3,6 +3,7 @@ from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from agent.graph.models.router import llm
+from agent.graph.utils.prompt_registry import register_prompt
 
 class RouteQuery(BaseModel):
     """Route a user query to a vectorstore or websearch"""
@@ -36,4 +37,5 @@ route_prompt = ChatPromptTemplate.from_messages([
 
 # Create the chain with format instructions
 # query_router = route_prompt.partial(format_instructions=parser.get_format_instructions()) | llm | parser
-query_router = route_prompt | llm | parser
\ No newline at end of file
+query_router_prompt = register_prompt("query_router_prompt", route_prompt)
+query_router = (query_router_prompt.template | llm | parser).with_config(query_router_prompt.run_config())
\ No newline at end of file
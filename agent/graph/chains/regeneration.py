@@ -1,45 +1,43 @@
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts.chat import ChatPromptTemplate
 from agent.graph.models.generator import llm
-from langsmith import Client
-import os
+from agent.graph.utils.prompt_registry import register_prompt
 import dotenv
-dotenv.load_dotenv()
+import logging
+logger = logging.getLogger(__name__)
 
-client = Client(api_key=os.getenv("LANGSMITH_API_KEY"))
+dotenv.load_dotenv()
 
-try:
-    regeneration_prompt = client.pull_prompt("regeneration_prompt")
-except Exception as e:
-    print("Error pulling prompt from Langsmith")
-    print(e)
+# Used when the prompt snapshot has no version of the LangSmith prompt
+system = """
+    You are a master coder who is very good at coding {extra_info}.
 
-    system = """
-        You are a master coder who is very good at coding {extra_info}.
+    You are provided with the following set of technical documents:
 
-        You are provided with the following set of technical documents:
+    {documents}.
 
-        {documents}.
+    You are also given the previous generation: 
+    
+    {generation}.
 
-        You are also given the previous generation: 
-        
-        {generation}.
+    You are also given comments on the previous generation: 
+    
+    {comments}.
 
-        You are also given comments on the previous generation: 
-        
-        {comments}.
+    Please help revise or improve the previous generation according to the comments 
+    to better address the user's query. The revised/improved answer must still refer
+    to the provided documents.
+    Keep your code snippets to 100 lines or less.
+    Keep your comments or explanations to 100 words or less.
+    """
+fallback_regeneration_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", system),
+        ("human", "Query: {query}"),
+    ]
+)
 
-        Please help revise or improve the previous generation according to the comments 
-        to better address the user's query. The revised/improved answer must still refer
-        to the provided documents.
-        Keep your code snippets to 100 lines or less.
-        Keep your comments or explanations to 100 words or less.
-        """
-    regeneration_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system),
-            ("human", "Query: {query}"),
-        ]
-    )
+# The snapshotted LangSmith prompt if there is one; never pulled at runtime
+regeneration_prompt = register_prompt("regeneration_prompt", fallback_regeneration_prompt)
 
-regeneration_chain = regeneration_prompt | llm | StrOutputParser()
+regeneration_chain = (regeneration_prompt.template | llm | StrOutputParser()).with_config(regeneration_prompt.run_config())
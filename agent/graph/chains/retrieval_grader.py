@@ -1,6 +1,7 @@
 from langchain_core.prompts.chat import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from agent.graph.models.retrieval_grader import llm
+from agent.graph.utils.prompt_registry import register_prompt
 from agent.graph.utils.timeout import timeout
 from langchain_core.output_parsers import PydanticOutputParser
 
@@ -29,7 +30,8 @@ grade_prompt = ChatPromptTemplate.from_messages(
 )
 
 # Use the traditional approach
-retrieval_grader = grade_prompt.partial(format_instructions=parser.get_format_instructions()) | llm | parser
+retrieval_grader_prompt = register_prompt("retrieval_grader_prompt", grade_prompt.partial(format_instructions=parser.get_format_instructions()))
+retrieval_grader = (retrieval_grader_prompt.template | llm | parser).with_config(retrieval_grader_prompt.run_config())
 
 @timeout(10)  # 10 second timeout for document grading
 def grade_single_document(query: str, document: str) -> GradeDocuments:
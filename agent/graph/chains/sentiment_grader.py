@@ -1,7 +1,8 @@
 from langchain_core.prompts.chat import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_core.runnables import RunnableSequence
+from langchain_core.runnables import Runnable
 from agent.graph.models.sentiment_grader import llm
+from agent.graph.utils.prompt_registry import register_prompt
 import json
 
 class GradeSentiment(BaseModel):
@@ -47,7 +48,8 @@ sentiment_prompt = ChatPromptTemplate.from_messages(
 )
 
 # Create the chain with parsing
-sentiment_grader: RunnableSequence = sentiment_prompt | llm | parse_sentiment
+sentiment_grader_prompt = register_prompt("sentiment_grader_prompt", sentiment_prompt)
+sentiment_grader: Runnable = (sentiment_grader_prompt.template | llm | parse_sentiment).with_config(sentiment_grader_prompt.run_config())
 sentiment_grader.with_fallbacks(
     [sentiment_grader]
 )
@@ -1,6 +1,7 @@
 from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.prompts.chat import ChatPromptTemplate
+from langchain_core.prompts.chat import ChatPromptTemplate, MessagesPlaceholder
 from agent.graph.models.summarizer import llm
+from agent.graph.utils.prompt_registry import register_prompt
 from pydantic import BaseModel, Field
 
 class Summary(BaseModel):
@@ -26,17 +27,39 @@ RULES:
 output_parser = PydanticOutputParser(pydantic_object=Summary)
 format_instructions = output_parser.get_format_instructions()
 
+# Compiled once with the format instructions applied; the conversation is passed
+# as messages rather than templated, so braces in user content are left alone
+summary_prompt = register_prompt(
+    "summary_prompt",
+    ChatPromptTemplate.from_messages(
+        [
+            ("system", system),
+            MessagesPlaceholder("messages"),
+        ]
+    ).partial(format_instructions=format_instructions),
+)
+
 # Create the chain with parsing
 summary_chain = llm | output_parser
 
+def _render_summary_prompt(messages, instructions):
+    """Render the summary prompt for a conversation of role/content dicts or messages."""
+    conversation = []
+    for message in messages:
+        if isinstance(message, dict):
+            conversation.append((message["role"], message["content"]))
+        else:
+            conversation.append((message.role, message.content))
+    return summary_prompt.format_messages(important_instructions=instructions, messages=conversation)
+
 def invoke_summary_chain(messages, instructions):
-    summary_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system),
-            *[(message.role, message.content) for message in messages]
-        ]
-    ).partial(format_instructions=format_instructions, important_instructions=instructions)
-    
-    final_chain = summary_prompt | summary_chain
+    return summary_chain.invoke(
+        _render_summary_prompt(messages, instructions),
+        config=summary_prompt.run_config(),
+    )
 
-    return final_chain.invoke()
+async def ainvoke_summary_chain(messages, instructions):
+    return await summary_chain.ainvoke(
+        _render_summary_prompt(messages, instructions),
+        config=summary_prompt.run_config(),
+    )
@@ -3,6 +3,7 @@ from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from agent.graph.models.router import llm
+from agent.graph.utils.prompt_registry import register_prompt
 from functools import lru_cache
 
 class VectorstoreRoute(BaseModel):
@@ -40,7 +41,8 @@ route_prompt = ChatPromptTemplate.from_messages([
 
 # Create the chain with format instructions
 # vectorstore_router = route_prompt.partial(format_instructions=parser.get_format_instructions()) | llm | parser
-vectorstore_router = route_prompt | llm | parser
+vectorstore_router_prompt = register_prompt("vectorstore_router_prompt", route_prompt)
+vectorstore_router = (vectorstore_router_prompt.template | llm | parser).with_config(vectorstore_router_prompt.run_config())
 @lru_cache(maxsize=1000)
 def get_vectorstore_route(query: str) -> VectorstoreRoute:
     """Get the vectorstore route for a query with caching."""
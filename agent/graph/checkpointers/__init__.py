@@ -13,29 +13,57 @@ load_dotenv()
 # Get the checkpointer type from environment variable
 CHECKPOINTER_TYPE = os.getenv("CHECKPOINTER_TYPE", "memory").lower()
 
+def with_durability(checkpointer: BaseCheckpointSaver) -> BaseCheckpointSaver:
+    """Wrap a checkpointer for write-behind buffering unless CHECKPOINT_DURABILITY is sync."""
+    from .buffered_checkpointer import CHECKPOINT_DURABILITY, BufferedCheckpointer
+    if CHECKPOINT_DURABILITY == "sync":
+        return checkpointer
+    return BufferedCheckpointer(checkpointer)
+
+def with_metrics(checkpointer: BaseCheckpointSaver) -> BaseCheckpointSaver:
+    """Wrap a checkpointer to record operation latencies unless METRICS_ENABLED is false."""
+    from agent.graph.utils.metrics import METRICS_ENABLED
+    from .metered_checkpointer import MeteredCheckpointer
+    if not METRICS_ENABLED:
+        return checkpointer
+    return MeteredCheckpointer(checkpointer)
+
 def get_checkpointer() -> BaseCheckpointSaver:
     """Get the appropriate checkpointer based on CHECKPOINTER_TYPE environment variable.
     
     Returns:
         A LangGraph checkpointer instance
     """
+    return with_metrics(_build_checkpointer())
+
+def _build_checkpointer() -> BaseCheckpointSaver:
+    """Build the checkpointer CHECKPOINTER_TYPE selects."""
     if CHECKPOINTER_TYPE == "memory":
-        from langgraph.checkpoint.memory import MemorySaver
-        return MemorySaver()
+        from .memory_checkpointer import BoundedMemoryCheckpointer
+        return BoundedMemoryCheckpointer()
+    
+    elif CHECKPOINTER_TYPE == "sqlite":
+        from .sqlite_checkpointer import SqliteCheckpointer
+        return with_durability(SqliteCheckpointer())
     
     elif CHECKPOINTER_TYPE == "redis":
         from .redis_checkpointer import RedisCheckpointer
-        return RedisCheckpointer()
+        return with_durability(RedisCheckpointer())
     
     else:
         # Default to memory saver
-        from langgraph.checkpoint.memory import MemorySaver
-        return MemorySaver()
+        from .memory_checkpointer import BoundedMemoryCheckpointer
+        return BoundedMemoryCheckpointer()
 
 # Export the checkpointer classes
+from .buffered_checkpointer import BufferedCheckpointer
+from .metered_checkpointer import MeteredCheckpointer
+from .memory_checkpointer import BoundedMemoryCheckpointer
+from .sqlite_checkpointer import SqliteCheckpointer
+
 try:
     from .redis_checkpointer import RedisCheckpointer
 except ImportError:
     pass
 
-__all__ = ['RedisCheckpointer', 'get_checkpointer'] 
\ No newline at end of file
+__all__ = ['BoundedMemoryCheckpointer', 'BufferedCheckpointer', 'MeteredCheckpointer', 'RedisCheckpointer', 'SqliteCheckpointer', 'get_checkpointer', 'with_durability', 'with_metrics'] 
\ No newline at end of file
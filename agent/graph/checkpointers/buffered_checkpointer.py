@@ -0,0 +1,375 @@
+"""Write-behind buffering for LangGraph checkpointers
+
+LangGraph saves a checkpoint after every node, so a run of the real flow
+makes about ten checkpointer writes, and the intermediate ones are only ever
+read when the process crashes mid-run. BufferedCheckpointer wraps another
+checkpointer and trades that crash recovery for fewer writes on the request
+path, with a configurable durability mode:
+
+    sync: every checkpoint and write goes straight to the wrapped checkpointer
+    on-interrupt: a run's steps are kept in memory and only its last checkpoint
+        (with that checkpoint's writes) is persisted, when the run is
+        interrupted or fails, when it reaches END, when it goes idle, when
+        the thread is read, or at shutdown
+    async: every checkpoint and write is persisted, in order, by a background
+        task shortly after it is made
+
+In every mode an interrupt() or an error is persisted before the write that
+reports it returns, and so is the checkpoint a run reaches END with, so a
+human_in_loop pause or a finished turn always survives the response: the
+next turn may land on another worker, or on a serverless instance after
+this one was frozen. Reads flush the thread first, so callers always see
+their own writes.
+In on-interrupt mode the persisted checkpoint's parent is the thread's last
+persisted checkpoint, so history skips the steps that were never written.
+
+Environment Variables:
+    CHECKPOINT_DURABILITY: sync, on-interrupt or async (default: sync)
+    CHECKPOINT_FLUSH_INTERVAL: Seconds between background flush passes (default: 0.05)
+    CHECKPOINT_IDLE_FLUSH: Seconds without writes after which an on-interrupt run is persisted (default: 2)
+"""
+
+import os
+import copy
+import time
+import atexit
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.constants import ERROR, INTERRUPT, START, TASKS
+from langchain_core.runnables import RunnableConfig
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DURABILITY = os.getenv("CHECKPOINT_DURABILITY", "sync").lower()
+CHECKPOINT_FLUSH_INTERVAL = float(os.getenv("CHECKPOINT_FLUSH_INTERVAL", "0.05"))
+CHECKPOINT_IDLE_FLUSH = float(os.getenv("CHECKPOINT_IDLE_FLUSH", "2"))
+
+DURABILITY_MODES = ("sync", "on-interrupt", "async")
+
+# Writes to these channels end the run, so they are persisted right away
+FLUSH_CHANNELS = (INTERRUPT, ERROR)
+
+# A checkpoint holding a value in one of these channels still has a node to run
+TRIGGER_CHANNEL_PREFIXES = (START, TASKS, "branch:to:", "join:", "start:")
+
+# Flush locks are striped by thread, so they stay bounded however many threads pass through
+FLUSH_LOCK_STRIPES = 64
+
+# (thread_id, checkpoint_ns)
+ThreadKey = Tuple[str, str]
+
+
+@dataclass
+class _PendingPut:
+    config: RunnableConfig
+    checkpoint: Checkpoint
+    metadata: CheckpointMetadata
+    new_versions: ChannelVersions
+
+
+@dataclass
+class _PendingWrites:
+    config: RunnableConfig
+    writes: Sequence[Tuple[str, Any]]
+    task_id: str
+    task_path: str
+
+
+@dataclass
+class _ThreadBuffer:
+    ops: List[Any] = field(default_factory=list)
+    last_activity: float = 0.0
+
+
+def _thread_key(config: RunnableConfig) -> ThreadKey:
+    """Get the buffer key of a config."""
+    return config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", "")
+
+
+def _ends_run(checkpoint: Checkpoint) -> bool:
+    """Check whether a checkpoint is the one a run reaches END with.
+
+    LangGraph puts the last checkpoint of a run before it finds there is
+    nothing left to run. That is the case when no channel that triggers a
+    node holds a value and no Send is pending.
+    """
+    if checkpoint.get("pending_sends"):
+        return False
+    return not any(channel.startswith(TRIGGER_CHANNEL_PREFIXES) for channel in checkpoint["channel_values"])
+
+
+class BufferedCheckpointer(BaseCheckpointSaver):
+    """Checkpointer wrapper that defers writes according to a durability mode."""
+
+    def __init__(
+        self,
+        checkpointer: BaseCheckpointSaver,
+        durability: str = CHECKPOINT_DURABILITY,
+        flush_interval: float = CHECKPOINT_FLUSH_INTERVAL,
+        idle_flush: float = CHECKPOINT_IDLE_FLUSH,
+    ):
+        """Initialize the BufferedCheckpointer.
+
+        Args:
+            checkpointer: The checkpointer to persist to
+            durability: "sync", "on-interrupt" or "async"
+            flush_interval: Seconds between background flush passes
+            idle_flush: Seconds without writes after which an on-interrupt run is persisted
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown checkpoint durability {durability!r}; expected one of {', '.join(DURABILITY_MODES)}")
+        super().__init__(serde=checkpointer.serde)
+        self.checkpointer = checkpointer
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.idle_flush = idle_flush
+        self._buffers: Dict[ThreadKey, _ThreadBuffer] = {}
+        self._lock = threading.Lock()
+        # Flushes of one thread run one at a time, so its writes land in order
+        self._thread_locks = [threading.Lock() for _ in range(FLUSH_LOCK_STRIPES)]
+        self._async_thread_locks = [asyncio.Lock() for _ in range(FLUSH_LOCK_STRIPES)]
+        self._flush_task: Optional[asyncio.Task] = None
+        self._counters: Dict[str, int] = defaultdict(int)
+        atexit.register(self.flush)
+        logger.info(f"Buffering checkpoints with durability {durability}")
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped checkpointer's extras, e.g. compaction
+        checkpointer = self.__dict__.get("checkpointer")
+        if checkpointer is None:
+            raise AttributeError(name)
+        return getattr(checkpointer, name)
+
+    def get_next_version(self, current: Optional[Any], channel: Any) -> Any:
+        return self.checkpointer.get_next_version(current, channel)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the wrapped checkpointer's stats plus buffering counters."""
+        stats = self.checkpointer.get_stats() if hasattr(self.checkpointer, "get_stats") else {}
+        with self._lock:
+            pending_ops = sum(len(buffer.ops) for buffer in self._buffers.values())
+        return {
+            **stats,
+            "buffer": {
+                "durability": self.durability,
+                **self._counters,
+                "pending_threads": len(self._buffers),
+                "pending_ops": pending_ops,
+            },
+        }
+
+    def _buffer(self, key: ThreadKey, op: Any) -> None:
+        """Add a write to a thread's buffer, coalescing superseded steps in on-interrupt mode."""
+        with self._lock:
+            buffer = self._buffers.setdefault(key, _ThreadBuffer())
+            buffer.last_activity = time.monotonic()
+            if self.durability == "on-interrupt" and isinstance(op, _PendingPut):
+                previous = next((pending for pending in buffer.ops if isinstance(pending, _PendingPut)), None)
+                if previous is not None:
+                    # Keep pointing at the last persisted checkpoint; everything buffered so far is superseded
+                    op.config = previous.config
+                    self._counters["coalesced_puts"] += 1
+                self._counters["dropped_writes"] += sum(isinstance(pending, _PendingWrites) for pending in buffer.ops)
+                buffer.ops = []
+            buffer.ops.append(op)
+
+    def _take(self, key: ThreadKey) -> List[Any]:
+        """Remove and return a thread's buffered writes."""
+        with self._lock:
+            buffer = self._buffers.pop(key, None)
+        return buffer.ops if buffer else []
+
+    def _requeue(self, key: ThreadKey, ops: List[Any]) -> None:
+        """Put writes that failed to persist back in front of a thread's buffer."""
+        with self._lock:
+            buffer = self._buffers.setdefault(key, _ThreadBuffer(last_activity=time.monotonic()))
+            buffer.ops = ops + buffer.ops
+        self._counters["flush_errors"] += 1
+
+    def _apply(self, ops: List[Any]) -> None:
+        for op in ops:
+            if isinstance(op, _PendingPut):
+                self.checkpointer.put(op.config, op.checkpoint, op.metadata, op.new_versions)
+                self._counters["persisted_puts"] += 1
+            else:
+                self.checkpointer.put_writes(op.config, op.writes, op.task_id, op.task_path)
+                self._counters["persisted_writes"] += 1
+
+    async def _aapply(self, ops: List[Any]) -> None:
+        for op in ops:
+            if isinstance(op, _PendingPut):
+                await self.checkpointer.aput(op.config, op.checkpoint, op.metadata, op.new_versions)
+                self._counters["persisted_puts"] += 1
+            else:
+                await self.checkpointer.aput_writes(op.config, op.writes, op.task_id, op.task_path)
+                self._counters["persisted_writes"] += 1
+
+    def _flush_thread(self, key: ThreadKey, reason: str) -> None:
+        """Persist a thread's buffered writes."""
+        with self._thread_locks[hash(key) % FLUSH_LOCK_STRIPES]:
+            ops = self._take(key)
+            if not ops:
+                return
+            try:
+                self._apply(ops)
+            except Exception:
+                self._requeue(key, ops)
+                raise
+            self._counters[f"flushes_{reason}"] += 1
+
+    async def _aflush_thread(self, key: ThreadKey, reason: str) -> None:
+        """Async variant of _flush_thread."""
+        async with self._async_thread_locks[hash(key) % FLUSH_LOCK_STRIPES]:
+            ops = self._take(key)
+            if not ops:
+                return
+            try:
+                await self._aapply(ops)
+            except Exception:
+                self._requeue(key, ops)
+                raise
+            self._counters[f"flushes_{reason}"] += 1
+
+    def _flush_before_read(self, config: Optional[RunnableConfig]) -> None:
+        keys = [_thread_key(config)] if config else list(self._buffers)
+        for key in keys:
+            self._flush_thread(key, "read")
+
+    async def _aflush_before_read(self, config: Optional[RunnableConfig]) -> None:
+        keys = [_thread_key(config)] if config else list(self._buffers)
+        for key in keys:
+            await self._aflush_thread(key, "read")
+
+    def flush(self) -> None:
+        """Persist everything buffered, e.g. before the process exits."""
+        for key in list(self._buffers):
+            try:
+                self._flush_thread(key, "shutdown")
+            except Exception as e:
+                logger.error(f"Error flushing checkpoints of thread {key[0]}: {e}")
+
+    async def aflush(self) -> None:
+        """Async variant of flush()."""
+        for key in list(self._buffers):
+            try:
+                await self._aflush_thread(key, "shutdown")
+            except Exception as e:
+                logger.error(f"Error flushing checkpoints of thread {key[0]}: {e}")
+
+    def _due_threads(self) -> List[ThreadKey]:
+        """Get the threads the background task should persist now."""
+        if self.durability == "async":
+            return list(self._buffers)
+        idle_since = time.monotonic() - self.idle_flush
+        with self._lock:
+            return [key for key, buffer in self._buffers.items() if buffer.last_activity <= idle_since]
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            for key in self._due_threads():
+                try:
+                    await self._aflush_thread(key, "background" if self.durability == "async" else "idle")
+                except Exception as e:
+                    logger.error(f"Error flushing checkpoints of thread {key[0]}: {e}")
+
+    def start_background_flush(self) -> None:
+        """Start persisting buffered checkpoints on the running event loop."""
+        if self.durability == "sync":
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop_background_flush(self) -> None:
+        """Stop the background flush task and persist everything still buffered."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.aflush()
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self._flush_before_read(config)
+        return self.checkpointer.get_tuple(config)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        await self._aflush_before_read(config)
+        return await self.checkpointer.aget_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        self._flush_before_read(config)
+        yield from self.checkpointer.list(config, filter=filter, before=before, limit=limit)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        await self._aflush_before_read(config)
+        async for checkpoint_tuple in self.checkpointer.alist(config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+
+    def _pending_put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> Tuple[_PendingPut, RunnableConfig]:
+        """Snapshot a put for the buffer, and build the config put() returns."""
+        # Nodes may still change channel values in place after the step, so keep a copy
+        op = _PendingPut(config, copy.deepcopy(checkpoint), copy.deepcopy(metadata), new_versions)
+        self._counters["buffered_puts"] += 1
+        next_config = {
+            "configurable": {
+                "thread_id": config["configurable"]["thread_id"],
+                "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        return op, next_config
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        if self.durability == "sync":
+            return self.checkpointer.put(config, checkpoint, metadata, new_versions)
+        op, next_config = self._pending_put(config, checkpoint, metadata, new_versions)
+        self._buffer(_thread_key(config), op)
+        if _ends_run(checkpoint):
+            self._flush_thread(_thread_key(config), "end")
+        return next_config
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        if self.durability == "sync":
+            return await self.checkpointer.aput(config, checkpoint, metadata, new_versions)
+        op, next_config = self._pending_put(config, checkpoint, metadata, new_versions)
+        self._buffer(_thread_key(config), op)
+        if _ends_run(checkpoint):
+            await self._aflush_thread(_thread_key(config), "end")
+        return next_config
+
+    def _buffer_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str) -> bool:
+        """Buffer a task's writes.
+
+        Returns:
+            Whether the writes end the run, so the thread must be persisted now
+        """
+        self._buffer(_thread_key(config), _PendingWrites(config, copy.deepcopy(list(writes)), task_id, task_path))
+        self._counters["buffered_writes"] += 1
+        return any(channel in FLUSH_CHANNELS for channel, _ in writes)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if self.durability == "sync":
+            return self.checkpointer.put_writes(config, writes, task_id, task_path)
+        if self._buffer_writes(config, writes, task_id, task_path):
+            self._flush_thread(_thread_key(config), "interrupt")
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if self.durability == "sync":
+            return await self.checkpointer.aput_writes(config, writes, task_id, task_path)
+        if self._buffer_writes(config, writes, task_id, task_path):
+            await self._aflush_thread(_thread_key(config), "interrupt")
@@ -0,0 +1,179 @@
+"""Compression codec for checkpoint payloads
+
+Checkpoints of one run are near copies of each other (the same messages,
+documents and prompts), which is exactly what zstd with a trained
+dictionary compresses well. Compression is optional: without the
+zstandard package, or with CHECKPOINT_COMPRESSION=none, payloads are
+stored as the serializer produced them.
+
+Compressed payloads are plain zstd frames and are recognized by the zstd
+magic number, so a reader decodes compressed and uncompressed payloads
+alike and the setting can be changed without migrating stored data. Frames
+record the id of the dictionary they were compressed with; reading one
+requires the same dictionary to be configured.
+
+Environment Variables:
+    CHECKPOINT_COMPRESSION: "zstd" to compress payloads, "none" to store them as is (default: none)
+    CHECKPOINT_ZSTD_LEVEL: zstd compression level (default: 3)
+    CHECKPOINT_ZSTD_DICT: Path of a dictionary trained with `python -m agent.graph.checkpointers.codec`
+    CHECKPOINT_COMPRESSION_MIN_BYTES: Payloads smaller than this are stored as is (default: 256)
+"""
+
+import os
+import logging
+import argparse
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "none").lower()
+CHECKPOINT_ZSTD_LEVEL = int(os.getenv("CHECKPOINT_ZSTD_LEVEL", "3"))
+CHECKPOINT_ZSTD_DICT = os.getenv("CHECKPOINT_ZSTD_DICT")
+CHECKPOINT_COMPRESSION_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESSION_MIN_BYTES", "256"))
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DEFAULT_DICT_SIZE = 112640  # 110 KiB, the zstd CLI default
+
+
+class CheckpointCodec:
+    """Compresses and decompresses serialized checkpoint payloads."""
+
+    def __init__(
+        self,
+        compression: str = CHECKPOINT_COMPRESSION,
+        level: int = CHECKPOINT_ZSTD_LEVEL,
+        dict_path: Optional[str] = CHECKPOINT_ZSTD_DICT,
+        min_bytes: int = CHECKPOINT_COMPRESSION_MIN_BYTES,
+    ):
+        """Initialize the codec.
+
+        Args:
+            compression: "zstd" or "none"
+            level: zstd compression level
+            dict_path: Optional path of a trained zstd dictionary
+            min_bytes: Payloads smaller than this are not compressed
+        """
+        self.min_bytes = min_bytes
+        self.dictionary = None
+        self._compressor = None
+        self._decompressors: Dict[int, "zstandard.ZstdDecompressor"] = {}
+
+        if zstandard is None:
+            if compression == "zstd":
+                logger.warning("CHECKPOINT_COMPRESSION=zstd but the zstandard package is not installed; storing checkpoints uncompressed")
+            return
+
+        if dict_path:
+            with open(dict_path, "rb") as f:
+                self.dictionary = zstandard.ZstdCompressionDict(f.read())
+            self._decompressors[self.dictionary.dict_id()] = zstandard.ZstdDecompressor(dict_data=self.dictionary)
+        self._decompressors[0] = zstandard.ZstdDecompressor()
+
+        if compression == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level, dict_data=self.dictionary)
+            logger.info(
+                f"Compressing checkpoints with zstd level {level}"
+                + (f" and dictionary {self.dictionary.dict_id()}" if self.dictionary else "")
+            )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether new payloads are compressed."""
+        return self._compressor is not None
+
+    def encode(self, data: bytes) -> bytes:
+        """Compress a payload if compression is enabled and it is large enough."""
+        if self._compressor is None or len(data) < self.min_bytes:
+            return data
+        return self._compressor.compress(data)
+
+    def decode(self, data: bytes) -> bytes:
+        """Decompress a payload written by encode(); uncompressed payloads pass through.
+
+        Raises:
+            ValueError: If the payload needs zstandard or a dictionary that is not configured
+        """
+        if not data.startswith(ZSTD_MAGIC):
+            return data
+        if zstandard is None:
+            raise ValueError("Checkpoint payload is zstd-compressed but the zstandard package is not installed")
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            raise ValueError(f"Checkpoint payload needs zstd dictionary {dict_id}; set CHECKPOINT_ZSTD_DICT to it")
+        return decompressor.decompress(data)
+
+
+def train_dictionary(samples: List[bytes], dict_size: int = DEFAULT_DICT_SIZE) -> bytes:
+    """Train a zstd dictionary on serialized checkpoint payloads.
+
+    Args:
+        samples: Uncompressed payloads; a few thousand from real traffic work well
+        dict_size: Maximum size of the dictionary in bytes
+
+    Returns:
+        The dictionary, to be saved and pointed to by CHECKPOINT_ZSTD_DICT
+    """
+    if zstandard is None:
+        raise ImportError("Training a dictionary requires the zstandard package: pip install zstandard")
+    return zstandard.train_dictionary(dict_size, samples).as_bytes()
+
+
+def collect_redis_samples(redis_client, codec: CheckpointCodec, max_samples: int = 5000) -> List[bytes]:
+    """Collect uncompressed checkpoint and message payloads from Redis for training.
+
+    This walks the keyspace with SCAN, so run it offline against a replica
+    or a snapshot, not on the request path.
+    """
+    samples = []
+    for key in redis_client.scan_iter(match="checkpoint$*", count=500):
+        for payload in redis_client.hmget(key, "checkpoint", "messages"):
+            if payload:
+                samples.append(codec.decode(payload))
+        if len(samples) >= max_samples:
+            break
+    return samples
+
+
+def _training_report(samples: Iterable[bytes], dictionary: bytes, level: int) -> Dict[str, float]:
+    """Compare compressed sizes with and without the trained dictionary."""
+    samples = list(samples)
+    raw = sum(len(sample) for sample in samples)
+    plain = zstandard.ZstdCompressor(level=level)
+    trained = zstandard.ZstdCompressor(level=level, dict_data=zstandard.ZstdCompressionDict(dictionary))
+    without_dict = sum(len(plain.compress(sample)) for sample in samples)
+    with_dict = sum(len(trained.compress(sample)) for sample in samples)
+    return {
+        "samples": len(samples),
+        "raw_bytes": raw,
+        "ratio_without_dict": round(raw / max(without_dict, 1), 2),
+        "ratio_with_dict": round(raw / max(with_dict, 1), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train a zstd dictionary on checkpoints stored in Redis")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL"), help="Redis to sample checkpoints from")
+    parser.add_argument("--out", required=True, help="Where to write the dictionary")
+    parser.add_argument("--samples", type=int, default=5000, help="Maximum number of payloads to sample")
+    parser.add_argument("--dict-size", type=int, default=DEFAULT_DICT_SIZE, help="Maximum dictionary size in bytes")
+    args = parser.parse_args()
+
+    import redis
+
+    logging.basicConfig(level=logging.INFO)
+    codec = CheckpointCodec()
+    training_samples = collect_redis_samples(redis.from_url(args.redis_url), codec, args.samples)
+    if not training_samples:
+        raise SystemExit("No checkpoints found to train on")
+    trained_dictionary = train_dictionary(training_samples, args.dict_size)
+    with open(args.out, "wb") as f:
+        f.write(trained_dictionary)
+    logger.info(f"Wrote {len(trained_dictionary)} byte dictionary to {args.out}")
+    logger.info(f"Compression on the samples: {_training_report(training_samples, trained_dictionary, CHECKPOINT_ZSTD_LEVEL)}")
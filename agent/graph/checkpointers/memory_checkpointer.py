@@ -0,0 +1,322 @@
+"""Bounded in-memory checkpointer for LangGraph
+
+LangGraph's MemorySaver keeps every checkpoint of every thread for the life
+of the process, so a long-running worker grows until it is killed.
+BoundedMemoryCheckpointer stores the same serialized payloads, but counts
+their bytes and keeps the total under a budget by evicting whole threads,
+least recently used first. The thread being written is never evicted.
+
+Evicted threads are dropped, or, with MEMORY_CHECKPOINT_SPILL_PATH set,
+spilled to a local SQLite file (one row per thread) and loaded back the
+next time the thread is used, so a conversation paused at human_in_loop
+can still be resumed after it was evicted. A loaded thread keeps its row
+until it is spilled again, so after a restart it resumes from the state
+it was last spilled with. With a spill file, the async methods run in a
+worker thread, since they may read or write it.
+
+Environment Variables:
+    MEMORY_CHECKPOINT_MAX_BYTES: Byte budget for resident checkpoints (default: 268435456, 256 MiB)
+    MEMORY_CHECKPOINT_SPILL_PATH: SQLite file evicted threads are spilled to (default: unset, evicted threads are dropped)
+"""
+
+import os
+import pickle
+import asyncio
+import sqlite3
+import logging
+import weakref
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langchain_core.runnables import RunnableConfig
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MEMORY_CHECKPOINT_MAX_BYTES = int(os.getenv("MEMORY_CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024)))
+MEMORY_CHECKPOINT_SPILL_PATH = os.getenv("MEMORY_CHECKPOINT_SPILL_PATH")
+
+# Approximate bookkeeping cost of one stored checkpoint or write, on top of its payload
+ENTRY_OVERHEAD_BYTES = 200
+
+SPILL_SCHEMA = "CREATE TABLE IF NOT EXISTS spilled_threads (thread_id TEXT PRIMARY KEY, data BLOB NOT NULL) WITHOUT ROWID"
+
+# (type, serialized payload)
+Serialized = Tuple[str, bytes]
+
+
+@dataclass
+class _ThreadState:
+    # checkpoint_ns -> checkpoint_id -> (checkpoint, metadata, parent_checkpoint_id)
+    checkpoints: Dict[str, Dict[str, Tuple[Serialized, Serialized, Optional[str]]]] = field(default_factory=lambda: defaultdict(dict))
+    # (checkpoint_ns, checkpoint_id) -> (task_id, idx) -> (task_id, channel, value, task_path)
+    writes: Dict[Tuple[str, str], Dict[Tuple[str, int], Tuple[str, str, Serialized, str]]] = field(default_factory=lambda: defaultdict(dict))
+    nbytes: int = 0
+
+
+class BoundedMemoryCheckpointer(BaseCheckpointSaver):
+    """In-memory checkpointer with a byte budget, thread-level LRU eviction and optional disk spill."""
+
+    def __init__(
+        self,
+        max_bytes: int = MEMORY_CHECKPOINT_MAX_BYTES,
+        spill_path: Optional[str] = MEMORY_CHECKPOINT_SPILL_PATH,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        """Initialize the BoundedMemoryCheckpointer.
+
+        Args:
+            max_bytes: Byte budget for resident checkpoints
+            spill_path: Optional SQLite file evicted threads are spilled to
+            serde: Serializer for checkpoints and writes
+        """
+        super().__init__(serde=serde)
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        self._threads: "OrderedDict[str, _ThreadState]" = OrderedDict()
+        self._resident_bytes = 0
+        self._lock = threading.RLock()
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._spill: Optional[sqlite3.Connection] = None
+        if spill_path:
+            self._spill = self._open_spill()
+            # A connection must not be used across fork; forked children open their own
+            checkpointer = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: checkpointer() is not None and checkpointer()._reopen_after_fork())
+        logger.info(
+            f"Initialized bounded memory checkpointer with a {max_bytes} byte budget"
+            + (f", spilling to {spill_path}" if spill_path else "")
+        )
+
+    def _open_spill(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.spill_path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(SPILL_SCHEMA)
+        return connection
+
+    def _reopen_after_fork(self) -> None:
+        """Replace the spill connection inherited from the parent process without closing it."""
+        self._lock = threading.RLock()
+        self._spill = self._open_spill()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get resident size, eviction and spill counters."""
+        with self._lock:
+            stats = {
+                "resident_bytes": self._resident_bytes,
+                "max_bytes": self.max_bytes,
+                "resident_threads": len(self._threads),
+                **self._counters,
+            }
+            if self._spill is not None:
+                stats["spilled_threads"] = self._spill.execute("SELECT COUNT(*) FROM spilled_threads").fetchone()[0]
+        return {"memory": stats}
+
+    def _charge(self, state: _ThreadState, nbytes: int) -> None:
+        state.nbytes += nbytes
+        self._resident_bytes += nbytes
+
+    def _thread(self, thread_id: str, create: bool) -> Optional[_ThreadState]:
+        """Get a thread's state, loading it from the spill file if it was evicted, and mark it recently used."""
+        state = self._threads.get(thread_id)
+        if state is None:
+            state = self._load_spilled(thread_id)
+            if state is None:
+                if not create:
+                    return None
+                state = _ThreadState()
+            self._threads[thread_id] = state
+            self._resident_bytes += state.nbytes
+        self._threads.move_to_end(thread_id)
+        if state.nbytes:
+            self._evict(keep=thread_id)
+        return state
+
+    def _load_spilled(self, thread_id: str) -> Optional[_ThreadState]:
+        if self._spill is None:
+            return None
+        row = self._spill.execute("SELECT data FROM spilled_threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        if row is None:
+            return None
+        checkpoints, writes, nbytes = pickle.loads(row[0])
+        self._counters["spill_reads"] += 1
+        self._counters["spill_read_bytes"] += len(row[0])
+        return _ThreadState(defaultdict(dict, checkpoints), defaultdict(dict, writes), nbytes)
+
+    def _evict(self, keep: str) -> None:
+        """Evict least recently used threads until resident bytes fit the budget."""
+        while self._resident_bytes > self.max_bytes:
+            thread_id = next((candidate for candidate in self._threads if candidate != keep), None)
+            if thread_id is None:
+                logger.warning(f"Thread {keep} alone exceeds the {self.max_bytes} byte checkpoint budget")
+                return
+            state = self._threads.pop(thread_id)
+            self._resident_bytes -= state.nbytes
+            self._counters["evictions"] += 1
+            self._counters["evicted_bytes"] += state.nbytes
+            if self._spill is not None:
+                data = pickle.dumps((dict(state.checkpoints), dict(state.writes), state.nbytes), protocol=pickle.HIGHEST_PROTOCOL)
+                self._spill.execute("INSERT OR REPLACE INTO spilled_threads (thread_id, data) VALUES (?, ?)", (thread_id, data))
+                self._counters["spill_writes"] += 1
+                self._counters["spill_write_bytes"] += len(data)
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, state: _ThreadState) -> CheckpointTuple:
+        checkpoint, metadata, parent_checkpoint_id = state.checkpoints[checkpoint_ns][checkpoint_id]
+        writes = state.writes.get((checkpoint_ns, checkpoint_id), {})
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed(checkpoint),
+            metadata=self.serde.loads_typed(metadata),
+            parent_config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_checkpoint_id,
+                }
+            } if parent_checkpoint_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for (task_id, channel, value, _) in (writes[key] for key in sorted(writes))
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            state = self._thread(thread_id, create=False)
+            if state is None:
+                return None
+            checkpoints = state.checkpoints.get(checkpoint_ns, {})
+            if not checkpoint_id:
+                # Checkpoint ids are time-ordered, so the latest is the largest
+                checkpoint_id = max(checkpoints, default=None)
+            if checkpoint_id not in checkpoints:
+                return None
+            return self._to_tuple(thread_id, checkpoint_ns, checkpoint_id, state)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config is not None:
+                thread_ids = [config["configurable"]["thread_id"]]
+            else:
+                # Only resident threads are listed without a config; spilled ones are loaded on use
+                thread_ids = list(self._threads)
+            config_checkpoint_ns = config["configurable"].get("checkpoint_ns") if config else None
+            config_checkpoint_id = get_checkpoint_id(config) if config else None
+            before_checkpoint_id = get_checkpoint_id(before) if before else None
+
+            results = []
+            for thread_id in thread_ids:
+                state = self._thread(thread_id, create=False)
+                if state is None:
+                    continue
+                for checkpoint_ns, checkpoints in state.checkpoints.items():
+                    if config_checkpoint_ns is not None and checkpoint_ns != config_checkpoint_ns:
+                        continue
+                    for checkpoint_id in sorted(checkpoints, reverse=True):
+                        if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                            continue
+                        if before_checkpoint_id and checkpoint_id >= before_checkpoint_id:
+                            continue
+                        checkpoint_tuple = self._to_tuple(thread_id, checkpoint_ns, checkpoint_id, state)
+                        metadata = checkpoint_tuple.metadata or {}
+                        if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                            continue
+                        results.append(checkpoint_tuple)
+                        if limit and len(results) >= limit:
+                            break
+                    if limit and len(results) >= limit:
+                        break
+                if limit and len(results) >= limit:
+                    break
+        yield from results
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            state = self._thread(thread_id, create=True)
+            previous = state.checkpoints[checkpoint_ns].get(checkpoint["id"])
+            if previous is not None:
+                self._charge(state, -(len(previous[0][1]) + len(previous[1][1]) + ENTRY_OVERHEAD_BYTES))
+            # The config points at the parent; the new checkpoint is stored under its own id
+            state.checkpoints[checkpoint_ns][checkpoint["id"]] = (
+                serialized_checkpoint,
+                serialized_metadata,
+                config["configurable"].get("checkpoint_id"),
+            )
+            self._charge(state, len(serialized_checkpoint[1]) + len(serialized_metadata[1]) + ENTRY_OVERHEAD_BYTES)
+            self._evict(keep=thread_id)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            state = self._thread(thread_id, create=True)
+            stored = state.writes[(checkpoint_ns, checkpoint_id)]
+            for idx, (channel, value) in enumerate(writes):
+                # Special channels (errors, interrupts, ...) have fixed negative indices
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                key = (task_id, write_idx)
+                # Regular writes are stored once; special channel writes replace the previous one
+                if write_idx >= 0 and key in stored:
+                    continue
+                if key in stored:
+                    self._charge(state, -(len(stored[key][2][1]) + ENTRY_OVERHEAD_BYTES))
+                serialized_value = self.serde.dumps_typed(value)
+                stored[key] = (task_id, channel, serialized_value, task_path)
+                self._charge(state, len(serialized_value[1]) + ENTRY_OVERHEAD_BYTES)
+            self._evict(keep=thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if self._spill is not None:
+            return await asyncio.to_thread(self.get_tuple, config)
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        if self._spill is not None:
+            results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        else:
+            results = self.list(config, filter=filter, before=before, limit=limit)
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        if self._spill is not None:
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if self._spill is not None:
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+        return self.put_writes(config, writes, task_id, task_path)
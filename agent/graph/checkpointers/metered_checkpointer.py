@@ -0,0 +1,100 @@
+"""Latency metrics for LangGraph checkpointers
+
+MeteredCheckpointer wraps the checkpointer the graph uses and records the
+latency of every read and write in agent_checkpoint_operation_duration_seconds
+(see agent/graph/utils/metrics.py), labelled with the operation. Sync and
+async calls of an operation share a label. Anything else, e.g. stats,
+flushing or compaction, goes straight to the wrapped checkpointer.
+"""
+
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langchain_core.runnables import RunnableConfig
+from agent.graph.utils.metrics import CHECKPOINT_DURATION
+
+
+class MeteredCheckpointer(BaseCheckpointSaver):
+    """Checkpointer wrapper that records the latency of every operation."""
+
+    def __init__(self, checkpointer: BaseCheckpointSaver):
+        """Initialize the MeteredCheckpointer.
+
+        Args:
+            checkpointer: The checkpointer to delegate to
+        """
+        super().__init__(serde=checkpointer.serde)
+        self.checkpointer = checkpointer
+
+    def __getattr__(self, name: str) -> Any:
+        # Expose the wrapped checkpointer's extras, e.g. stats and background tasks
+        checkpointer = self.__dict__.get("checkpointer")
+        if checkpointer is None:
+            raise AttributeError(name)
+        return getattr(checkpointer, name)
+
+    def get_next_version(self, current: Optional[Any], channel: Any) -> Any:
+        return self.checkpointer.get_next_version(current, channel)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with CHECKPOINT_DURATION.time("get_tuple"):
+            return self.checkpointer.get_tuple(config)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with CHECKPOINT_DURATION.time("get_tuple"):
+            return await self.checkpointer.aget_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        # Only the time spent producing items counts, not the caller's time between them
+        iterator = self.checkpointer.list(config, filter=filter, before=before, limit=limit)
+        elapsed = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    checkpoint_tuple = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield checkpoint_tuple
+        finally:
+            CHECKPOINT_DURATION.observe(elapsed, "list")
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        iterator = self.checkpointer.alist(config, filter=filter, before=before, limit=limit).__aiter__()
+        elapsed = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    checkpoint_tuple = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield checkpoint_tuple
+        finally:
+            CHECKPOINT_DURATION.observe(elapsed, "list")
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        with CHECKPOINT_DURATION.time("put"):
+            return self.checkpointer.put(config, checkpoint, metadata, new_versions)
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        with CHECKPOINT_DURATION.time("put"):
+            return await self.checkpointer.aput(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        with CHECKPOINT_DURATION.time("put_writes"):
+            self.checkpointer.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        with CHECKPOINT_DURATION.time("put_writes"):
+            await self.checkpointer.aput_writes(config, writes, task_id, task_path)
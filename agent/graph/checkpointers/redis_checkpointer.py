@@ -1,18 +1,92 @@
 """Redis Checkpointer for LangGraph
 
 This module implements a LangGraph checkpointer using Redis for state persistence.
+
+Keys:
+    checkpoint${<thread>}$<ns>$<checkpoint_id>: Hash holding one checkpoint
+    checkpoint_index${<thread>}$<ns>: Sorted set of the thread's checkpoint ids
+    writes${<thread>}$<ns>$<checkpoint_id>: Hash of a checkpoint's pending writes, one field per <task_id>$<idx>
+    checkpoint_version${<thread>}$<ns>: Counter bumped by every put and put_writes of the thread
+    checkpoint_threads: Sorted set of <thread>$<ns> scored by last write time, read by compaction
+
+Checkpoint ids are time-ordered (uuid6), so the index stores every id with
+score 0 and relies on lexicographic order: the latest checkpoint is the
+lexicographically largest member, and `before` becomes an exclusive upper
+bound of ZREVRANGEBYLEX. No operation scans the keyspace.
+
+Every operation is batched into as few round trips as possible: put and
+put_writes are one pipeline each, loading a checkpoint with its pending
+writes is one pipeline (or one Lua script for the latest checkpoint), and
+list is one index read plus one pipeline per page. Round trips are counted
+per operation and reported by get_stats().
+
+The sync and async paths share the serialization code and use the pooled
+clients of agent.graph.utils.redis_client. Thread ids are wrapped in a hash
+tag, so on a Redis Cluster (REDIS_CLUSTER=true) all keys of a thread live
+on one shard and its pipelines and scripts never cross slots.
+
+Payloads go through a CheckpointCodec (optional zstd compression, see
+codec.py). The `messages` channel is stored apart from the rest of the
+checkpoint and delta-encoded: when the parent's messages are a prefix of
+the new ones, only the appended messages are written, and the hash records
+the chain of ancestor ids whose segments rebuild the full list. Every
+CHECKPOINT_FULL_SNAPSHOT_INTERVAL checkpoints (and whenever the messages
+are rewritten rather than appended to) a full snapshot restarts the chain.
+Rebuilt message lists are kept in a small in-process LRU, so reading the
+parent of the next step usually needs no extra data from Redis.
+
+The latest checkpoint of recently used threads is also kept in process, as
+the raw hashes Redis would return for it, together with the thread's
+version counter. Writes made by this worker update the cached copy (the
+counter tells whether another worker wrote in between), and reading the
+latest checkpoint sends the cached version along: when it still matches,
+Redis answers with the version alone and the checkpoint is parsed from the
+cached copy. A conversation resumed on the worker that ran its previous
+turn therefore costs one small round trip and no payload transfer.
+
+Retention: with a TTL, every key a call touches gets its expiry refreshed
+(a checkpoint's delta chain ancestors included), so idle threads expire
+while active ones live on. A background compaction task trims recently
+active threads to their last CHECKPOINT_MAX_PER_THREAD checkpoints (plus
+the ancestors their messages are rebuilt from) and drops the pending
+writes of every checkpoint but the latest: once a run moves past a
+checkpoint, or reaches END, those writes are folded into the next
+checkpoint and are never read again.
+
+Environment Variables:
+    CHECKPOINT_TTL: Seconds of inactivity before a thread's keys expire, 0 to keep them forever (default: 0)
+    CHECKPOINT_MAX_PER_THREAD: Checkpoints kept per thread by compaction, 0 to keep all (default: 20)
+    CHECKPOINT_COMPACTION_INTERVAL: Seconds between background compactions (default: 300)
+    CHECKPOINT_DELTA_MESSAGES: Set to "false" to store the full messages in every checkpoint (default: true)
+    CHECKPOINT_FULL_SNAPSHOT_INTERVAL: Longest delta chain before a full snapshot is written (default: 10)
+    CHECKPOINT_MESSAGES_CACHE_SIZE: Message lists kept in the in-process LRU (default: 1024)
+    CHECKPOINT_LATEST_CACHE_SIZE: Threads whose latest checkpoint is kept in process, 0 to disable (default: 256)
 """
 
 import os
-import json
+import copy
 import logging
-import uuid
-from typing import Any, Dict, Optional, List, Tuple, Iterator, Sequence
+import time
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, AsyncIterator, Dict, Optional, List, Tuple, Iterator, Sequence
 from dotenv import load_dotenv
-from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple, get_checkpoint_id, get_checkpoint_metadata
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
 from langgraph.checkpoint.serde.base import SerializerProtocol
 from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 from langchain_core.runnables import RunnableConfig
+from agent.graph.checkpointers.codec import CheckpointCodec
+from agent.graph.utils.redis_client import get_async_redis, get_redis, hash_tag, strip_hash_tag
 
 # Load environment variables
 load_dotenv()
@@ -21,36 +95,171 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 REDIS_KEY_SEPARATOR = "$"
-WRITES_IDX_MAP = {}  # Channel to index mapping, similar to MemorySaver
+WRITE_FIELD_SEPARATOR = b"\x00"
 
-# Utility functions for key construction and parsing
+# Checkpoints loaded per pipeline when list() cannot use its limit directly
+LIST_BATCH_SIZE = 50
 
-def _generate_new_checkpoint_id() -> str:
-    """Generate a new unique checkpoint ID."""
-    return str(uuid.uuid4())
+CHECKPOINT_DELTA_MESSAGES = os.getenv("CHECKPOINT_DELTA_MESSAGES", "true").lower() == "true"
+CHECKPOINT_FULL_SNAPSHOT_INTERVAL = int(os.getenv("CHECKPOINT_FULL_SNAPSHOT_INTERVAL", "10"))
+CHECKPOINT_MESSAGES_CACHE_SIZE = int(os.getenv("CHECKPOINT_MESSAGES_CACHE_SIZE", "1024"))
+CHECKPOINT_LATEST_CACHE_SIZE = int(os.getenv("CHECKPOINT_LATEST_CACHE_SIZE", "256"))
+MESSAGES_CHANNEL = "messages"
 
-def _make_redis_checkpoint_key(thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]) -> str:
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", "0"))
+CHECKPOINT_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "20"))
+CHECKPOINT_COMPACTION_INTERVAL = float(os.getenv("CHECKPOINT_COMPACTION_INTERVAL", "300"))
+# Threads compacted per pipeline
+COMPACTION_BATCH_SIZE = 100
+THREADS_KEY = "checkpoint_threads"
+
+# Load the latest checkpoint of a thread and its pending writes in one round trip.
+# KEYS[1] is the thread's index and KEYS[2] its version counter; ARGV holds the
+# checkpoint and writes key prefixes, the TTL to refresh on the keys read (0 for
+# none) and the version the caller has cached ('' for none).
+# Returns {id, version} when the cached version is current, else {id, version,
+# checkpoint hash, writes hash}.
+LATEST_CHECKPOINT_SCRIPT = """
+local ids = redis.call('ZREVRANGEBYLEX', KEYS[1], '+', '-', 'LIMIT', 0, 1)
+if #ids == 0 then
+    return false
+end
+local checkpoint_id = ids[1]
+local version = redis.call('GET', KEYS[2]) or '0'
+local ttl = tonumber(ARGV[3])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+    redis.call('EXPIRE', KEYS[2], ttl)
+    redis.call('EXPIRE', ARGV[1] .. checkpoint_id, ttl)
+    redis.call('EXPIRE', ARGV[2] .. checkpoint_id, ttl)
+    local chain = redis.call('HGET', ARGV[1] .. checkpoint_id, 'messages_chain')
+    if chain then
+        for ancestor_id in string.gmatch(chain, '[^,]+') do
+            redis.call('EXPIRE', ARGV[1] .. ancestor_id, ttl)
+        end
+    end
+end
+if version == ARGV[4] then
+    return {checkpoint_id, version}
+end
+return {
+    checkpoint_id,
+    version,
+    redis.call('HGETALL', ARGV[1] .. checkpoint_id),
+    redis.call('HGETALL', ARGV[2] .. checkpoint_id),
+}
+"""
+
+# Compact one thread: keep the newest ARGV[3] checkpoints (all if 0) and the
+# ancestors their messages are rebuilt from, and drop the writes of every
+# checkpoint but the newest. KEYS[1] is the thread's index; ARGV[1] and
+# ARGV[2] are the checkpoint and writes key prefixes.
+# Returns {checkpoints deleted, writes keys deleted, bytes reclaimed}.
+COMPACT_THREAD_SCRIPT = """
+local function key_bytes(key)
+    local ok, usage = pcall(redis.call, 'MEMORY', 'USAGE', key)
+    if ok and usage then
+        return usage
+    end
+    local size = 0
+    for _, item in ipairs(redis.call('HGETALL', key)) do
+        size = size + #item
+    end
+    return size
+end
+
+local ids = redis.call('ZREVRANGEBYLEX', KEYS[1], '+', '-')
+local keep = tonumber(ARGV[3])
+if keep <= 0 or keep > #ids then
+    keep = #ids
+end
+local needed = {}
+for i = 1, keep do
+    needed[ids[i]] = true
+    local chain = redis.call('HGET', ARGV[1] .. ids[i], 'messages_chain')
+    if chain then
+        for ancestor_id in string.gmatch(chain, '[^,]+') do
+            needed[ancestor_id] = true
+        end
+    end
+end
+
+local checkpoints, writes, reclaimed = 0, 0, 0
+for i = 2, #ids do
+    local writes_key = ARGV[2] .. ids[i]
+    if redis.call('EXISTS', writes_key) == 1 then
+        reclaimed = reclaimed + key_bytes(writes_key)
+        redis.call('DEL', writes_key)
+        writes = writes + 1
+    end
+    if not needed[ids[i]] then
+        local checkpoint_key = ARGV[1] .. ids[i]
+        reclaimed = reclaimed + key_bytes(checkpoint_key)
+        redis.call('DEL', checkpoint_key)
+        redis.call('ZREM', KEYS[1], ids[i])
+        checkpoints = checkpoints + 1
+    end
+end
+return {checkpoints, writes, reclaimed}
+"""
+
+# Remove compacted threads (ARGV[2..]) from THREADS_KEY (KEYS[1]), except those
+# written again during the compaction, whose score is now past the cutoff ARGV[1].
+# Returns the number removed.
+DEQUEUE_COMPACTED_SCRIPT = """
+local removed = 0
+local cutoff = tonumber(ARGV[1])
+for i = 2, #ARGV do
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if score and tonumber(score) <= cutoff then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        removed = removed + 1
+    end
+end
+return removed
+"""
+
+# Utility functions for key construction and parsing
+
+def _make_redis_checkpoint_key(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
     """Make a Redis checkpoint key.
-    
+
     Args:
         thread_id: The thread ID
         checkpoint_ns: The checkpoint namespace
-        checkpoint_id: The checkpoint ID (can be None for new conversations)
-        
+        checkpoint_id: The checkpoint ID
+
     Returns:
         A Redis key string
     """
-    # If checkpoint_id is None, generate a new one
-    if checkpoint_id is None:
-        checkpoint_id = _generate_new_checkpoint_id()
-    return REDIS_KEY_SEPARATOR.join(["checkpoint", thread_id, checkpoint_ns, checkpoint_id])
+    return REDIS_KEY_SEPARATOR.join(["checkpoint", hash_tag(thread_id), checkpoint_ns, checkpoint_id])
+
+def _make_redis_checkpoint_index_key(thread_id: str, checkpoint_ns: str) -> str:
+    """Make the key of the sorted set indexing a thread's checkpoint ids."""
+    return REDIS_KEY_SEPARATOR.join(["checkpoint_index", hash_tag(thread_id), checkpoint_ns])
+
+def _make_redis_checkpoint_version_key(thread_id: str, checkpoint_ns: str) -> str:
+    """Make the key of the counter bumped by every write to a thread."""
+    return REDIS_KEY_SEPARATOR.join(["checkpoint_version", hash_tag(thread_id), checkpoint_ns])
+
+def _make_redis_writes_key(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+    """Make the key of the hash holding a checkpoint's pending writes."""
+    return REDIS_KEY_SEPARATOR.join(["writes", hash_tag(thread_id), checkpoint_ns, checkpoint_id])
+
+def _make_thread_member(thread_id: str, checkpoint_ns: str) -> str:
+    """Make the member of THREADS_KEY that identifies a thread and namespace."""
+    return REDIS_KEY_SEPARATOR.join([thread_id, checkpoint_ns])
+
+def _pairs_to_dict(flat: List[bytes]) -> Dict[bytes, bytes]:
+    """Turn a flat HGETALL reply from a Lua script into a dict."""
+    return dict(zip(flat[::2], flat[1::2]))
 
 def _parse_redis_checkpoint_key(redis_key: str) -> dict:
     try:
         # Ensure redis_key is a string
         if isinstance(redis_key, bytes):
             redis_key = redis_key.decode()
-        
+
         parts = redis_key.split(REDIS_KEY_SEPARATOR)
         if len(parts) != 4:
             logger.error(f"Invalid Redis key format: {redis_key}")
@@ -59,7 +268,7 @@ def _parse_redis_checkpoint_key(redis_key: str) -> dict:
                 "checkpoint_ns": "",
                 "checkpoint_id": "",
             }
-            
+
         namespace, thread_id, checkpoint_ns, checkpoint_id = parts
         if namespace != "checkpoint":
             logger.error(f"Expected checkpoint key to start with 'checkpoint', got: {namespace}")
@@ -68,9 +277,9 @@ def _parse_redis_checkpoint_key(redis_key: str) -> dict:
                 "checkpoint_ns": "",
                 "checkpoint_id": "",
             }
-            
+
         return {
-            "thread_id": thread_id or "",
+            "thread_id": strip_hash_tag(thread_id) if thread_id else "",
             "checkpoint_ns": checkpoint_ns or "",
             "checkpoint_id": checkpoint_id or "",
         }
@@ -82,11 +291,50 @@ def _parse_redis_checkpoint_key(redis_key: str) -> dict:
             "checkpoint_id": "",
         }
 
-def _parse_redis_checkpoint_data(serde: SerializerProtocol, key: str, data: dict) -> Optional[CheckpointTuple]:
+def _dump_redis_checkpoint_data(
+    serde: SerializerProtocol,
+    codec: CheckpointCodec,
+    checkpoint: Checkpoint,
+    metadata: CheckpointMetadata,
+    parent_checkpoint_id: Optional[str],
+) -> Dict[str, Any]:
+    """Serialize a checkpoint and its metadata into the fields of its hash."""
+    type_, serialized_checkpoint = serde.dumps_typed(checkpoint)
+    metadata_type, serialized_metadata = serde.dumps_typed(metadata)
+    return {
+        "checkpoint": codec.encode(serialized_checkpoint),
+        "type": type_,
+        "metadata": codec.encode(serialized_metadata),
+        "metadata_type": metadata_type,
+        "parent_checkpoint_id": parent_checkpoint_id or "",
+    }
+
+def _dump_redis_write_data(serde: SerializerProtocol, codec: CheckpointCodec, task_path: str, channel: str, value: Any) -> bytes:
+    """Serialize a pending write into the value of its field in the writes hash."""
+    type_, serialized_value = serde.dumps_typed(value)
+    return WRITE_FIELD_SEPARATOR.join([channel.encode(), task_path.encode(), type_.encode(), codec.encode(serialized_value)])
+
+def _parse_redis_writes_data(serde: SerializerProtocol, codec: CheckpointCodec, data: Dict[bytes, bytes]) -> List[Tuple[str, str, Any]]:
+    """Deserialize a checkpoint's writes hash into pending writes ordered by task and index."""
+    parsed = []
+    for field, packed in data.items():
+        task_id, idx = field.decode().rsplit(REDIS_KEY_SEPARATOR, 1)
+        channel, _task_path, type_, serialized_value = packed.split(WRITE_FIELD_SEPARATOR, 3)
+        value = serde.loads_typed((type_.decode(), codec.decode(serialized_value)))
+        parsed.append(((task_id, int(idx)), (task_id, channel.decode(), value)))
+    return [write for _, write in sorted(parsed, key=lambda item: item[0])]
+
+def _parse_redis_checkpoint_data(
+    serde: SerializerProtocol,
+    key: str,
+    data: dict,
+    pending_writes: Optional[List[Tuple[str, str, Any]]] = None,
+    codec: Optional[CheckpointCodec] = None,
+) -> Optional[CheckpointTuple]:
     if not data:
-        logger.debug(f"No data found for key: {key}")
+        logger.debug("No data found for key: %s", key)
         return None
-        
+
     try:
         parsed_key = _parse_redis_checkpoint_key(key)
         thread_id = parsed_key["thread_id"]
@@ -99,23 +347,18 @@ def _parse_redis_checkpoint_data(serde: SerializerProtocol, key: str, data: dict
                 "checkpoint_id": checkpoint_id,
             }
         }
-        
-        # Log the raw data for debugging
-        logger.debug(f"Raw data for key {key}: {data}")
-        
+
         # Extract and validate required fields
         checkpoint_type = data.get(b"type")
         checkpoint_data = data.get(b"checkpoint")
+        metadata_type = data.get(b"metadata_type")
         metadata = data.get(b"metadata")
         parent_checkpoint_id = data.get(b"parent_checkpoint_id")
-        
-        # Log extracted values
-        logger.debug(f"Extracted values - type: {checkpoint_type}, data: {checkpoint_data}, metadata: {metadata}, parent_id: {parent_checkpoint_id}")
-        
-        if not checkpoint_type or not checkpoint_data:
+
+        if not checkpoint_type or not checkpoint_data or not metadata_type:
             logger.error(f"Missing required checkpoint data for key: {key}")
             return None
-            
+
         # Handle parent_checkpoint_id safely
         parent_checkpoint_id_str = ""
         if parent_checkpoint_id is not None:
@@ -124,21 +367,14 @@ def _parse_redis_checkpoint_data(serde: SerializerProtocol, key: str, data: dict
             except (AttributeError, UnicodeDecodeError) as e:
                 logger.warning(f"Error decoding parent_checkpoint_id: {e}")
                 parent_checkpoint_id_str = ""
-        
+
         # Parse checkpoint and metadata
         try:
+            if codec is not None:
+                checkpoint_data, metadata = codec.decode(checkpoint_data), codec.decode(metadata)
             checkpoint = serde.loads_typed((checkpoint_type.decode(), checkpoint_data))
-            
-            # Parse metadata only if it exists
-            metadata_dict = None
-            if metadata is not None:
-                try:
-                    parsed_metadata = serde.loads_typed(metadata.decode())
-                    if isinstance(parsed_metadata, dict):
-                        metadata_dict = parsed_metadata
-                except (AttributeError, UnicodeDecodeError) as e:
-                    logger.warning(f"Error decoding metadata: {e}")
-            
+            metadata_dict = serde.loads_typed((metadata_type.decode(), metadata))
+
             # Create parent config only if we have a valid parent_checkpoint_id
             parent_config = None
             if parent_checkpoint_id_str:
@@ -149,64 +385,503 @@ def _parse_redis_checkpoint_data(serde: SerializerProtocol, key: str, data: dict
                         "checkpoint_id": parent_checkpoint_id_str,
                     }
                 }
-            
+
             return CheckpointTuple(
                 config=config,
                 checkpoint=checkpoint,
-                metadata=metadata_dict,  # Allow None metadata
+                metadata=metadata_dict,
                 parent_config=parent_config,
-                pending_writes=None,
+                pending_writes=pending_writes or [],
             )
         except Exception as e:
             logger.error(f"Error parsing checkpoint data: {str(e)}")
             return None
-            
+
     except Exception as e:
         logger.error(f"Error in _parse_redis_checkpoint_data for key {key}: {str(e)}")
         return None
 
+def _metadata_matches(checkpoint_tuple: CheckpointTuple, filter: Optional[Dict[str, Any]]) -> bool:
+    """Check a checkpoint's metadata against a list() filter."""
+    if not filter:
+        return True
+    metadata = checkpoint_tuple.metadata or {}
+    return all(metadata.get(query_key) == query_value for query_key, query_value in filter.items())
+
+def _to_hash_reply(data: Dict[str, Any]) -> Dict[bytes, bytes]:
+    """Turn the fields written with HSET into the dict HGETALL returns for them."""
+    return {field.encode(): value if isinstance(value, bytes) else str(value).encode() for field, value in data.items()}
+
+def _messages_chain(data: Dict[bytes, bytes]) -> List[str]:
+    """Get the ancestor ids whose message segments precede a checkpoint's own, oldest first."""
+    chain = data.get(b"messages_chain") or b""
+    return chain.decode().split(",") if chain else []
+
+def _copy_messages(messages: Sequence[Any]) -> List[Any]:
+    """Copy a message list so callers never share message objects with the cache."""
+    return [copy.copy(message) for message in messages]
+
+def _lex_upper_bound(before: Optional[RunnableConfig]) -> str:
+    """Get the ZREVRANGEBYLEX upper bound for a `before` config."""
+    before_checkpoint_id = get_checkpoint_id(before) if before else None
+    return f"({before_checkpoint_id}" if before_checkpoint_id else "+"
+
 class RedisCheckpointer(BaseCheckpointSaver):
     """LangGraph checkpointer implementation using Redis (sync and async)."""
-    def __init__(self, redis_url: Optional[str] = None, ttl: Optional[int] = None, serde: Optional[SerializerProtocol] = None):
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl: Optional[int] = None,
+        max_checkpoints_per_thread: int = CHECKPOINT_MAX_PER_THREAD,
+        serde: Optional[SerializerProtocol] = None,
+        codec: Optional[CheckpointCodec] = None,
+        delta_messages: bool = CHECKPOINT_DELTA_MESSAGES,
+        latest_cache_size: int = CHECKPOINT_LATEST_CACHE_SIZE,
+    ):
         super().__init__()
         try:
             import redis
             if not hasattr(redis, 'asyncio'):
                 raise ImportError("The installed redis package doesn't support asyncio")
-            self.redis_module = redis
-            self.async_redis_module = redis.asyncio
         except ImportError:
             raise ImportError(
                 "Redis asyncio support is required. Make sure you have redis>=4.2.0 installed via 'pip install redis>=4.2.0'."
             )
         self.redis_url = redis_url or os.getenv("REDIS_URL")
-        self.ttl = ttl
+        # Seconds of inactivity before a thread's keys expire; None keeps them forever
+        self.ttl = ttl if ttl is not None else (CHECKPOINT_TTL or None)
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
         if not self.redis_url:
             raise ValueError("Redis URL is required. Set REDIS_URL environment variable or provide it as a parameter.")
-        self.redis = self.redis_module.from_url(self.redis_url)
-        self.async_redis = self.async_redis_module.from_url(self.redis_url)
+        self.redis = get_redis(self.redis_url)
+        self.async_redis = get_async_redis(self.redis_url)
         self.serde = serde or JsonPlusSerializer()
+        self.codec = codec or CheckpointCodec()
+        self.delta_messages = delta_messages
+        # checkpoint id -> (full message list, delta chain) of recently written or read checkpoints
+        self._messages_cache: "OrderedDict[str, Tuple[List[Any], List[str]]]" = OrderedDict()
+        self._messages_cache_lock = threading.Lock()
+        # (thread id, namespace) -> (version, checkpoint id, checkpoint hash, writes hash) of the latest checkpoint
+        self._latest_cache: "OrderedDict[Tuple[str, str], Tuple[int, str, Dict[bytes, bytes], Dict[bytes, bytes]]]" = OrderedDict()
+        self._latest_cache_lock = threading.Lock()
+        self.latest_cache_size = latest_cache_size
+        self._latest_cache_stats: Dict[str, int] = defaultdict(int)
+        self._latest_checkpoint_script = self.redis.register_script(LATEST_CHECKPOINT_SCRIPT)
+        self._async_latest_checkpoint_script = self.async_redis.register_script(LATEST_CHECKPOINT_SCRIPT)
+        self._compact_thread_script = self.redis.register_script(COMPACT_THREAD_SCRIPT)
+        self._async_compact_thread_script = self.async_redis.register_script(COMPACT_THREAD_SCRIPT)
+        self._dequeue_compacted_script = self.redis.register_script(DEQUEUE_COMPACTED_SCRIPT)
+        self._async_dequeue_compacted_script = self.async_redis.register_script(DEQUEUE_COMPACTED_SCRIPT)
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._compaction: Dict[str, float] = defaultdict(float)
+        self._calls: Dict[str, int] = defaultdict(int)
+        self._round_trips: Dict[str, int] = defaultdict(int)
+        self._bytes_written: Dict[str, int] = defaultdict(int)
         logger.info("Initialized Redis checkpointer")
 
+    def _count_round_trips(self, operation: str, round_trips: int = 1) -> None:
+        """Record the round trips spent on one call of an operation."""
+        self._calls[operation] += 1
+        self._round_trips[operation] += round_trips
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get calls, round trips and bytes written per operation."""
+        stats = {
+            operation: {
+                "calls": calls,
+                "round_trips": self._round_trips[operation],
+                "round_trips_per_call": round(self._round_trips[operation] / calls, 2),
+            }
+            for operation, calls in list(self._calls.items())
+        }
+        for operation, written in list(self._bytes_written.items()):
+            if operation in stats:
+                stats[operation]["bytes_written"] = written
+                stats[operation]["bytes_per_call"] = round(written / stats[operation]["calls"])
+        if self._compaction:
+            stats["compaction"] = dict(self._compaction)
+        with self._latest_cache_lock:
+            cache_stats, cached_threads = dict(self._latest_cache_stats), len(self._latest_cache)
+        if cache_stats:
+            cache_stats = {"hits": 0, "misses": 0, **cache_stats}
+            lookups = cache_stats["hits"] + cache_stats["misses"]
+            stats["latest_cache"] = {
+                **cache_stats,
+                "hit_rate": round(cache_stats["hits"] / lookups, 2) if lookups else 0.0,
+                "threads": cached_threads,
+            }
+        return stats
+
+    def _queue_expire(self, pipe: Any, keys: List[str]) -> None:
+        """Queue a TTL refresh of some keys on a pipeline, if a TTL is configured."""
+        if self.ttl:
+            for key in keys:
+                pipe.expire(key, self.ttl)
+
+    def _cache_messages(self, checkpoint_id: str, messages: List[Any], chain: List[str]) -> None:
+        """Remember a checkpoint's full message list for delta encoding and reads."""
+        with self._messages_cache_lock:
+            self._messages_cache[checkpoint_id] = (messages, chain)
+            self._messages_cache.move_to_end(checkpoint_id)
+            while len(self._messages_cache) > CHECKPOINT_MESSAGES_CACHE_SIZE:
+                self._messages_cache.popitem(last=False)
+
+    def _cached_messages(self, checkpoint_id: Optional[str]) -> Optional[Tuple[List[Any], List[str]]]:
+        """Get a cached full message list and delta chain, if present."""
+        if not checkpoint_id:
+            return None
+        with self._messages_cache_lock:
+            entry = self._messages_cache.get(checkpoint_id)
+            if entry is not None:
+                self._messages_cache.move_to_end(checkpoint_id)
+            return entry
+
+    def _cached_latest(self, thread_id: str, checkpoint_ns: str) -> Optional[Tuple[int, str, Dict[bytes, bytes], Dict[bytes, bytes]]]:
+        """Get the cached latest checkpoint of a thread, refreshing its LRU position."""
+        with self._latest_cache_lock:
+            entry = self._latest_cache.get((thread_id, checkpoint_ns))
+            if entry is not None:
+                self._latest_cache.move_to_end((thread_id, checkpoint_ns))
+            return entry
+
+    def _cache_latest(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        version: int,
+        checkpoint_id: str,
+        data: Dict[bytes, bytes],
+        writes_data: Dict[bytes, bytes],
+    ) -> None:
+        """Remember the latest checkpoint of a thread as of a version of its counter."""
+        if self.latest_cache_size <= 0:
+            return
+        with self._latest_cache_lock:
+            self._latest_cache[(thread_id, checkpoint_ns)] = (version, checkpoint_id, data, writes_data)
+            self._latest_cache.move_to_end((thread_id, checkpoint_ns))
+            while len(self._latest_cache) > self.latest_cache_size:
+                self._latest_cache.popitem(last=False)
+
+    def _forget_latest(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Drop the cached latest checkpoint of a thread."""
+        with self._latest_cache_lock:
+            self._latest_cache.pop((thread_id, checkpoint_ns), None)
+
+    def _cache_put(self, next_config: RunnableConfig, data: Dict[str, Any], version: int, messages: Optional[List[Any]] = None) -> None:
+        """Cache a checkpoint this worker just stored as its thread's latest.
+
+        Called once the pipeline storing it has succeeded, so neither cache
+        ever holds a checkpoint Redis does not. Its full message list (if it
+        was delta-encoded) is remembered for encoding its children.
+
+        As in _cache_put_writes, the checkpoint is only cached when the counter
+        moved by exactly this call from the cached version (or this is the
+        thread's first write); otherwise another worker may have stored a newer
+        checkpoint in between, and the cached copy is dropped.
+        """
+        thread_id = next_config["configurable"]["thread_id"]
+        checkpoint_ns = next_config["configurable"]["checkpoint_ns"]
+        checkpoint_id = next_config["configurable"]["checkpoint_id"]
+        if messages is not None:
+            chain = [ancestor_id for ancestor_id in data.get("messages_chain", "").split(",") if ancestor_id]
+            self._cache_messages(checkpoint_id, messages, chain)
+        entry = self._cached_latest(thread_id, checkpoint_ns)
+        if entry is None and version != 1:
+            return
+        if entry is not None and (entry[0] != version - 1 or entry[1] > checkpoint_id):
+            # Another worker wrote to the thread, or an older checkpoint was (re)written
+            self._forget_latest(thread_id, checkpoint_ns)
+            return
+        self._cache_latest(thread_id, checkpoint_ns, version, checkpoint_id, _to_hash_reply(data), {})
+
+    def _cache_put_writes(self, config: RunnableConfig, fields: List[Tuple[bytes, bytes, bool]], version: int) -> None:
+        """Apply pending writes this worker just stored to the cached latest checkpoint.
+
+        The cached copy is only updated when the counter moved by exactly this
+        call; otherwise another worker wrote to the thread and it is dropped.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        entry = self._cached_latest(thread_id, checkpoint_ns)
+        if entry is None:
+            return
+        cached_version, checkpoint_id, data, writes_data = entry
+        if cached_version != version - 1:
+            self._forget_latest(thread_id, checkpoint_ns)
+            return
+        if checkpoint_id == config["configurable"]["checkpoint_id"]:
+            writes_data = dict(writes_data)
+            for field, packed, replace in fields:
+                if replace or field not in writes_data:
+                    writes_data[field] = packed
+        self._cache_latest(thread_id, checkpoint_ns, version, checkpoint_id, data, writes_data)
+
+    def _dump_messages(self, checkpoint_id: str, parent_checkpoint_id: Optional[str], messages: List[Any]) -> Dict[str, Any]:
+        """Serialize the messages channel as a delta against the parent, or as a full snapshot."""
+        segment, chain = messages, []
+        parent = self._cached_messages(parent_checkpoint_id)
+        if parent is not None:
+            parent_messages, parent_chain = parent
+            # Only appended messages can be stored as a delta; edits and removals need a snapshot
+            if (
+                len(parent_chain) < CHECKPOINT_FULL_SNAPSHOT_INTERVAL
+                and len(parent_messages) <= len(messages)
+                and messages[:len(parent_messages)] == parent_messages
+            ):
+                segment, chain = messages[len(parent_messages):], parent_chain + [parent_checkpoint_id]
+
+        messages_type, serialized_messages = self.serde.dumps_typed(segment)
+        return {
+            "messages": self.codec.encode(serialized_messages),
+            "messages_type": messages_type,
+            "messages_chain": ",".join(chain),
+        }
+
+    def _load_segment(self, data: Dict[bytes, bytes]) -> List[Any]:
+        """Deserialize the message segment stored in one checkpoint hash."""
+        return self.serde.loads_typed((data[b"messages_type"].decode(), self.codec.decode(data[b"messages"])))
+
+    def _missing_segments(self, loaded: Dict[str, Dict[bytes, bytes]]) -> List[str]:
+        """Get the ancestor ids whose message segments must be fetched to rebuild loaded checkpoints."""
+        missing = []
+        for checkpoint_id, data in loaded.items():
+            if self._cached_messages(checkpoint_id) is not None:
+                continue
+            for ancestor_id in reversed(_messages_chain(data)):
+                if self._cached_messages(ancestor_id) is not None:
+                    break
+                if ancestor_id not in loaded and ancestor_id not in missing:
+                    missing.append(ancestor_id)
+        return missing
+
+    def _queue_segment_reads(self, pipe: Any, thread_id: str, checkpoint_ns: str, checkpoint_ids: List[str]) -> None:
+        """Queue the reads of ancestor message segments on a pipeline."""
+        for checkpoint_id in checkpoint_ids:
+            pipe.hmget(_make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id), "messages", "messages_type")
+        # Ancestors are read through their descendants, so keep them alive as long
+        self._queue_expire(pipe, [_make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in checkpoint_ids])
+
+    @staticmethod
+    def _segment_replies(checkpoint_ids: List[str], replies: List[Any]) -> Dict[str, Dict[bytes, bytes]]:
+        """Turn HMGET replies of _queue_segment_reads into segment hashes."""
+        return {
+            checkpoint_id: {b"messages": messages, b"messages_type": messages_type}
+            for checkpoint_id, (messages, messages_type) in zip(checkpoint_ids, replies)
+            if messages is not None and messages_type is not None
+        }
+
+    def _rebuild_messages(self, checkpoint_id: str, segments: Dict[str, Dict[bytes, bytes]], decoded: Dict[str, List[Any]]) -> List[Any]:
+        """Rebuild a checkpoint's full message list from cached lists and stored segments.
+
+        Args:
+            checkpoint_id: The checkpoint to rebuild
+            segments: Checkpoint hashes (or segment hashes) by id, including the checkpoint's own
+            decoded: Segments already deserialized during this read, by id
+
+        Returns:
+            The full message list, owned by the caller
+        """
+        cached = self._cached_messages(checkpoint_id)
+        if cached is not None:
+            return _copy_messages(cached[0])
+
+        chain = _messages_chain(segments[checkpoint_id])
+        messages, start = [], 0
+        for i in range(len(chain) - 1, -1, -1):
+            ancestor = self._cached_messages(chain[i])
+            if ancestor is not None:
+                messages, start = list(ancestor[0]), i + 1
+                break
+        for segment_id in chain[start:] + [checkpoint_id]:
+            if segment_id not in decoded:
+                if segment_id not in segments:
+                    raise ValueError(f"Message segment of checkpoint {segment_id} is missing")
+                decoded[segment_id] = self._load_segment(segments[segment_id])
+            messages.extend(decoded[segment_id])
+        self._cache_messages(checkpoint_id, _copy_messages(messages), chain)
+        return _copy_messages(messages)
+
+    def _parse_checkpoint(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        data: dict,
+        writes_data: dict,
+        segments: Optional[Dict[str, Dict[bytes, bytes]]] = None,
+        decoded: Optional[Dict[str, List[Any]]] = None,
+    ) -> Optional[CheckpointTuple]:
+        """Build a checkpoint tuple from its hash and its writes hash.
+
+        Args:
+            thread_id: The thread ID
+            checkpoint_ns: The checkpoint namespace
+            checkpoint_id: The checkpoint ID
+            data: The checkpoint hash
+            writes_data: The checkpoint's writes hash
+            segments: Hashes holding the message segments of the checkpoint's delta chain
+            decoded: Segments already deserialized during this read, by id
+
+        Returns:
+            The checkpoint tuple, or None if it is missing or cannot be parsed
+        """
+        key = _make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
+        if not data:
+            logger.debug("No checkpoint data found for key: %s", key)
+            return None
+        checkpoint_tuple = _parse_redis_checkpoint_data(
+            self.serde, key, data, _parse_redis_writes_data(self.serde, self.codec, writes_data), self.codec
+        )
+        if checkpoint_tuple is not None and b"messages_type" in data:
+            try:
+                segments = {**(segments or {}), checkpoint_id: data}
+                messages = self._rebuild_messages(checkpoint_id, segments, decoded if decoded is not None else {})
+            except Exception as e:
+                logger.error(f"Error rebuilding messages for key {key}: {e}")
+                return None
+            checkpoint_tuple.checkpoint["channel_values"][MESSAGES_CHANNEL] = messages
+        return checkpoint_tuple
+
+    def _parse_checkpoints(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        loaded: Dict[str, Tuple[dict, dict]],
+        segments: Dict[str, Dict[bytes, bytes]],
+    ) -> Dict[str, Optional[CheckpointTuple]]:
+        """Parse loaded checkpoints oldest first, so each one can build on its parent's messages."""
+        segments = {**segments, **{checkpoint_id: data for checkpoint_id, (data, _) in loaded.items() if data}}
+        decoded: Dict[str, List[Any]] = {}
+        return {
+            checkpoint_id: self._parse_checkpoint(thread_id, checkpoint_ns, checkpoint_id, data, writes_data, segments, decoded)
+            for checkpoint_id, (data, writes_data) in sorted(loaded.items())
+        }
+
+    def _queue_checkpoint_reads(self, pipe: Any, thread_id: str, checkpoint_ns: str, checkpoint_ids: List[str]) -> None:
+        """Queue the reads of some checkpoints and their writes on a pipeline."""
+        for checkpoint_id in checkpoint_ids:
+            pipe.hgetall(_make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+            pipe.hgetall(_make_redis_writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        # TTL refreshes come after the reads, so reply positions stay the same
+        self._queue_expire(pipe, [
+            _make_redis_checkpoint_index_key(thread_id, checkpoint_ns),
+            _make_redis_checkpoint_version_key(thread_id, checkpoint_ns),
+        ])
+        for checkpoint_id in checkpoint_ids:
+            self._queue_expire(pipe, [
+                _make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id),
+                _make_redis_writes_key(thread_id, checkpoint_ns, checkpoint_id),
+            ])
+
+    @staticmethod
+    def _checkpoint_replies(checkpoint_ids: List[str], replies: List[Any]) -> Dict[str, Tuple[dict, dict]]:
+        """Pair the replies of _queue_checkpoint_reads with their checkpoint ids."""
+        return {checkpoint_id: (replies[2 * i], replies[2 * i + 1]) for i, checkpoint_id in enumerate(checkpoint_ids)}
+
+    def _load_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids: List[str]) -> Tuple[List[Optional[CheckpointTuple]], int]:
+        """Load checkpoints and their pending writes.
+
+        This is one round trip, plus one more when message segments of the
+        delta chains are neither in the batch nor in the cache.
+
+        Returns:
+            The checkpoint tuples in the order of checkpoint_ids, and the round trips spent
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        self._queue_checkpoint_reads(pipe, thread_id, checkpoint_ns, checkpoint_ids)
+        loaded = self._checkpoint_replies(checkpoint_ids, pipe.execute())
+        segments, round_trips = {}, 1
+        missing = self._missing_segments({checkpoint_id: data for checkpoint_id, (data, _) in loaded.items() if data})
+        if missing:
+            pipe = self.redis.pipeline(transaction=False)
+            self._queue_segment_reads(pipe, thread_id, checkpoint_ns, missing)
+            segments, round_trips = self._segment_replies(missing, pipe.execute()), 2
+        parsed = self._parse_checkpoints(thread_id, checkpoint_ns, loaded, segments)
+        return [parsed[checkpoint_id] for checkpoint_id in checkpoint_ids], round_trips
+
+    async def _aload_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids: List[str]) -> Tuple[List[Optional[CheckpointTuple]], int]:
+        """Async variant of _load_checkpoints."""
+        pipe = self.async_redis.pipeline(transaction=False)
+        self._queue_checkpoint_reads(pipe, thread_id, checkpoint_ns, checkpoint_ids)
+        loaded = self._checkpoint_replies(checkpoint_ids, await pipe.execute())
+        segments, round_trips = {}, 1
+        missing = self._missing_segments({checkpoint_id: data for checkpoint_id, (data, _) in loaded.items() if data})
+        if missing:
+            pipe = self.async_redis.pipeline(transaction=False)
+            self._queue_segment_reads(pipe, thread_id, checkpoint_ns, missing)
+            segments, round_trips = self._segment_replies(missing, await pipe.execute()), 2
+        parsed = self._parse_checkpoints(thread_id, checkpoint_ns, loaded, segments)
+        return [parsed[checkpoint_id] for checkpoint_id in checkpoint_ids], round_trips
+
+    def _latest_script_args(self, thread_id: str, checkpoint_ns: str, cached: Optional[Tuple] = None) -> Dict[str, List[Any]]:
+        """Keys and arguments of LATEST_CHECKPOINT_SCRIPT for a thread and its cached latest checkpoint."""
+        return {
+            "keys": [
+                _make_redis_checkpoint_index_key(thread_id, checkpoint_ns),
+                _make_redis_checkpoint_version_key(thread_id, checkpoint_ns),
+            ],
+            "args": [
+                _make_redis_checkpoint_key(thread_id, checkpoint_ns, ""),
+                _make_redis_writes_key(thread_id, checkpoint_ns, ""),
+                self.ttl or 0,
+                cached[0] if cached is not None else "",
+            ],
+        }
+
+    @staticmethod
+    def _latest_reply_is_stale(reply: Any, cached: Optional[Tuple]) -> bool:
+        """Whether the script confirmed a version whose cached checkpoint is not the latest.
+
+        This only happens when a thread expired and was written again up to
+        the same counter value; the checkpoint has to be fetched again.
+        """
+        return bool(reply) and len(reply) == 2 and (cached is None or cached[1] != reply[0].decode())
+
+    def _latest_reply(self, thread_id: str, checkpoint_ns: str, reply: Any, cached: Optional[Tuple]) -> Tuple[str, dict, dict]:
+        """Unpack the reply of LATEST_CHECKPOINT_SCRIPT, serving the payload from the cache when it is current."""
+        if len(reply) == 2:
+            with self._latest_cache_lock:
+                self._latest_cache_stats["hits"] += 1
+            return cached[1], cached[2], cached[3]
+        checkpoint_id, version, data, writes_data = reply
+        checkpoint_id, data, writes_data = checkpoint_id.decode(), _pairs_to_dict(data), _pairs_to_dict(writes_data)
+        if self.latest_cache_size > 0:
+            with self._latest_cache_lock:
+                self._latest_cache_stats["misses"] += 1
+            self._cache_latest(thread_id, checkpoint_ns, int(version), checkpoint_id, data, writes_data)
+        return checkpoint_id, data, writes_data
+
     def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
         try:
             thread_id = config["configurable"]["thread_id"]
-            checkpoint_id = get_checkpoint_id(config)
             checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-            key = _make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
-            
-            logger.debug(f"Attempting to get checkpoint data for key: {key}")
-            logger.debug(f"Config: {config}")
-            
-            data = self.redis.hgetall(key)
-            if not data:
-                logger.debug(f"No checkpoint data found for key: {key}")
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id:
+                checkpoint_tuples, round_trips = self._load_checkpoints(thread_id, checkpoint_ns, [checkpoint_id])
+                self._count_round_trips("get_tuple", round_trips)
+                return checkpoint_tuples[0]
+
+            # Latest checkpoint: the largest id in the thread's index, unless the cached copy is current
+            cached = self._cached_latest(thread_id, checkpoint_ns)
+            reply = self._latest_checkpoint_script(**self._latest_script_args(thread_id, checkpoint_ns, cached))
+            round_trips = 1
+            if self._latest_reply_is_stale(reply, cached):
+                cached = None
+                reply = self._latest_checkpoint_script(**self._latest_script_args(thread_id, checkpoint_ns))
+                round_trips += 1
+            if not reply:
+                self._forget_latest(thread_id, checkpoint_ns)
+                self._count_round_trips("get_tuple", round_trips)
                 return None
-                
-            logger.debug(f"Raw data from Redis: {data}")
-            result = _parse_redis_checkpoint_data(self.serde, key, data)
-            logger.debug(f"Parsed checkpoint data: {result}")
-            return result
+            checkpoint_id, data, writes_data = self._latest_reply(thread_id, checkpoint_ns, reply, cached)
+            segments = {}
+            missing = self._missing_segments({checkpoint_id: data})
+            if missing:
+                pipe = self.redis.pipeline(transaction=False)
+                self._queue_segment_reads(pipe, thread_id, checkpoint_ns, missing)
+                segments, round_trips = self._segment_replies(missing, pipe.execute()), round_trips + 1
+            self._count_round_trips("get_tuple", round_trips)
+            return self._parse_checkpoint(thread_id, checkpoint_ns, checkpoint_id, data, writes_data, segments)
         except Exception as e:
             logger.error(f"Error in get_tuple: {e}")
             return None
@@ -214,306 +889,345 @@ class RedisCheckpointer(BaseCheckpointSaver):
     async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
         try:
             thread_id = config["configurable"]["thread_id"]
-            checkpoint_id = get_checkpoint_id(config)
             checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-            key = _make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
-            
-            logger.debug(f"Attempting to get checkpoint data for key: {key}")
-            logger.debug(f"Config: {config}")
-            
-            data = await self.async_redis.hgetall(key)
-            if not data:
-                logger.debug(f"No checkpoint data found for key: {key}")
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id:
+                checkpoint_tuples, round_trips = await self._aload_checkpoints(thread_id, checkpoint_ns, [checkpoint_id])
+                self._count_round_trips("get_tuple", round_trips)
+                return checkpoint_tuples[0]
+
+            # Latest checkpoint: the largest id in the thread's index, unless the cached copy is current
+            cached = self._cached_latest(thread_id, checkpoint_ns)
+            reply = await self._async_latest_checkpoint_script(**self._latest_script_args(thread_id, checkpoint_ns, cached))
+            round_trips = 1
+            if self._latest_reply_is_stale(reply, cached):
+                cached = None
+                reply = await self._async_latest_checkpoint_script(**self._latest_script_args(thread_id, checkpoint_ns))
+                round_trips += 1
+            if not reply:
+                self._forget_latest(thread_id, checkpoint_ns)
+                self._count_round_trips("get_tuple", round_trips)
                 return None
-                
-            logger.debug(f"Raw data from Redis: {data}")
-            result = _parse_redis_checkpoint_data(self.serde, key, data)
-            logger.debug(f"Parsed checkpoint data: {result}")
-            return result
+            checkpoint_id, data, writes_data = self._latest_reply(thread_id, checkpoint_ns, reply, cached)
+            segments = {}
+            missing = self._missing_segments({checkpoint_id: data})
+            if missing:
+                pipe = self.async_redis.pipeline(transaction=False)
+                self._queue_segment_reads(pipe, thread_id, checkpoint_ns, missing)
+                segments, round_trips = self._segment_replies(missing, await pipe.execute()), round_trips + 1
+            self._count_round_trips("get_tuple", round_trips)
+            return self._parse_checkpoint(thread_id, checkpoint_ns, checkpoint_id, data, writes_data, segments)
         except Exception as e:
             logger.error(f"Error in aget_tuple: {e}")
             return None
 
-    async def put(self, config: RunnableConfig, checkpoint: Any, metadata: Any, new_versions: Any) -> RunnableConfig:
-        try:
-            thread_id = config["configurable"]["thread_id"]
-            checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-            current_checkpoint_id = config["configurable"].get("checkpoint_id")
-            checkpoint_id = current_checkpoint_id if current_checkpoint_id else checkpoint["id"]
-            
-            key = _make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
-
-            # Log the original data for debugging
-            logger.debug(f"Original checkpoint: {checkpoint}")
-            logger.debug(f"Original metadata: {metadata}")
-
-            type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
-            # Use get_checkpoint_metadata to process metadata like MemorySaver
-            serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
-            
-            data = {
-                "checkpoint": serialized_checkpoint,
-                "type": type_,
-                "metadata": serialized_metadata,
-                "parent_checkpoint_id": current_checkpoint_id if current_checkpoint_id else "",
+    def _queue_put(
+        self, pipe: Any, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata
+    ) -> Tuple[RunnableConfig, Dict[str, Any], Optional[List[Any]]]:
+        """Queue the writes that store a checkpoint on a pipeline.
+
+        The first reply of the pipeline is the thread's new version.
+
+        Returns:
+            The config of the stored checkpoint, the fields of its hash, and a
+            copy of its delta-encoded messages for _cache_put (None if not delta-encoded)
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        # The config points at the parent; the new checkpoint is stored under its own id
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        checkpoint_id = checkpoint["id"]
+
+        channel_values = checkpoint.get("channel_values") or {}
+        messages = channel_values.get(MESSAGES_CHANNEL)
+        cached_messages = None
+        if self.delta_messages and isinstance(messages, list):
+            # The messages channel is stored (delta-encoded) next to the checkpoint, not inside it
+            stored_checkpoint = {
+                **checkpoint,
+                "channel_values": {channel: value for channel, value in channel_values.items() if channel != MESSAGES_CHANNEL},
             }
-            
-            # Log the serialized data for debugging
-            logger.debug(f"Serialized data for key {key}: {data}")
-            
-            self.redis.hset(key, mapping=data)
-            return {
-                "configurable": {
-                    "thread_id": thread_id,
-                    "checkpoint_ns": checkpoint_ns,
-                    "checkpoint_id": checkpoint_id,
-                }
+            data = _dump_redis_checkpoint_data(self.serde, self.codec, stored_checkpoint, get_checkpoint_metadata(config, metadata), parent_checkpoint_id)
+            data.update(self._dump_messages(checkpoint_id, parent_checkpoint_id, messages))
+            cached_messages = _copy_messages(messages)
+        else:
+            data = _dump_redis_checkpoint_data(self.serde, self.codec, checkpoint, get_checkpoint_metadata(config, metadata), parent_checkpoint_id)
+        self._bytes_written["put"] += sum(len(value) for value in data.values())
+        pipe.incr(_make_redis_checkpoint_version_key(thread_id, checkpoint_ns))
+        pipe.hset(_make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id), mapping=data)
+        pipe.zadd(_make_redis_checkpoint_index_key(thread_id, checkpoint_ns), {checkpoint_id: 0})
+        # Register the thread for the next compaction
+        pipe.zadd(THREADS_KEY, {_make_thread_member(thread_id, checkpoint_ns): time.time()})
+        ancestor_ids = [ancestor_id for ancestor_id in data.get("messages_chain", "").split(",") if ancestor_id]
+        self._queue_expire(pipe, [
+            _make_redis_checkpoint_index_key(thread_id, checkpoint_ns),
+            _make_redis_checkpoint_version_key(thread_id, checkpoint_ns),
+            _make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id),
+            *[_make_redis_checkpoint_key(thread_id, checkpoint_ns, ancestor_id) for ancestor_id in ancestor_ids],
+        ])
+        next_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
             }
+        }
+        return next_config, data, cached_messages
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            next_config, data, messages = self._queue_put(pipe, config, checkpoint, metadata)
+            replies = pipe.execute()
+            self._cache_put(next_config, data, replies[0], messages)
+            self._count_round_trips("put")
+            return next_config
         except Exception as e:
             logger.error(f"Error in put: {e}")
             raise
 
-    async def aput(self, config: RunnableConfig, checkpoint: Any, metadata: Any, new_versions: Any) -> RunnableConfig:
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
         try:
-            thread_id = config["configurable"]["thread_id"]
-            checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-            current_checkpoint_id = config["configurable"].get("checkpoint_id")
-            checkpoint_id = current_checkpoint_id if current_checkpoint_id else checkpoint["id"]
-            
-            key = _make_redis_checkpoint_key(thread_id, checkpoint_ns, checkpoint_id)
-
-            # Log the original data for debugging
-            logger.debug(f"Original checkpoint: {checkpoint}")
-            logger.debug(f"Original metadata: {metadata}")
-
-            # Serialize checkpoint and metadata
-            type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
-            serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
-            
-            # Ensure all values are bytes for Redis storage
-            data = {
-                b"checkpoint": serialized_checkpoint if isinstance(serialized_checkpoint, bytes) else str(serialized_checkpoint).encode(),
-                b"type": type_.encode() if isinstance(type_, str) else str(type_).encode(),
-                b"metadata": serialized_metadata if isinstance(serialized_metadata, bytes) else str(serialized_metadata).encode(),
-                b"parent_checkpoint_id": (current_checkpoint_id if current_checkpoint_id else "").encode() if isinstance(current_checkpoint_id, str) else str(current_checkpoint_id or "").encode(),
-            }
-            
-            # Log the serialized data for debugging
-            logger.debug(f"Serialized data for key {key}: {data}")
-            
-            await self.async_redis.hset(key, mapping=data)
-            return {
-                "configurable": {
-                    "thread_id": thread_id,
-                    "checkpoint_ns": checkpoint_ns,
-                    "checkpoint_id": checkpoint_id,
-                }
-            }
+            pipe = self.async_redis.pipeline(transaction=False)
+            next_config, data, messages = self._queue_put(pipe, config, checkpoint, metadata)
+            replies = await pipe.execute()
+            self._cache_put(next_config, data, replies[0], messages)
+            self._count_round_trips("put")
+            return next_config
         except Exception as e:
             logger.error(f"Error in aput: {e}")
             raise
 
-    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+    def _queue_put_writes(
+        self, pipe: Any, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str
+    ) -> List[Tuple[bytes, bytes, bool]]:
+        """Queue the writes that store a task's pending writes on a pipeline.
+
+        The first reply of the pipeline is the thread's new version.
+
+        Returns:
+            The (field, value, replaces existing value) of every write
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        key = _make_redis_writes_key(thread_id, checkpoint_ns, checkpoint_id)
+        version_key = _make_redis_checkpoint_version_key(thread_id, checkpoint_ns)
+        pipe.incr(version_key)
+
+        fields = []
+
+        for idx, (channel, value) in enumerate(writes):
+            # Special channels (errors, interrupts, ...) have fixed negative indices
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            field = f"{task_id}{REDIS_KEY_SEPARATOR}{write_idx}"
+            packed = _dump_redis_write_data(self.serde, self.codec, task_path, channel, value)
+            self._bytes_written["put_writes"] += len(packed)
+            # Regular writes are stored once; special channel writes replace the previous one
+            if write_idx >= 0:
+                pipe.hsetnx(key, field, packed)
+            else:
+                pipe.hset(key, field, packed)
+            fields.append((field.encode(), packed, write_idx < 0))
+        self._queue_expire(pipe, [key, version_key])
+        return fields
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
         try:
-            thread_id = config["configurable"]["thread_id"]
-            checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-            checkpoint_id = config["configurable"]["checkpoint_id"]
-            
-            # Create outer key pattern for checking existing writes
-            outer_key_pattern = f"writes${thread_id}${checkpoint_ns}${checkpoint_id}*"
-            existing_writes = self.redis.keys(outer_key_pattern)
-            existing_write_map = {}
-            
-            # Create map of existing writes
-            for write_key in existing_writes:
-                write_data = self.redis.hgetall(write_key)
-                if write_data:
-                    channel = write_data[b"channel"].decode()
-                    idx = int(write_key.split(REDIS_KEY_SEPARATOR)[-1])
-                    existing_write_map[(task_id, WRITES_IDX_MAP.get(channel, idx))] = True
-            
-            # Process new writes
-            for idx, (channel, value) in enumerate(writes):
-                inner_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
-                
-                # Skip if write already exists
-                if inner_key[1] >= 0 and inner_key in existing_write_map:
-                    continue
-                
-                # Create write key
-                key = f"writes${thread_id}${checkpoint_ns}${checkpoint_id}${task_id}${idx}"
-                
-                # Serialize value
-                type_, serialized_value = self.serde.dumps_typed(value)
-                
-                # Store write data
-                data = {
-                    "channel": channel,
-                    "type": type_,
-                    "value": serialized_value,
-                    "task_id": task_id,
-                    "task_path": task_path
-                }
-                
-                self.redis.hset(key, mapping=data)
-                
+            pipe = self.redis.pipeline(transaction=False)
+            fields = self._queue_put_writes(pipe, config, writes, task_id, task_path)
+            replies = pipe.execute()
+            self._cache_put_writes(config, fields, replies[0])
+            self._count_round_trips("put_writes")
         except Exception as e:
             logger.error(f"Error in put_writes: {e}")
             raise
 
-    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
         try:
-            thread_id = config["configurable"]["thread_id"]
-            checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-            checkpoint_id = config["configurable"]["checkpoint_id"]
-            
-            # Create outer key pattern for checking existing writes
-            outer_key_pattern = f"writes${thread_id}${checkpoint_ns}${checkpoint_id}*"
-            existing_writes = await self.async_redis.keys(outer_key_pattern)
-            existing_write_map = {}
-            
-            # Create map of existing writes
-            for write_key in existing_writes:
-                write_data = await self.async_redis.hgetall(write_key)
-                if write_data:
-                    channel = write_data[b"channel"].decode()
-                    idx = int(write_key.split(REDIS_KEY_SEPARATOR)[-1])
-                    existing_write_map[(task_id, WRITES_IDX_MAP.get(channel, idx))] = True
-            
-            # Process new writes
-            for idx, (channel, value) in enumerate(writes):
-                inner_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
-                
-                # Skip if write already exists
-                if inner_key[1] >= 0 and inner_key in existing_write_map:
-                    continue
-                
-                # Create write key
-                key = f"writes${thread_id}${checkpoint_ns}${checkpoint_id}${task_id}${idx}"
-                
-                # Serialize value
-                type_, serialized_value = self.serde.dumps_typed(value)
-                
-                # Store write data
-                data = {
-                    "channel": channel,
-                    "type": type_,
-                    "value": serialized_value,
-                    "task_id": task_id,
-                    "task_path": task_path
-                }
-                
-                await self.async_redis.hset(key, mapping=data)
-                
+            pipe = self.async_redis.pipeline(transaction=False)
+            fields = self._queue_put_writes(pipe, config, writes, task_id, task_path)
+            replies = await pipe.execute()
+            self._cache_put_writes(config, fields, replies[0])
+            self._count_round_trips("put_writes")
         except Exception as e:
             logger.error(f"Error in aput_writes: {e}")
             raise
 
-    def list(self, config: Optional[RunnableConfig], filter: Optional[dict] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+    def _list_checkpoint_ids(self, thread_id: str, checkpoint_ns: str, before: Optional[RunnableConfig], limit: Optional[int]) -> List[str]:
+        """Get checkpoint ids newest first, optionally below `before` and capped at `limit`."""
+        index_key = _make_redis_checkpoint_index_key(thread_id, checkpoint_ns)
+        if limit:
+            ids = self.redis.zrevrangebylex(index_key, _lex_upper_bound(before), "-", start=0, num=limit)
+        else:
+            ids = self.redis.zrevrangebylex(index_key, _lex_upper_bound(before), "-")
+        return [checkpoint_id.decode() for checkpoint_id in ids]
+
+    async def _alist_checkpoint_ids(self, thread_id: str, checkpoint_ns: str, before: Optional[RunnableConfig], limit: Optional[int]) -> List[str]:
+        """Async variant of _list_checkpoint_ids."""
+        index_key = _make_redis_checkpoint_index_key(thread_id, checkpoint_ns)
+        if limit:
+            ids = await self.async_redis.zrevrangebylex(index_key, _lex_upper_bound(before), "-", start=0, num=limit)
+        else:
+            ids = await self.async_redis.zrevrangebylex(index_key, _lex_upper_bound(before), "-")
+        return [checkpoint_id.decode() for checkpoint_id in ids]
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
         try:
             if config is None:
-                return iter([])
+                return
             thread_id = config["configurable"]["thread_id"]
             checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
             config_checkpoint_id = get_checkpoint_id(config)
-            pattern = _make_redis_checkpoint_key(thread_id, checkpoint_ns, "*")
-            keys = self.redis.keys(pattern)
-            keys = sorted(keys, key=lambda k: _parse_redis_checkpoint_key(k.decode())["checkpoint_id"], reverse=True)
-            
-            if limit:
-                keys = keys[:limit]
-                
-            for key in keys:
-                data = self.redis.hgetall(key)
-                if not data or b"checkpoint" not in data or b"metadata" not in data:
-                    continue
-                    
-                parsed_key = _parse_redis_checkpoint_key(key.decode())
-                checkpoint_id = parsed_key["checkpoint_id"]
-                
-                # Filter by checkpoint ID from config
-                if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
-                    continue
-                    
-                # Filter by checkpoint ID from `before` config
-                if before and (before_checkpoint_id := get_checkpoint_id(before)) and checkpoint_id >= before_checkpoint_id:
-                    continue
-                    
-                # Parse metadata using loads_typed
-                metadata = self.serde.loads_typed(data[b"metadata"].decode())
-                
-                # Filter by metadata
-                if filter and not all(
-                    query_value == metadata.get(query_key)
-                    for query_key, query_value in filter.items()
-                ):
-                    continue
-                    
-                # Get writes for this checkpoint
-                writes_pattern = f"writes${thread_id}${checkpoint_ns}${checkpoint_id}*"
-                write_keys = self.redis.keys(writes_pattern)
-                writes = []
-                for write_key in write_keys:
-                    write_data = self.redis.hgetall(write_key)
-                    if write_data:
-                        channel = write_data[b"channel"].decode()
-                        value = self.serde.loads_typed(write_data[b"value"].decode())
-                        writes.append((channel, value))
-                        
-                # Get parent checkpoint ID
-                parent_checkpoint_id = data.get(b"parent_checkpoint_id")
-                if parent_checkpoint_id:
-                    parent_checkpoint_id = parent_checkpoint_id.decode()
-                    
-                # Parse checkpoint
-                checkpoint_type = data[b"type"].decode()
-                checkpoint_data = data[b"checkpoint"]
-                checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_data))
-                
-                # Create parent config if parent_checkpoint_id exists
-                parent_config = None
-                if parent_checkpoint_id:
-                    parent_config = {
-                        "configurable": {
-                            "thread_id": thread_id,
-                            "checkpoint_ns": checkpoint_ns,
-                            "checkpoint_id": parent_checkpoint_id,
-                        }
-                    }
-                    
-                yield CheckpointTuple(
-                    config={
-                        "configurable": {
-                            "thread_id": thread_id,
-                            "checkpoint_ns": checkpoint_ns,
-                            "checkpoint_id": checkpoint_id,
-                        }
-                    },
-                    checkpoint=checkpoint,
-                    metadata=metadata,
-                    parent_config=parent_config,
-                    pending_writes=writes,
-                )
-                
+
+            round_trips = 0
+            if config_checkpoint_id:
+                checkpoint_ids = [config_checkpoint_id]
+            else:
+                # A metadata filter can reject ids, so only cap the index read when there is none
+                checkpoint_ids = self._list_checkpoint_ids(thread_id, checkpoint_ns, before, None if filter else limit)
+                round_trips += 1
+
+            yielded = 0
+            batch_size = limit if limit and not filter else LIST_BATCH_SIZE
+            try:
+                for start in range(0, len(checkpoint_ids), batch_size):
+                    batch = checkpoint_ids[start:start + batch_size]
+                    checkpoint_tuples, batch_round_trips = self._load_checkpoints(thread_id, checkpoint_ns, batch)
+                    round_trips += batch_round_trips
+                    for checkpoint_tuple in checkpoint_tuples:
+                        if checkpoint_tuple is None or not _metadata_matches(checkpoint_tuple, filter):
+                            continue
+                        yield checkpoint_tuple
+                        yielded += 1
+                        if limit and yielded >= limit:
+                            return
+            finally:
+                self._count_round_trips("list", round_trips)
+
         except Exception as e:
             logger.error(f"Error in list: {e}")
-            return iter([])
+            return
 
-    async def alist(self, config: Optional[RunnableConfig], filter: Optional[dict] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None):
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
         try:
             if config is None:
                 return
             thread_id = config["configurable"]["thread_id"]
             checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-            pattern = _make_redis_checkpoint_key(thread_id, checkpoint_ns, "*")
-            keys = await self.async_redis.keys(pattern)
-            keys = sorted(keys, key=lambda k: _parse_redis_checkpoint_key(k.decode())["checkpoint_id"], reverse=True)
-            if limit:
-                keys = keys[:limit]
-            for key in keys:
-                data = await self.async_redis.hgetall(key)
-                if data and b"checkpoint" in data and b"metadata" in data:
-                    yield _parse_redis_checkpoint_data(self.serde, key.decode(), data)
+            config_checkpoint_id = get_checkpoint_id(config)
+
+            round_trips = 0
+            if config_checkpoint_id:
+                checkpoint_ids = [config_checkpoint_id]
+            else:
+                # A metadata filter can reject ids, so only cap the index read when there is none
+                checkpoint_ids = await self._alist_checkpoint_ids(thread_id, checkpoint_ns, before, None if filter else limit)
+                round_trips += 1
+
+            yielded = 0
+            batch_size = limit if limit and not filter else LIST_BATCH_SIZE
+            try:
+                for start in range(0, len(checkpoint_ids), batch_size):
+                    batch = checkpoint_ids[start:start + batch_size]
+                    checkpoint_tuples, batch_round_trips = await self._aload_checkpoints(thread_id, checkpoint_ns, batch)
+                    round_trips += batch_round_trips
+                    for checkpoint_tuple in checkpoint_tuples:
+                        if checkpoint_tuple is None or not _metadata_matches(checkpoint_tuple, filter):
+                            continue
+                        yield checkpoint_tuple
+                        yielded += 1
+                        if limit and yielded >= limit:
+                            return
+            finally:
+                self._count_round_trips("list", round_trips)
+
         except Exception as e:
             logger.error(f"Error in alist: {e}")
-            return 
\ No newline at end of file
+            return
+
+    def _compact_script_args(self, member: bytes) -> Dict[str, List[Any]]:
+        """Keys and arguments of COMPACT_THREAD_SCRIPT for a THREADS_KEY member."""
+        thread_id, checkpoint_ns = member.decode().split(REDIS_KEY_SEPARATOR, 1)
+        return {
+            "keys": [_make_redis_checkpoint_index_key(thread_id, checkpoint_ns)],
+            "args": [
+                _make_redis_checkpoint_key(thread_id, checkpoint_ns, ""),
+                _make_redis_writes_key(thread_id, checkpoint_ns, ""),
+                self.max_checkpoints_per_thread,
+            ],
+        }
+
+    def _record_compaction(self, threads: int, replies: List[Any], started: float) -> Dict[str, int]:
+        """Add the replies of one compaction to the counters and summarize it."""
+        checkpoints = sum(reply[0] for reply in replies)
+        writes = sum(reply[1] for reply in replies)
+        reclaimed = sum(reply[2] for reply in replies)
+        self._compaction["runs"] += 1
+        self._compaction["threads_compacted"] += threads
+        self._compaction["checkpoints_deleted"] += checkpoints
+        self._compaction["writes_deleted"] += writes
+        self._compaction["keys_reclaimed"] += checkpoints + writes
+        self._compaction["bytes_reclaimed"] += reclaimed
+        self._compaction["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return {"threads": threads, "keys_reclaimed": checkpoints + writes, "bytes_reclaimed": reclaimed}
+
+    def compact(self) -> Dict[str, int]:
+        """Compact every thread written to since the last compaction.
+
+        Returns:
+            The threads compacted and the keys and bytes reclaimed
+        """
+        started, cutoff = time.perf_counter(), time.time()
+        threads, replies = 0, []
+        while True:
+            members = self.redis.zrangebyscore(THREADS_KEY, "-inf", cutoff, start=0, num=COMPACTION_BATCH_SIZE)
+            if not members:
+                break
+            # Cluster pipelines cannot carry scripts, and each thread may live on another shard
+            replies.extend(self._compact_thread_script(**self._compact_script_args(member)) for member in members)
+            # A thread written during the pass keeps its newer score and is compacted next time
+            self._dequeue_compacted_script(keys=[THREADS_KEY], args=[repr(cutoff), *members])
+            threads += len(members)
+        return self._record_compaction(threads, replies, started)
+
+    async def acompact(self) -> Dict[str, int]:
+        """Async variant of compact()."""
+        started, cutoff = time.perf_counter(), time.time()
+        threads, replies = 0, []
+        while True:
+            members = await self.async_redis.zrangebyscore(THREADS_KEY, "-inf", cutoff, start=0, num=COMPACTION_BATCH_SIZE)
+            if not members:
+                break
+            # As in compact(), but with the threads' scripts running concurrently
+            replies.extend(await asyncio.gather(*(
+                self._async_compact_thread_script(**self._compact_script_args(member)) for member in members
+            )))
+            await self._async_dequeue_compacted_script(keys=[THREADS_KEY], args=[repr(cutoff), *members])
+            threads += len(members)
+        return self._record_compaction(threads, replies, started)
+
+    async def _compaction_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await self.acompact()
+                if result["keys_reclaimed"]:
+                    logger.info(f"Checkpoint compaction: {result}")
+            except Exception as e:
+                logger.error(f"Error compacting checkpoints: {e}")
+
+    def start_background_compaction(self, interval: float = CHECKPOINT_COMPACTION_INTERVAL) -> None:
+        """Start compacting recently written threads on the running event loop."""
+        if self._compaction_task is None or self._compaction_task.done():
+            self._compaction_task = asyncio.get_running_loop().create_task(self._compaction_loop(interval))
+
+    async def stop_background_compaction(self) -> None:
+        """Stop the background compaction task."""
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            try:
+                await self._compaction_task
+            except asyncio.CancelledError:
+                pass
+            self._compaction_task = None
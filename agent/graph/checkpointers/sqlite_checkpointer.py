@@ -0,0 +1,340 @@
+"""SQLite Checkpointer for LangGraph
+
+This module implements a LangGraph checkpointer on a local SQLite file, for
+single-node and edge deployments (e.g. one Cloud Run container) that want
+durable checkpoints without a network hop to Redis.
+
+The database runs in WAL mode with synchronous=NORMAL, so readers never
+block the writer and a commit costs an append to the log rather than an
+fsync. Both tables are keyed by (thread_id, checkpoint_ns, checkpoint_id),
+so every lookup is an index range scan; checkpoint ids are time-ordered
+(uuid6), so the latest checkpoint is simply the largest id. Statements are
+constant SQL strings, which sqlite3 compiles once per connection and keeps
+in its statement cache. A put, or all writes of one put_writes call, is a
+single transaction.
+
+Each thread that touches the checkpointer gets its own connection; the
+async methods run the sync ones in worker threads. A process forked from
+one that used the checkpointer (a pre-forked server worker) opens its own
+connections rather than sharing the parent's. Payloads share the
+serializer and the CheckpointCodec used by the Redis checkpointer.
+
+Environment Variables:
+    SQLITE_CHECKPOINT_PATH: Path of the database file (default: checkpoints.sqlite)
+    SQLITE_BUSY_TIMEOUT_MS: Milliseconds to wait for a lock held by another connection (default: 5000)
+"""
+
+import os
+import asyncio
+import logging
+import sqlite3
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langchain_core.runnables import RunnableConfig
+from agent.graph.checkpointers.codec import CheckpointCodec
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SQLITE_CHECKPOINT_PATH = os.getenv("SQLITE_CHECKPOINT_PATH", "checkpoints.sqlite")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Statements kept compiled per connection
+STATEMENT_CACHE_SIZE = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+"""
+
+INSERT_CHECKPOINT = """
+INSERT OR REPLACE INTO checkpoints
+    (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Regular writes are stored once; special channel writes replace the previous one
+INSERT_WRITE = """
+INSERT OR IGNORE INTO writes
+    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, task_path, type, value)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+REPLACE_WRITE = INSERT_WRITE.replace("INSERT OR IGNORE", "INSERT OR REPLACE")
+SELECT_CHECKPOINT = """
+SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata
+FROM checkpoints
+WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+"""
+SELECT_LATEST_CHECKPOINT = """
+SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata
+FROM checkpoints
+WHERE thread_id = ? AND checkpoint_ns = ?
+ORDER BY checkpoint_id DESC
+LIMIT 1
+"""
+SELECT_CHECKPOINTS = """
+SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata
+FROM checkpoints
+WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?
+ORDER BY checkpoint_id DESC
+LIMIT ?
+"""
+SELECT_WRITES = """
+SELECT task_id, channel, type, value
+FROM writes
+WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+ORDER BY task_id, idx
+"""
+
+# Upper bound above every uuid checkpoint id, for SELECT_CHECKPOINTS without `before`
+MAX_CHECKPOINT_ID = "\uffff"
+# Rows fetched per query while list() applies a metadata filter
+LIST_BATCH_SIZE = 50
+
+
+class _Transaction:
+    """Context manager running a block in one transaction on a connection."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute("BEGIN")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """LangGraph checkpointer implementation using a local SQLite database (sync and async)."""
+
+    def __init__(self, path: Optional[str] = None, serde: Optional[SerializerProtocol] = None, codec: Optional[CheckpointCodec] = None):
+        """Initialize the SqliteCheckpointer.
+
+        Args:
+            path: Path of the database file; it is opened once per thread, so ":memory:" is not supported
+            serde: Serializer for checkpoints and writes
+            codec: Codec for serialized payloads
+        """
+        super().__init__()
+        self.path = path or SQLITE_CHECKPOINT_PATH
+        if self.path == ":memory:":
+            raise ValueError("SqliteCheckpointer needs a database file; use MemorySaver for in-memory checkpoints")
+        self.serde = serde or JsonPlusSerializer()
+        self.codec = codec or CheckpointCodec()
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+        # A connection must not be used across fork; forked children open their own
+        checkpointer = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: checkpointer() is not None and checkpointer()._forget_connections())
+        logger.info(f"Initialized SQLite checkpointer at {self.path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening and tuning it on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA temp_store=MEMORY")
+            self._local.connection = connection
+        return connection
+
+    def _forget_connections(self) -> None:
+        """Drop the connections inherited from the parent process without closing them."""
+        self._local = threading.local()
+
+    def _transaction(self) -> _Transaction:
+        """Start a transaction on this thread's connection."""
+        return _Transaction(self._connection())
+
+    def _load_writes(self, connection: sqlite3.Connection, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        """Load a checkpoint's pending writes ordered by task and index."""
+        return [
+            (task_id, channel, self.serde.loads_typed((type_, self.codec.decode(value))))
+            for task_id, channel, type_, value in connection.execute(SELECT_WRITES, (thread_id, checkpoint_ns, checkpoint_id))
+        ]
+
+    def _to_tuple(self, connection: sqlite3.Connection, thread_id: str, checkpoint_ns: str, row: Tuple[Any, ...]) -> CheckpointTuple:
+        """Build a checkpoint tuple from a checkpoints row."""
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, self.codec.decode(checkpoint))),
+            metadata=self.serde.loads_typed((metadata_type, self.codec.decode(metadata))),
+            parent_config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_checkpoint_id,
+                }
+            } if parent_checkpoint_id else None,
+            pending_writes=self._load_writes(connection, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        try:
+            with self._transaction() as connection:
+                if checkpoint_id:
+                    row = connection.execute(SELECT_CHECKPOINT, (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+                else:
+                    row = connection.execute(SELECT_LATEST_CHECKPOINT, (thread_id, checkpoint_ns)).fetchone()
+                if row is None:
+                    return None
+                return self._to_tuple(connection, thread_id, checkpoint_ns, row)
+        except Exception as e:
+            logger.error(f"Error in get_tuple: {e}")
+            return None
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    def _list_tuples(self, config: RunnableConfig, filter: Optional[Dict[str, Any]], before: Optional[RunnableConfig], limit: Optional[int]) -> List[CheckpointTuple]:
+        """Load the checkpoints list() yields, newest first."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        config_checkpoint_id = get_checkpoint_id(config)
+        upper_bound = (get_checkpoint_id(before) if before else None) or MAX_CHECKPOINT_ID
+
+        results = []
+        with self._transaction() as connection:
+            while True:
+                if config_checkpoint_id:
+                    rows = connection.execute(SELECT_CHECKPOINT, (thread_id, checkpoint_ns, config_checkpoint_id)).fetchall()
+                else:
+                    # A metadata filter can reject rows, so only push the limit down when there is none
+                    batch_size = limit if limit and not filter else LIST_BATCH_SIZE
+                    rows = connection.execute(SELECT_CHECKPOINTS, (thread_id, checkpoint_ns, upper_bound, batch_size)).fetchall()
+                for row in rows:
+                    checkpoint_tuple = self._to_tuple(connection, thread_id, checkpoint_ns, row)
+                    metadata = checkpoint_tuple.metadata or {}
+                    if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                        continue
+                    results.append(checkpoint_tuple)
+                    if limit and len(results) >= limit:
+                        return results
+                if config_checkpoint_id or len(rows) < (limit if limit and not filter else LIST_BATCH_SIZE):
+                    return results
+                upper_bound = rows[-1][0]
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        if config is None:
+            return
+        try:
+            checkpoint_tuples = self._list_tuples(config, filter, before, limit)
+        except Exception as e:
+            logger.error(f"Error in list: {e}")
+            return
+        yield from checkpoint_tuples
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None, before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        if config is None:
+            return
+        try:
+            checkpoint_tuples = await asyncio.to_thread(self._list_tuples, config, filter, before, limit)
+        except Exception as e:
+            logger.error(f"Error in alist: {e}")
+            return
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        # The config points at the parent; the new checkpoint is stored under its own id
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        try:
+            with self._transaction() as connection:
+                connection.execute(INSERT_CHECKPOINT, (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    parent_checkpoint_id,
+                    type_,
+                    self.codec.encode(serialized_checkpoint),
+                    metadata_type,
+                    self.codec.encode(serialized_metadata),
+                ))
+        except Exception as e:
+            logger.error(f"Error in put: {e}")
+            raise
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        inserts, replaces = [], []
+        for idx, (channel, value) in enumerate(writes):
+            # Special channels (errors, interrupts, ...) have fixed negative indices
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, serialized_value = self.serde.dumps_typed(value)
+            row = (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, task_path, type_, self.codec.encode(serialized_value))
+            (inserts if write_idx >= 0 else replaces).append(row)
+        try:
+            with self._transaction() as connection:
+                if inserts:
+                    connection.executemany(INSERT_WRITE, inserts)
+                if replaces:
+                    connection.executemany(REPLACE_WRITE, replaces)
+        except Exception as e:
+            logger.error(f"Error in put_writes: {e}")
+            raise
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
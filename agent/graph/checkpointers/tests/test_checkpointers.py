@@ -0,0 +1,290 @@
+"""Conformance tests for the checkpointers
+
+Every backend runs the same checks of the BaseCheckpointSaver contract
+LangGraph relies on, plus the real_flow workload from workload.py. The
+Redis backends run against fakeredis (requirements-dev.txt) and are
+skipped without it.
+
+The on-interrupt durability mode deliberately persists only the last
+checkpoint of a run, so it is held to the workload's end state rather than
+to the per-checkpoint contract.
+
+Run with: python -m pytest agent/graph/checkpointers/tests
+"""
+
+import asyncio
+import contextlib
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langchain_core.messages import HumanMessage
+from langgraph.constants import INTERRUPT
+from langgraph.types import Command
+from agent.graph.checkpointers.memory_checkpointer import BoundedMemoryCheckpointer
+from agent.graph.checkpointers.metered_checkpointer import MeteredCheckpointer
+from agent.graph.checkpointers.redis_checkpointer import THREADS_KEY, _make_thread_member
+from agent.graph.checkpointers.tests.workload import BACKENDS, build_flow_graph, fake_redis, make_checkpointer, run_workload
+from agent.graph.utils.metrics import CHECKPOINT_DURATION
+
+CONFORMANCE_BACKENDS = tuple(backend for backend in BACKENDS if not backend.endswith("+on-interrupt"))
+BUFFERED_BACKENDS = tuple(backend for backend in BACKENDS if "+" in backend)
+
+
+@pytest.fixture
+def make(request, tmp_path):
+    """Build checkpointers of the test's backend; Redis ones share one fakeredis server."""
+    backend = request.param
+    context = contextlib.nullcontext()
+    if backend.startswith("redis"):
+        pytest.importorskip("fakeredis")
+        context = fake_redis()
+    with context:
+        yield lambda: make_checkpointer(backend, str(tmp_path))
+
+
+def _config(thread_id="thread", checkpoint_ns="", checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def _checkpoint(**channel_values):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = channel_values
+    checkpoint["channel_versions"] = {channel: 1 for channel in channel_values}
+    return checkpoint
+
+
+def _put_chain(checkpointer, steps, thread_id="thread", checkpoint_ns=""):
+    """Put `steps` checkpoints, each the child of the previous one, and return their configs."""
+    config, configs = _config(thread_id, checkpoint_ns), []
+    for step in range(steps):
+        config = checkpointer.put(
+            config,
+            _checkpoint(step=step, documents=[f"document {step}"]),
+            {"source": "loop", "step": step, "writes": {}, "parents": {}, "label": f"step-{step}"},
+            {},
+        )
+        configs.append(config)
+    return configs
+
+
+conformance = pytest.mark.parametrize("make", CONFORMANCE_BACKENDS, indirect=True)
+
+
+@conformance
+def test_get_tuple_of_unknown_thread_is_none(make):
+    checkpointer = make()
+    assert checkpointer.get_tuple(_config("missing")) is None
+    assert list(checkpointer.list(_config("missing"))) == []
+
+
+@conformance
+def test_put_then_get_tuple(make):
+    checkpointer = make()
+    first, second = _put_chain(checkpointer, 2)
+
+    latest = checkpointer.get_tuple(_config())
+    assert latest.config["configurable"]["checkpoint_id"] == second["configurable"]["checkpoint_id"]
+    assert latest.parent_config["configurable"]["checkpoint_id"] == first["configurable"]["checkpoint_id"]
+    assert latest.checkpoint["channel_values"] == {"step": 1, "documents": ["document 1"]}
+    assert latest.metadata["step"] == 1
+    assert latest.metadata["label"] == "step-1"
+
+    by_id = checkpointer.get_tuple(first)
+    assert by_id.checkpoint["channel_values"]["step"] == 0
+    assert by_id.parent_config is None
+
+
+@conformance
+def test_pending_writes(make):
+    checkpointer = make()
+    (config,) = _put_chain(checkpointer, 1)
+    checkpointer.put_writes(config, [("answer", "a"), ("documents", ["d"])], "task-1")
+    # Regular writes are stored once per task and index
+    checkpointer.put_writes(config, [("answer", "ignored")], "task-1")
+    checkpointer.put_writes(config, [(INTERRUPT, "first")], "task-2")
+    # Special channel writes replace the previous one
+    checkpointer.put_writes(config, [(INTERRUPT, "second")], "task-2")
+
+    pending_writes = checkpointer.get_tuple(_config()).pending_writes
+    assert pending_writes == [
+        ("task-1", "answer", "a"),
+        ("task-1", "documents", ["d"]),
+        ("task-2", INTERRUPT, "second"),
+    ]
+
+
+@conformance
+def test_list(make):
+    checkpointer = make()
+    configs = _put_chain(checkpointer, 5)
+    ids = [config["configurable"]["checkpoint_id"] for config in configs]
+
+    listed = [checkpoint_tuple.config["configurable"]["checkpoint_id"] for checkpoint_tuple in checkpointer.list(_config())]
+    assert listed == ids[::-1]
+    assert [t.metadata["step"] for t in checkpointer.list(_config(), limit=2)] == [4, 3]
+    assert [t.metadata["step"] for t in checkpointer.list(_config(), before=configs[2])] == [1, 0]
+    assert [t.metadata["step"] for t in checkpointer.list(_config(), filter={"label": "step-3"})] == [3]
+
+
+@conformance
+def test_threads_and_namespaces_are_isolated(make):
+    checkpointer = make()
+    _put_chain(checkpointer, 3, thread_id="a")
+    _put_chain(checkpointer, 1, thread_id="b")
+    _put_chain(checkpointer, 2, thread_id="a", checkpoint_ns="child")
+
+    assert len(list(checkpointer.list(_config("a")))) == 3
+    assert len(list(checkpointer.list(_config("b")))) == 1
+    assert len(list(checkpointer.list(_config("a", "child")))) == 2
+    assert checkpointer.get_tuple(_config("a", "child")).metadata["step"] == 1
+
+
+@conformance
+def test_async_api_matches_sync(make):
+    checkpointer = make()
+
+    async def scenario():
+        config = _config()
+        for step in range(3):
+            config = await checkpointer.aput(config, _checkpoint(step=step), {"source": "loop", "step": step}, {})
+        await checkpointer.aput_writes(config, [("answer", "a")], "task")
+        latest = await checkpointer.aget_tuple(_config())
+        listed = [t async for t in checkpointer.alist(_config(), limit=2)]
+        return config, latest, listed
+
+    config, latest, listed = asyncio.run(scenario())
+    assert latest.config["configurable"]["checkpoint_id"] == config["configurable"]["checkpoint_id"]
+    assert latest.pending_writes == [("task", "answer", "a")]
+    assert [t.metadata["step"] for t in listed] == [2, 1]
+    assert checkpointer.get_tuple(_config()).checkpoint == latest.checkpoint
+
+
+@pytest.mark.parametrize("make", BACKENDS, indirect=True)
+def test_workload_resumes_every_conversation(make):
+    checkpointer = make()
+    result = asyncio.run(run_workload(checkpointer, threads=3, turns=2, concurrency=3, document_bytes=256))
+
+    for thread_id, state in result.final_states.items():
+        assert state["next"] == ()
+        # Each turn adds the question, the generation and the answer
+        assert [message.content for message in state["messages"]][-3:] == [f"question 1 of {thread_id}", state["generation"], "thanks 1"]
+        assert len(state["messages"]) == 6
+    assert result.stored_bytes > 0
+    assert result.summary()["ops_per_sec"] > 0
+
+
+@pytest.mark.parametrize("make", BUFFERED_BACKENDS, indirect=True)
+def test_buffered_turn_is_persisted_when_the_run_ends(make):
+    graph = build_flow_graph(document_bytes=64).compile(checkpointer=make())
+    config = {"configurable": {"thread_id": "thread"}}
+
+    async def turn():
+        await graph.ainvoke({"messages": [HumanMessage("question")]}, config)
+        await graph.ainvoke(Command(resume="thanks"), config)
+
+    asyncio.run(turn())
+    # Another worker sees the finished turn right away, without waiting for a background flush
+    latest = make().get_tuple(config)
+    assert [message.content for message in latest.checkpoint["channel_values"]["messages"]][-1] == "thanks"
+    assert latest.checkpoint["channel_values"]["answer"] == "thanks"
+
+
+@pytest.mark.parametrize("make", ["redis"], indirect=True)
+def test_redis_latest_checkpoint_is_served_from_worker_cache(make):
+    worker, other_worker = make(), make()
+    configs = _put_chain(worker, 2)
+
+    assert worker.get_tuple(_config()).config == configs[-1]
+    assert worker.get_stats()["latest_cache"]["hits"] == 1
+
+    # A write by another worker invalidates the cached copy
+    other_worker.put_writes(configs[-1], [("answer", "from elsewhere")], "task")
+    assert worker.get_tuple(_config()).pending_writes == [("task", "answer", "from elsewhere")]
+    assert worker.get_stats()["latest_cache"]["misses"] == 1
+
+
+@pytest.mark.parametrize("make", ["sqlite"], indirect=True)
+def test_metered_checkpointer_records_every_operation(make):
+    CHECKPOINT_DURATION.reset()
+    checkpointer = MeteredCheckpointer(make())
+    configs = _put_chain(checkpointer, 3)
+    checkpointer.put_writes(configs[-1], [("answer", "a")], "task")
+
+    assert checkpointer.get_tuple(_config()).pending_writes == [("task", "answer", "a")]
+    assert [t.metadata["step"] for t in checkpointer.list(_config(), limit=2)] == [2, 1]
+    counts = {labels[0]: int(value) for name, _, labels, value in CHECKPOINT_DURATION.samples() if name.endswith("_count")}
+    assert counts == {"put": 3, "put_writes": 1, "get_tuple": 1, "list": 1}
+
+
+def test_memory_spilled_thread_survives_reload_and_restart(tmp_path):
+    spill_path = str(tmp_path / "spill.db")
+    checkpointer = BoundedMemoryCheckpointer(max_bytes=1, spill_path=spill_path)
+    configs = _put_chain(checkpointer, 2, thread_id="a")
+    # Writing another thread evicts "a" to the spill file, and reading it loads it back
+    _put_chain(checkpointer, 1, thread_id="b")
+    assert checkpointer.get_tuple(_config("a")).config == configs[-1]
+
+    restarted = BoundedMemoryCheckpointer(spill_path=spill_path)
+    assert asyncio.run(restarted.aget_tuple(_config("a"))).config == configs[-1]
+
+
+@pytest.mark.parametrize("make", ["redis"], indirect=True)
+def test_redis_compaction_keeps_threads_written_during_the_pass(make):
+    checkpointer = make()
+    _put_chain(checkpointer, 2, thread_id="a")
+    member = _make_thread_member("a", "")
+    compact_thread = checkpointer._compact_thread_script
+
+    def compact_while_written(**kwargs):
+        reply = compact_thread(**kwargs)
+        _put_chain(checkpointer, 1, thread_id="a")
+        return reply
+
+    checkpointer._compact_thread_script = compact_while_written
+    assert checkpointer.compact()["threads"] == 1
+    assert checkpointer.redis.zscore(THREADS_KEY, member) is not None
+
+    checkpointer._compact_thread_script = compact_thread
+    assert checkpointer.compact()["threads"] == 1
+    assert checkpointer.redis.zscore(THREADS_KEY, member) is None
+
+
+@pytest.mark.parametrize("make", ["redis"], indirect=True)
+def test_redis_put_does_not_cache_over_a_newer_checkpoint_of_another_worker(make):
+    worker, other_worker = make(), make()
+    (config,) = _put_chain(worker, 1)
+    assert worker.get_tuple(_config()).config == config
+
+    older = _checkpoint(step="older")
+    newer = other_worker.put(_config(), _checkpoint(step="newer"), {"source": "loop", "step": 1}, {})
+    worker.put(_config(), older, {"source": "loop", "step": 1}, {})
+
+    # The worker cannot tell its checkpoint is still the latest, so it does not cache it
+    assert worker._cached_latest("thread", "") is None
+    assert worker.get_tuple(_config()).config == newer
+
+
+@pytest.mark.parametrize("make", ["redis"], indirect=True)
+def test_redis_failed_put_leaves_the_messages_cache_alone(make):
+    checkpointer = make()
+    checkpoint = _checkpoint(messages=[HumanMessage("question")])
+    pipeline = checkpointer.redis.pipeline
+
+    def unreachable():
+        raise ConnectionError("Redis is down")
+
+    def failing_pipeline(**kwargs):
+        pipe = pipeline(**kwargs)
+        pipe.execute = unreachable
+        return pipe
+
+    checkpointer.redis.pipeline = failing_pipeline
+    with pytest.raises(ConnectionError):
+        checkpointer.put(_config(), checkpoint, {"source": "loop", "step": 0}, {})
+    assert checkpointer._cached_messages(checkpoint["id"]) is None
+
+    checkpointer.redis.pipeline = pipeline
+    checkpointer.put(_config(), checkpoint, {"source": "loop", "step": 0}, {})
+    assert checkpointer._cached_messages(checkpoint["id"]) is not None
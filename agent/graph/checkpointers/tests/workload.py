@@ -0,0 +1,349 @@
+"""Checkpointer workload shared by the conformance tests and the benchmark
+
+The workload replays the shape of agent/graph/flows/real_flow.py against a
+stand-in graph without models: every turn appends a question, runs the
+initialize → decide_language → summarize → retrieve → grade_documents →
+generate → pre_human_in_loop chain, stops at the human_in_loop interrupt
+and is resumed with the user's answer. N threads run M turns each, so a
+backend sees the same mix of put, put_writes, interrupt writes and
+get_tuple calls it sees in production.
+
+Backends are built by name with make_checkpointer(). Without a Redis URL
+the Redis backends run against fakeredis, whose clients are swapped into
+agent.graph.utils.redis_client for the duration of fake_redis().
+
+Environment Variables:
+    BENCHMARK_REDIS_URL: Redis to run the Redis backends against instead of fakeredis
+"""
+
+import os
+import time
+import asyncio
+import contextlib
+import logging
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Annotated, Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple, TypedDict
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.types import Command, interrupt
+from agent.graph.checkpointers import BoundedMemoryCheckpointer, BufferedCheckpointer, SqliteCheckpointer
+from agent.graph.utils import redis_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BENCHMARK_REDIS_URL = os.getenv("BENCHMARK_REDIS_URL")
+
+BACKENDS = ("memory", "sqlite", "redis", "redis+async", "redis+on-interrupt")
+OPERATIONS = ("get_tuple", "put", "put_writes", "list")
+
+
+class FlowState(TypedDict):
+    messages: Annotated[list, add_messages]
+    question: str
+    language: str
+    summary: str
+    documents: List[str]
+    generation: str
+    answer: str
+
+
+def build_flow_graph(document_bytes: int = 2048) -> StateGraph:
+    """Build a model-free stand-in for real_flow with the same nodes, state and interrupt.
+
+    Args:
+        document_bytes: Size of each of the three retrieved documents
+    """
+    def initialize(state: FlowState) -> Dict[str, Any]:
+        return {"question": state["messages"][-1].content, "documents": [], "generation": ""}
+
+    def decide_language(state: FlowState) -> Dict[str, Any]:
+        return {"language": "python"}
+
+    def summarize(state: FlowState) -> Dict[str, Any]:
+        return {"summary": " ".join(message.content for message in state["messages"][-4:])[:512]}
+
+    def retrieve(state: FlowState) -> Dict[str, Any]:
+        return {"documents": [f"{state['question']} doc {i} ".ljust(document_bytes, "x") for i in range(3)]}
+
+    def grade_documents(state: FlowState) -> Dict[str, Any]:
+        return {"documents": state["documents"][:2]}
+
+    def generate(state: FlowState) -> Dict[str, Any]:
+        generation = f"Answer to {state['question']!r} in {state['language']}"
+        return {"generation": generation, "messages": [AIMessage(generation)]}
+
+    def pre_human_in_loop(state: FlowState) -> Dict[str, Any]:
+        return {"answer": ""}
+
+    def human_in_loop(state: FlowState) -> Dict[str, Any]:
+        return {"answer": interrupt({"generation": state["generation"]})}
+
+    def post_human_in_loop(state: FlowState) -> Dict[str, Any]:
+        return {"messages": [HumanMessage(state["answer"])]}
+
+    nodes = [
+        initialize, decide_language, summarize, retrieve, grade_documents,
+        generate, pre_human_in_loop, human_in_loop, post_human_in_loop,
+    ]
+    graph = StateGraph(FlowState)
+    for node in nodes:
+        graph.add_node(node.__name__, node)
+    graph.add_edge(START, nodes[0].__name__)
+    for source, target in zip(nodes, nodes[1:]):
+        graph.add_edge(source.__name__, target.__name__)
+    graph.add_edge(nodes[-1].__name__, END)
+    return graph
+
+
+class TimedCheckpointer(BaseCheckpointSaver):
+    """Delegates to a checkpointer and records the latency of every call."""
+
+    def __init__(self, checkpointer: BaseCheckpointSaver):
+        super().__init__(serde=checkpointer.serde)
+        self.checkpointer = checkpointer
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+
+    def get_next_version(self, current: Optional[Any], channel: Any) -> Any:
+        return self.checkpointer.get_next_version(current, channel)
+
+    @contextlib.contextmanager
+    def _timed(self, operation: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latencies[operation].append(time.perf_counter() - started)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._timed("get_tuple"):
+            return self.checkpointer.get_tuple(config)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._timed("get_tuple"):
+            return await self.checkpointer.aget_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs: Any) -> Iterator[CheckpointTuple]:
+        with self._timed("list"):
+            checkpoint_tuples = list(self.checkpointer.list(config, **kwargs))
+        return iter(checkpoint_tuples)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs: Any) -> AsyncIterator[CheckpointTuple]:
+        with self._timed("list"):
+            checkpoint_tuples = [checkpoint_tuple async for checkpoint_tuple in self.checkpointer.alist(config, **kwargs)]
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        with self._timed("put"):
+            return self.checkpointer.put(config, checkpoint, metadata, new_versions)
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions) -> RunnableConfig:
+        with self._timed("put"):
+            return await self.checkpointer.aput(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        with self._timed("put_writes"):
+            self.checkpointer.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        with self._timed("put_writes"):
+            await self.checkpointer.aput_writes(config, writes, task_id, task_path)
+
+
+@contextlib.contextmanager
+def fake_redis() -> Iterator[None]:
+    """Serve the shared Redis clients from one in-process fakeredis server."""
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    connect = redis_client._connect
+    redis_client._clients.clear()
+    redis_client._connect = lambda url, asynchronous: (fakeredis.FakeAsyncRedis if asynchronous else fakeredis.FakeRedis)(server=server)
+    try:
+        yield
+    finally:
+        redis_client._connect = connect
+        redis_client._clients.clear()
+
+
+def make_checkpointer(backend: str, workdir: str, redis_url: Optional[str] = None) -> BaseCheckpointSaver:
+    """Build a checkpointer by backend name.
+
+    Args:
+        backend: One of BACKENDS; "<store>+<durability>" wraps the store in a BufferedCheckpointer
+        workdir: Directory for file-backed stores
+        redis_url: Redis URL for the Redis backends; inside fake_redis() any URL works
+
+    Returns:
+        A fresh checkpointer
+    """
+    store, _, durability = backend.partition("+")
+    if store == "memory":
+        checkpointer = BoundedMemoryCheckpointer(spill_path=None)
+    elif store == "sqlite":
+        checkpointer = SqliteCheckpointer(path=os.path.join(workdir, f"{backend}.sqlite"))
+    elif store == "redis":
+        from agent.graph.checkpointers.redis_checkpointer import RedisCheckpointer
+        checkpointer = RedisCheckpointer(redis_url=redis_url or BENCHMARK_REDIS_URL or "redis://fakeredis")
+    else:
+        raise ValueError(f"Unknown checkpointer backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    if durability:
+        checkpointer = BufferedCheckpointer(checkpointer, durability=durability)
+    return checkpointer
+
+
+def _unwrap(checkpointer: BaseCheckpointSaver) -> BaseCheckpointSaver:
+    while isinstance(checkpointer, (TimedCheckpointer, BufferedCheckpointer)):
+        checkpointer = checkpointer.checkpointer
+    return checkpointer
+
+
+def _redis_key_bytes(client: Any, key: bytes) -> int:
+    """Memory used by a key, or the size of its contents where MEMORY USAGE is unavailable (fakeredis)."""
+    try:
+        return client.memory_usage(key) or 0
+    except Exception:
+        pass
+    key_type = client.type(key)
+    if key_type == b"hash":
+        return sum(len(field) + len(value) for field, value in client.hgetall(key).items())
+    if key_type == b"zset":
+        return sum(len(member) + 8 for member in client.zrange(key, 0, -1))
+    if key_type == b"string":
+        return client.strlen(key)
+    return 0
+
+
+def stored_bytes(checkpointer: BaseCheckpointSaver) -> int:
+    """Bytes a backend holds for everything written so far."""
+    checkpointer = _unwrap(checkpointer)
+    if isinstance(checkpointer, BoundedMemoryCheckpointer):
+        return checkpointer.get_stats()["memory"]["resident_bytes"]
+    if isinstance(checkpointer, SqliteCheckpointer):
+        connection = sqlite3.connect(checkpointer.path)
+        try:
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+            page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            connection.close()
+        return page_count * page_size
+    client = checkpointer.redis
+    return sum(
+        _redis_key_bytes(client, key)
+        for pattern in ("checkpoint*", "writes*")
+        for key in client.scan_iter(match=pattern, count=500)
+    )
+
+
+def round_trips(checkpointer: BaseCheckpointSaver) -> Optional[int]:
+    """Round trips a backend reports in get_stats(), or None if it does not count them."""
+    checkpointer = _unwrap(checkpointer)
+    if not hasattr(checkpointer, "get_stats"):
+        return None
+    counted = [stats["round_trips"] for stats in checkpointer.get_stats().values() if "round_trips" in stats]
+    return sum(counted) if counted else None
+
+
+def _percentile(latencies: List[float], percentile: float) -> float:
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+@dataclass
+class WorkloadResult:
+    """What one workload run did and measured."""
+    backend: str
+    threads: int
+    turns: int
+    seconds: float
+    latencies: Dict[str, List[float]]
+    final_states: Dict[str, Dict[str, Any]]
+    stored_bytes: int
+    round_trips: Optional[int]
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def operations(self) -> int:
+        return sum(len(self.latencies[operation]) for operation in OPERATIONS)
+
+    def summary(self) -> Dict[str, Any]:
+        """Throughput, latency percentiles, round trips and storage of the run."""
+        puts = len(self.latencies["put"])
+        summary = {
+            "backend": self.backend,
+            "threads": self.threads,
+            "turns": self.turns,
+            "ops": self.operations,
+            "ops_per_sec": round(self.operations / self.seconds) if self.seconds else 0,
+            "round_trips_per_op": round(self.round_trips / self.operations, 2) if self.round_trips is not None and self.operations else None,
+            "bytes_per_step": round(self.stored_bytes / puts) if puts else 0,
+        }
+        for operation in OPERATIONS:
+            if self.latencies[operation]:
+                summary[f"{operation}_p50_ms"] = round(_percentile(self.latencies[operation], 0.5) * 1000, 3)
+                summary[f"{operation}_p99_ms"] = round(_percentile(self.latencies[operation], 0.99) * 1000, 3)
+        return summary
+
+
+async def run_workload(
+    checkpointer: BaseCheckpointSaver,
+    backend: str = "",
+    threads: int = 10,
+    turns: int = 5,
+    concurrency: int = 10,
+    document_bytes: int = 2048,
+) -> WorkloadResult:
+    """Run `threads` conversations of `turns` interrupted and resumed turns each.
+
+    Args:
+        checkpointer: The checkpointer under test
+        backend: Name reported in the result
+        threads: Number of conversations
+        turns: Turns per conversation; each turn is one run to the interrupt and one resume
+        concurrency: Conversations run at the same time
+        document_bytes: Size of each retrieved document, which dominates the checkpoint size
+
+    Returns:
+        The measurements and the final state of every conversation
+    """
+    timed = TimedCheckpointer(checkpointer)
+    graph = build_flow_graph(document_bytes).compile(checkpointer=timed)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def converse(thread_id: str) -> None:
+        config = {"configurable": {"thread_id": thread_id}}
+        async with semaphore:
+            for turn in range(turns):
+                await graph.ainvoke({"messages": [HumanMessage(f"question {turn} of {thread_id}")]}, config)
+                await graph.ainvoke(Command(resume=f"thanks {turn}"), config)
+
+    thread_ids = [f"bench-{i}" for i in range(threads)]
+    started = time.perf_counter()
+    await asyncio.gather(*(converse(thread_id) for thread_id in thread_ids))
+    if hasattr(checkpointer, "aflush"):
+        await checkpointer.aflush()
+    seconds = time.perf_counter() - started
+    latencies = {operation: list(timed.latencies[operation]) for operation in OPERATIONS}
+
+    final_states = {}
+    for thread_id in thread_ids:
+        snapshot = await graph.aget_state({"configurable": {"thread_id": thread_id}})
+        final_states[thread_id] = {**snapshot.values, "next": snapshot.next}
+    return WorkloadResult(
+        backend=backend,
+        threads=threads,
+        turns=turns,
+        seconds=seconds,
+        latencies=latencies,
+        final_states=final_states,
+        stored_bytes=stored_bytes(checkpointer),
+        round_trips=round_trips(checkpointer),
+        stats=checkpointer.get_stats() if hasattr(checkpointer, "get_stats") else {},
+    )
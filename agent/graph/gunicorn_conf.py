@@ -0,0 +1,200 @@
+"""Gunicorn Configuration for Production
+
+Runs the API as one pre-forked uvicorn worker per available core:
+
+    gunicorn -c agent/graph/gunicorn_conf.py agent.graph.app:app
+
+The app is imported once in the master (preload_app) before any worker is
+forked. The imported modules and the compiled graph are built once and
+shared copy-on-write by every worker instead of being rebuilt per worker.
+The master freezes the garbage collector's view of everything loaded so
+far, so collections in the workers do not write to (and thereby copy)
+those shared pages. The models, embeddings and tools are not shared: they
+are lazy (utils/lazy.py) and hold HTTP connection pools that must not
+cross fork, so each worker builds its own in its startup warm-up. State that must not cross fork
+(the logging writer thread, SQLite connections) is recreated in each
+worker by the modules that own it. Redis pools reconnect on first use in
+the worker, since redis-py pools reset when they see a new process id.
+
+Each worker warms up before it serves (WARMUP_ON_STARTUP, see
+utils/warmup.py), and the whole warm-up is capped at 80% of the worker
+timeout (WARMUP_TOTAL_TIMEOUT), since a worker still in startup sends no
+heartbeat and would be killed.
+
+Workers run on uvloop with the httptools parser when those are installed.
+Each worker logs its memory once it has booted: RSS counts the pages it
+shares with the master and its siblings, while USS counts only its own.
+scripts/worker_memory.py reports the same for a running server.
+
+The worker count defaults to the CPUs this container may use. That is the
+cgroup CPU quota if there is one (as on Cloud Run), otherwise the CPUs
+the process may run on.
+
+Several workers need a checkpointer they all see: a conversation paused
+at human_in_loop in one worker may be resumed by a request that lands on
+another. With CHECKPOINTER_TYPE=sqlite or redis any worker can resume it.
+The memory checkpointer lives in one process, so with it the server runs
+a single worker, whatever GUNICORN_WORKERS says, and logs a warning.
+
+Each scrape of /metrics lands on one worker, so several workers share
+their metrics through METRICS_MULTIPROC_DIR (default: agent-metrics in
+the temp directory). The master empties it when it starts, and /metrics
+in any worker reports the merged metrics of all of them.
+
+Environment Variables:
+    PORT: Port to bind (default: 8080)
+    GUNICORN_WORKERS: Number of workers (default: available CPUs x GUNICORN_WORKERS_PER_CORE)
+    GUNICORN_WORKERS_PER_CORE: Workers per available CPU when GUNICORN_WORKERS is unset (default: 1)
+    GUNICORN_MAX_WORKERS: Upper bound of the automatic worker count, 0 for none (default: 0)
+    GUNICORN_PRELOAD: Load the app in the master before forking (default: true)
+    GUNICORN_TIMEOUT: Seconds a silent worker may take before it is restarted (default: 120)
+    GUNICORN_GRACEFUL_TIMEOUT: Seconds workers get to finish requests on shutdown (default: 30)
+    GUNICORN_KEEPALIVE: Seconds an idle keep-alive connection is held open (default: 300)
+    FORWARDED_ALLOW_IPS: Proxies trusted for X-Forwarded-* headers (default: *)
+    METRICS_MULTIPROC_DIR: Directory the workers share their metrics through (default: <temp dir>/agent-metrics)
+
+Sets WEB_CONCURRENCY to the number of workers it runs, for the workers'
+capacity checks (see models/ollama_preload.py).
+"""
+
+import gc
+import os
+import math
+import logging
+import tempfile
+from dotenv import load_dotenv
+from uvicorn.workers import UvicornWorker
+from agent.graph.checkpointers import CHECKPOINTER_TYPE
+from agent.graph.utils.metrics import METRICS_ENABLED, clear_multiprocess_dir, set_multiprocess_dir
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+GUNICORN_WORKERS_PER_CORE = float(os.getenv("GUNICORN_WORKERS_PER_CORE", "1"))
+GUNICORN_MAX_WORKERS = int(os.getenv("GUNICORN_MAX_WORKERS", "0"))
+
+# Checkpointers every worker can read; any other type falls back to the per-process memory one
+SHARED_CHECKPOINTERS = ("sqlite", "redis")
+
+
+def available_cpus() -> int:
+    """Get the number of CPUs this process may use, honouring a cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def default_workers() -> int:
+    """Get the automatic worker count."""
+    workers = max(1, int(available_cpus() * GUNICORN_WORKERS_PER_CORE))
+    if GUNICORN_MAX_WORKERS > 0:
+        workers = min(workers, GUNICORN_MAX_WORKERS)
+    return workers
+
+
+def _installed(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+class UvloopWorker(UvicornWorker):
+    """Uvicorn worker on uvloop and httptools, falling back to asyncio and h11 without them."""
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+    }
+
+
+# Server socket
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "*")
+
+# Workers
+workers = int(os.getenv("GUNICORN_WORKERS") or default_workers())
+if workers > 1 and CHECKPOINTER_TYPE not in SHARED_CHECKPOINTERS:
+    logger.warning(
+        "CHECKPOINTER_TYPE=%s keeps conversations in one process, so a conversation paused in one worker "
+        "could not be resumed by another; running 1 worker instead of %d. Set CHECKPOINTER_TYPE to sqlite "
+        "or redis to run several.", CHECKPOINTER_TYPE, workers,
+    )
+    workers = 1
+# Tell the workers how many of them share downstream services such as Ollama
+os.environ["WEB_CONCURRENCY"] = str(workers)
+metrics_dir = None
+if workers > 1 and METRICS_ENABLED:
+    metrics_dir = os.getenv("METRICS_MULTIPROC_DIR") or os.path.join(tempfile.gettempdir(), "agent-metrics")
+    set_multiprocess_dir(metrics_dir)
+worker_class = "agent.graph.gunicorn_conf.UvloopWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "300"))
+
+# Warm each worker up before it serves, within the time the master waits for its first heartbeat
+os.environ.setdefault("WARMUP_ON_STARTUP", "true")
+os.environ.setdefault("WARMUP_TOTAL_TIMEOUT", str(max(1, int(timeout * 0.8))))
+
+# Logging; uvicorn workers log access lines themselves, and all of it goes through logging_setup
+errorlog = "-"
+accesslog = None
+
+
+def on_starting(server):
+    """Drop the metrics a previous server left behind, before any worker writes its own."""
+    if metrics_dir is not None:
+        clear_multiprocess_dir(metrics_dir)
+        server.log.info("Workers share metrics through %s", metrics_dir)
+
+
+def when_ready(server):
+    """Freeze everything the master loaded, so workers' collections leave the shared pages alone."""
+    gc.collect()
+    gc.freeze()
+    server.log.info(
+        "Master ready with %d objects frozen; starting %d %s workers (preload_app=%s, loop=%s, http=%s)",
+        gc.get_freeze_count(), server.cfg.workers, UvloopWorker.__name__, server.cfg.preload_app,
+        UvloopWorker.CONFIG_KWARGS["loop"], UvloopWorker.CONFIG_KWARGS["http"],
+    )
+
+
+def post_worker_init(worker):
+    """Report the worker's memory once it has booted."""
+    try:
+        import psutil
+        memory = psutil.Process(worker.pid).memory_full_info()
+    except Exception as e:
+        worker.log.info("Worker %s booted; memory unavailable: %s", worker.pid, e)
+        return
+    worker.log.info(
+        "Worker %s booted: rss %.1f MiB, uss %.1f MiB, shared %.1f MiB",
+        worker.pid, memory.rss / 2**20, memory.uss / 2**20, getattr(memory, "shared", 0) / 2**20,
+    )
@@ -12,11 +12,22 @@ Environment Variables:
     INFERENCE_API_KEY: API key for the specified provider
     RUNPOD_API_KEY: RunPod API key
     RUNPOD_ENDPOINT_ID: RunPod endpoint ID
+
+    OLLAMA_PRODUCTION_MODE: Set to "true" to pin models in memory and preload them at startup
+    OLLAMA_KEEP_ALIVE: How long Ollama keeps a model loaded after a request (default: 30m, -1 in production mode)
+    OLLAMA_PRELOAD: Set to "true" to load every configured model at startup (default: OLLAMA_PRODUCTION_MODE)
+    OLLAMA_NUM_PARALLEL: Parallel requests per model configured on the Ollama server (default: 1)
+    OLLAMA_MAX_LOADED_MODELS: Models the Ollama server keeps loaded at once (default: 3)
+    OLLAMA_TIMEOUT: Seconds an Ollama request of the routers, graders, summarizer and embeddings may take (default: 30)
+    OLLAMA_GENERATOR_TIMEOUT: Seconds an Ollama request of the generator may take, 0 for no limit (default: 0)
+
+    GENERATION_<COMPONENT>_MAX_TOKENS: Override the output token limit of a component (e.g. GENERATION_ROUTER_MAX_TOKENS)
+    GENERATION_<COMPONENT>_TEMPERATURE: Override the temperature of a component
+    GENERATION_<COMPONENT>_STOP: Override the stop sequences of a component, separated by "|"
 """
 
 import os
 from typing import Dict, Any, Optional
-import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from .runpod_client import RunPodClient
 import logging
@@ -74,13 +85,85 @@ OLLAMA_MODELS = {
     "generator": "deepseek-coder:33b"
 }
 
+# Stop sequences that end a turn in the chat templates of our models; a model
+# that keeps going past its answer starts a made-up next turn with one of these
+TURN_STOP_SEQUENCES = ["</s>", "<|eot_id|>", "[INST]", "\nHuman:", "\nUser:"]
+
+# Per-component generation settings. Routers and graders emit a one-line JSON
+# object, so they get a tight token budget; the summarizer rewrites a single
+# query; only the generator writes long answers. The histograms at /api/usage
+# show the real output lengths to tune these from.
+DEFAULT_GENERATION_PROFILES: Dict[str, Dict[str, Any]] = {
+    "router": {"max_tokens": 64, "temperature": 0.0, "stop": TURN_STOP_SEQUENCES},
+    "sentiment_grader": {"max_tokens": 32, "temperature": 0.0, "stop": TURN_STOP_SEQUENCES},
+    "answer_grader": {"max_tokens": 32, "temperature": 0.0, "stop": TURN_STOP_SEQUENCES},
+    "retrieval_grader": {"max_tokens": 48, "temperature": 0.0, "stop": TURN_STOP_SEQUENCES},
+    "hallucinate_grader": {"max_tokens": 32, "temperature": 0.0, "stop": TURN_STOP_SEQUENCES},
+    "summarizer": {"max_tokens": 256, "temperature": 0.0, "stop": TURN_STOP_SEQUENCES},
+    "generator": {
+        "max_tokens": int(os.getenv("INFERENCE_MAX_TOKENS", "2048")),
+        "temperature": 0.0,
+        "stop": TURN_STOP_SEQUENCES,
+    },
+}
+
+def _load_generation_profiles() -> Dict[str, Dict[str, Any]]:
+    """Apply GENERATION_<COMPONENT>_* environment overrides to the default profiles."""
+    profiles = {}
+    for component, defaults in DEFAULT_GENERATION_PROFILES.items():
+        prefix = f"GENERATION_{component.upper()}_"
+        stop = os.getenv(prefix + "STOP")
+        profiles[component] = {
+            "max_tokens": int(os.getenv(prefix + "MAX_TOKENS", defaults["max_tokens"])),
+            "temperature": float(os.getenv(prefix + "TEMPERATURE", defaults["temperature"])),
+            "stop": [sequence for sequence in stop.split("|") if sequence] if stop is not None else list(defaults["stop"]),
+        }
+    return profiles
+
+GENERATION_PROFILES = _load_generation_profiles()
+
+def get_generation_profile(component: str) -> Dict[str, Any]:
+    """Get the generation settings (max_tokens, temperature, stop) of a component.
+    
+    Args:
+        component: Component name (router, summarizer, generator, ...)
+        
+    Returns:
+        A copy of the component's profile
+    """
+    profile = GENERATION_PROFILES[component]
+    return {**profile, "stop": list(profile["stop"])}
+
+# Ollama server settings
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_PRODUCTION_MODE = os.environ.get("OLLAMA_PRODUCTION_MODE", "false").lower() == "true"
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "-1" if OLLAMA_PRODUCTION_MODE else "30m")
+OLLAMA_PRELOAD = os.environ.get("OLLAMA_PRELOAD", str(OLLAMA_PRODUCTION_MODE)).lower() == "true"
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "1"))
+OLLAMA_MAX_LOADED_MODELS = int(os.environ.get("OLLAMA_MAX_LOADED_MODELS", "3"))
+# Generations on CPU routinely outlast a short timeout, so the generator's is unbounded by default
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "30"))
+OLLAMA_GENERATOR_TIMEOUT = float(os.environ.get("OLLAMA_GENERATOR_TIMEOUT", "0"))
+
+# Sampling per component. The generator samples with mirostat; routers, graders and
+# the summarizer decode greedily, so the same input always gets the same verdict.
+OLLAMA_GENERATOR_SAMPLING = {"mirostat": 2, "mirostat_tau": 5.0, "mirostat_eta": 0.1, "top_p": 0.9, "top_k": 40, "tfs_z": 0.7}
+OLLAMA_DETERMINISTIC_SAMPLING = {"mirostat": 0, "top_p": 1.0, "top_k": 1, "tfs_z": 1.0}
+
+# Options accepted by ChatOllama and OllamaEmbeddings; the rest of get_ollama_config()
+# are server-side settings (num_parallel) or not exposed by langchain-ollama
+OLLAMA_CHAT_OPTIONS = (
+    "num_ctx", "num_gpu", "num_thread", "num_predict", "repeat_penalty", "temperature",
+    "top_p", "top_k", "seed", "stop", "tfs_z", "mirostat", "mirostat_tau", "mirostat_eta",
+)
+OLLAMA_EMBEDDING_OPTIONS = ("num_ctx", "num_gpu", "num_thread")
+
 # Concurrency settings
 PROVISIONED_CONCURRENCY = int(os.environ.get("PROVISIONED_CONCURRENCY", "1"))
 CONCURRENCY_LIMIT = int(os.environ.get("CONCURRENCY_LIMIT", "5"))
 
-# Initialize thread pool and semaphore
+# Initialize thread pool; agent runs are limited by the admission controller (utils/admission.py)
 thread_pool = ThreadPoolExecutor(max_workers=CONCURRENCY_LIMIT)
-concurrency_semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
 
 # Initialize RunPod client if enabled
 runpod_client: Optional[RunPodClient] = None
@@ -90,39 +173,65 @@ if USE_RUNPOD and RUNPOD_API_KEY and RUNPOD_ENDPOINT_ID:
 def get_ollama_config() -> Dict[str, Any]:
     """Get Ollama configuration with optimized settings."""
     return {
-        "num_ctx": 2048,
-        "num_gpu": 1,
-        "num_thread": 8,
-        "temperature": 0.2,
-        "top_p": 0.9,
-        "top_k": 40,
-        "num_predict": 512,
+        "num_ctx": int(os.getenv("OLLAMA_NUM_CTX", "2048")),
+        "num_gpu": int(os.getenv("OLLAMA_NUM_GPU", "1")),
+        "num_thread": int(os.getenv("OLLAMA_NUM_THREAD", str(os.cpu_count() or 8))),
+        "temperature": 0.2,  # Overridden per component by its generation profile
+        "num_predict": 512,  # Overridden per component by its generation profile
         "repeat_penalty": 1.1,
         "seed": 42,
-        "timeout": 30,
         "num_keep": 5,
-        "stop": ["</s>", "Human:", "Assistant:"],
-        "tfs_z": 0.7,
+        "stop": ["</s>", "Human:", "Assistant:"],  # Overridden per component by its generation profile
         "num_batch": 512,
         "rope_scaling": {"type": "linear", "factor": 1.0},
         "rope_freq_base": 10000,
         "rope_freq_scale": 1.0,
-        "mirostat": 2,
-        "mirostat_tau": 5.0,
-        "mirostat_eta": 0.1,
         "penalize_newline": True,
         "presence_penalty": 0.1,
         "frequency_penalty": 0.1,
         "typical_p": 0.9,
         "tiktoken_encoding": "cl100k_base",
-        "num_parallel": 1,
+        "num_parallel": OLLAMA_NUM_PARALLEL,
         "num_beam": 1,
+        "keep_alive": _parse_keep_alive(OLLAMA_KEEP_ALIVE),
     }
 
-async def with_concurrency_limit(func, *args, **kwargs):
-    """Wrapper to limit concurrent executions using a semaphore."""
-    async with concurrency_semaphore:
-        return await func(*args, **kwargs)
+def _parse_keep_alive(value: str) -> int:
+    """Convert a keep-alive setting such as "-1", "300", "30m" or "1h" to seconds."""
+    value = value.strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+def get_ollama_model_kwargs(component: str) -> Dict[str, Any]:
+    """Get constructor arguments for the Ollama model of a component.
+    
+    Args:
+        component: Component name (embeddings, router, grader, generator)
+        
+    Returns:
+        Keyword arguments for ChatOllama, or OllamaEmbeddings for the embeddings component
+    """
+    options = get_ollama_config()
+    supported = OLLAMA_EMBEDDING_OPTIONS if component == "embeddings" else OLLAMA_CHAT_OPTIONS
+    kwargs = {key: value for key, value in options.items() if key in supported}
+    if component != "embeddings":
+        profile = get_generation_profile(component)
+        kwargs.update(OLLAMA_GENERATOR_SAMPLING if component == "generator" else OLLAMA_DETERMINISTIC_SAMPLING)
+        kwargs.update({
+            "num_predict": profile["max_tokens"],
+            "temperature": profile["temperature"],
+            "stop": profile["stop"],
+        })
+    timeout = OLLAMA_GENERATOR_TIMEOUT if component == "generator" else OLLAMA_TIMEOUT
+    kwargs.update({
+        "model": OLLAMA_MODELS[component],
+        "base_url": OLLAMA_BASE_URL,
+        "keep_alive": options["keep_alive"],
+        "client_kwargs": {"timeout": timeout if timeout > 0 else None},
+    })
+    return kwargs
 
 def get_active_provider(component: str) -> str:
     """Get the active model provider for a component.
@@ -166,7 +275,8 @@ def get_model_config_for_component(component: str) -> Dict[str, Any]:
         return {
             "provider": provider,
             "model": OLLAMA_MODELS[component],
-            "base_url": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+            "base_url": OLLAMA_BASE_URL,
+            "model_kwargs": get_ollama_model_kwargs(component)
         }
     elif provider == "runpod":
         return {
@@ -175,8 +285,9 @@ def get_model_config_for_component(component: str) -> Dict[str, Any]:
             "model": os.getenv("RUNPOD_MODEL_ID", MODEL_IDS[component]),
             "api_key": os.getenv("RUNPOD_API_KEY"),
             "endpoint_id": os.getenv("RUNPOD_ENDPOINT_ID"),
-            "max_tokens": int(os.getenv("RUNPOD_MAX_TOKENS", "2048")),
+            "max_tokens": int(os.getenv("RUNPOD_MAX_TOKENS", str(get_generation_profile(component)["max_tokens"]))),
             "temperature": float(os.getenv("RUNPOD_TEMPERATURE", "0.2")),
+            "stop": get_generation_profile(component)["stop"],
             "top_p": float(os.getenv("RUNPOD_TOP_P", "0.9")),
             "top_k": int(os.getenv("RUNPOD_TOP_K", "40")),
             "presence_penalty": float(os.getenv("RUNPOD_PRESENCE_PENALTY", "0.1")),
@@ -201,11 +312,12 @@ def get_model_config_for_component(component: str) -> Dict[str, Any]:
             "api_key": os.getenv("INFERENCE_API_KEY"),
             "direct_api_key": os.getenv("INFERENCE_DIRECT_API_KEY"),
             "base_url": os.getenv("INFERENCE_BASE_URL", "https://api-inference.huggingface.co/models"),
-            "max_tokens": int(os.getenv("INFERENCE_MAX_TOKENS", "2048"))
+            **(get_generation_profile(component) if component != "embeddings" else {})
         }
     else:  # default to ollama
         return {
             "provider": "ollama",
             "model": OLLAMA_MODELS[component],
-            "base_url": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+            "base_url": OLLAMA_BASE_URL,
+            "model_kwargs": get_ollama_model_kwargs(component)
         }
@@ -1,22 +1,31 @@
 # from langchain_openai import OpenAIEmbeddings
-from langchain_ollama import OllamaEmbeddings
 from .config import get_model_config_for_component
-from .inference_client_wrapper import InferenceClientEmbeddings
+from .single_flight_wrapper import with_single_flight_embeddings
+from agent.graph.utils.api_utils import with_embeddings_usage_tracking
+from agent.graph.utils.lazy import LazyEmbeddings
 
-# Get model configuration
-config = get_model_config_for_component("embeddings")
+def build_embeddings():
+    """Build the embeddings model from its configuration; runs on first use, not on import."""
+    config = get_model_config_for_component("embeddings")
 
-# Initialize embeddings based on configuration
-if config["provider"] == "inference_client":
-    # Use InferenceClient with third-party provider
-    embeddings = InferenceClientEmbeddings(
-        provider=config.get("provider_org", "together"),
-        direct_provider=config.get("direct_provider_org", "together"),
-        api_key=config["api_key"],
-        direct_api_key=config["direct_api_key"],
-        model=config["model"],
-        max_tokens=config["max_tokens"]
-    )
-else:
-    # Default to Ollama
-    embeddings = OllamaEmbeddings(model=config["model"])
\ No newline at end of file
+    # Initialize embeddings based on configuration
+    if config["provider"] == "inference_client":
+        # Use InferenceClient with third-party provider
+        from .inference_client_wrapper import InferenceClientEmbeddings
+        embeddings = InferenceClientEmbeddings(
+            provider=config.get("provider_org", "together"),
+            direct_provider=config.get("direct_provider_org", "together"),
+            api_key=config["api_key"],
+            direct_api_key=config["direct_api_key"],
+            model=config["model"],
+            component="embeddings"
+        )
+    else:
+        # Default to Ollama
+        from langchain_ollama import OllamaEmbeddings
+        embeddings = OllamaEmbeddings(**config["model_kwargs"])
+
+    # Share identical in-flight calls across concurrent requests; only the upstream calls are recorded
+    return with_single_flight_embeddings(with_embeddings_usage_tracking(embeddings, "embeddings"), "embeddings")
+
+embeddings = LazyEmbeddings("embeddings", build_embeddings)
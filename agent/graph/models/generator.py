@@ -1,7 +1,8 @@
 # from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
 from .config import get_model_config_for_component
-from .inference_client_wrapper import InferenceClientChatModel
+from .single_flight_wrapper import with_single_flight
+from agent.graph.utils.api_utils import with_usage_tracking
+from agent.graph.utils.lazy import LazyRunnable
 from langchain.chat_models.base import BaseChatModel
 from langchain.callbacks.manager import CallbackManagerForLLMRun
 from langchain.schema import (
@@ -25,6 +26,7 @@ class RunPodChatModel(BaseChatModel):
     top_k: int = 40
     presence_penalty: float = 0.1
     frequency_penalty: float = 0.1
+    stop: Optional[List[str]] = None
     
     def __init__(
         self,
@@ -36,6 +38,7 @@ class RunPodChatModel(BaseChatModel):
         top_k: int = 40,
         presence_penalty: float = 0.1,
         frequency_penalty: float = 0.1,
+        stop: Optional[List[str]] = None,
         **kwargs
     ):
         """Initialize the RunPodChatModel."""
@@ -48,6 +51,7 @@ class RunPodChatModel(BaseChatModel):
         self.top_k = top_k
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
+        self.stop = stop
     
     @property
     def _llm_type(self) -> str:
@@ -88,7 +92,7 @@ class RunPodChatModel(BaseChatModel):
             top_k=self.top_k,
             presence_penalty=self.presence_penalty,
             frequency_penalty=self.frequency_penalty,
-            stop=stop,
+            stop=stop or self.stop,
             **kwargs
         )
         
@@ -104,34 +108,44 @@ class RunPodChatModel(BaseChatModel):
         generation = ChatGeneration(message=message)
         return ChatResult(generations=[generation])
         
-# Get model configuration
-config = get_model_config_for_component("generator")
+def build_llm():
+    """Build the generator model from its configuration; runs on first use, not on import."""
+    config = get_model_config_for_component("generator")
+
+    # Initialize LLM based on configuration
+    if config["provider"] == "inference_client":
+        # Use InferenceClient with third-party provider
+        from .inference_client_wrapper import InferenceClientChatModel
+        llm = InferenceClientChatModel(
+            provider=config.get("provider_org", "together"),
+            direct_provider=config.get("direct_provider_org", "together"),
+            api_key=config["api_key"],
+            direct_api_key=config["direct_api_key"],
+            model=config["model"],
+            temperature=config["temperature"],
+            max_tokens=config["max_tokens"],
+            stop=config["stop"],
+            component="generator"
+        )
+    elif config["provider"] == "runpod":
+        # Initialize the RunPod chat model with the client from config
+        llm = RunPodChatModel(
+            client=config["client"],
+            model=config["model"],
+            temperature=config.get("temperature", 0.2),
+            max_tokens=config.get("max_tokens", 2048),
+            top_p=config.get("top_p", 0.9),
+            top_k=config.get("top_k", 40),
+            presence_penalty=config.get("presence_penalty", 0.1),
+            frequency_penalty=config.get("frequency_penalty", 0.1),
+            stop=config.get("stop"),
+        )
+    else:
+        # Default to Ollama
+        from langchain_ollama import ChatOllama
+        llm = ChatOllama(**config["model_kwargs"])
 
-# Initialize LLM based on configuration
-if config["provider"] == "inference_client":
-    # Use InferenceClient with third-party provider
-    llm = InferenceClientChatModel(
-        provider=config.get("provider_org", "together"),
-        direct_provider=config.get("direct_provider_org", "together"),
-        api_key=config["api_key"],
-        direct_api_key=config["direct_api_key"],
-        model=config["model"],
-        temperature=0,
-        max_tokens=config["max_tokens"]
-    )
-elif config["provider"] == "runpod":
-    # Initialize the RunPod chat model with the client from config
-    llm = RunPodChatModel(
-        client=config["client"],
-        model=config["model"],
-        temperature=config.get("temperature", 0.2),
-        max_tokens=config.get("max_tokens", 2048),
-        top_p=config.get("top_p", 0.9),
-        top_k=config.get("top_k", 40),
-        presence_penalty=config.get("presence_penalty", 0.1),
-        frequency_penalty=config.get("frequency_penalty", 0.1),
-    )
-else:
-    # Default to Ollama
-    llm = ChatOllama(model=config["model"], temperature=0)
+    # Share identical in-flight calls across concurrent requests, stream tokens to streaming callers and record provider token usage
+    return with_usage_tracking(with_single_flight(llm, "generator", stream=True), "generator")
 
+llm = LazyRunnable("generator", build_llm)
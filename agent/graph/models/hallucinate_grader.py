@@ -1,24 +1,34 @@
 # from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
 from .config import get_model_config_for_component
-from .inference_client_wrapper import InferenceClientChatModel
+from .single_flight_wrapper import with_single_flight
+from agent.graph.utils.api_utils import with_usage_tracking
+from agent.graph.utils.lazy import LazyRunnable
 
-# Get model configuration
-config = get_model_config_for_component("hallucinate_grader")
+def build_llm():
+    """Build the hallucinate_grader model from its configuration; runs on first use, not on import."""
+    config = get_model_config_for_component("hallucinate_grader")
 
-# Initialize LLM based on configuration
-if config["provider"] == "inference_client":
-    # Use InferenceClient with third-party provider
-    llm = InferenceClientChatModel(
-        provider=config.get("provider_org", "together"),
-        direct_provider=config.get("direct_provider_org", "together"),
-        api_key=config["api_key"],
-        direct_api_key=config["direct_api_key"],
-        model=config["model"],
-        temperature=0,
-        max_tokens=config["max_tokens"]
-    )
-else:
-    # Default to Ollama
-    llm = ChatOllama(model=config["model"], temperature=0)
+    # Initialize LLM based on configuration
+    if config["provider"] == "inference_client":
+        # Use InferenceClient with third-party provider
+        from .inference_client_wrapper import InferenceClientChatModel
+        llm = InferenceClientChatModel(
+            provider=config.get("provider_org", "together"),
+            direct_provider=config.get("direct_provider_org", "together"),
+            api_key=config["api_key"],
+            direct_api_key=config["direct_api_key"],
+            model=config["model"],
+            temperature=config["temperature"],
+            max_tokens=config["max_tokens"],
+            stop=config["stop"],
+            component="hallucinate_grader"
+        )
+    else:
+        # Default to Ollama
+        from langchain_ollama import ChatOllama
+        llm = ChatOllama(**config["model_kwargs"])
 
+    # Share identical in-flight calls across concurrent requests and record provider token usage
+    return with_usage_tracking(with_single_flight(llm, "hallucinate_grader"), "hallucinate_grader")
+
+llm = LazyRunnable("hallucinate_grader", build_llm)
@@ -2,11 +2,12 @@
 Wrapper for Hugging Face InferenceClient to integrate with LangChain.
 
 This module provides custom LangChain-compatible classes for using
-Hugging Face's InferenceClient with third-party providers.
+Hugging Face's InferenceClient with third-party providers. The Together
+client library is only imported when a call falls back to it.
 """
 
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 from langchain_core.callbacks.manager import CallbackManagerForLLMRun
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import (
@@ -21,12 +22,28 @@ from huggingface_hub import InferenceClient
 from huggingface_hub.inference._client import ChatCompletionOutput
 import requests
 import json
-from together import Together
 import os
+from agent.graph.utils.circuit_breaker import get_circuit_breaker
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+
+def _completion_with_choices(create: Callable[..., Any], provider: str, /, **params: Any) -> Any:
+    """Call a chat completion API and check it returned choices.
+
+    Runs inside the provider's circuit breaker, so a provider that answers
+    with empty completions counts as failing.
+
+    Raises:
+        ValueError: If the completion has no choices
+    """
+    completion = create(**params)
+    if not completion.choices:
+        raise ValueError(f"No choices returned from {provider} API")
+    return completion
+
+
 class InferenceClientChatModel(BaseChatModel):
     """Chat model that uses Hugging Face's InferenceClient with third-party providers."""
     
@@ -35,9 +52,11 @@ class InferenceClientChatModel(BaseChatModel):
     direct_model: str
     temperature: float = 0.0
     max_tokens: int = 1024
+    stop: Optional[List[str]] = None
     provider: str = ""
     direct_provider: str = ""
     direct_api_key: str
+    component: str = ""
     
     def __init__(
         self,
@@ -48,6 +67,8 @@ class InferenceClientChatModel(BaseChatModel):
         model: List[str],
         temperature: float = 0.0,
         max_tokens: int = 1024,
+        stop: Optional[List[str]] = None,
+        component: str = "",
         **kwargs: Any,
     ):
         """Initialize the InferenceClientChatModel.
@@ -58,6 +79,8 @@ class InferenceClientChatModel(BaseChatModel):
             model: The model to use (should be a list of two models, the first is for the InferenceClient and the second is for the Together AI direct API)
             temperature: The temperature to use for generation
             max_tokens: The maximum number of tokens to generate
+            stop: Default stop sequences, used when a call does not pass its own
+            component: The model component (e.g., "router"), used to key circuit breakers
             **kwargs: Additional keyword arguments
         """
         # Create client first
@@ -73,9 +96,11 @@ class InferenceClientChatModel(BaseChatModel):
             "direct_model": model[1],
             "temperature": temperature,
             "max_tokens": max_tokens,
+            "stop": stop,
             "provider": provider,
             "direct_provider": direct_provider,
             "direct_api_key": direct_api_key,
+            "component": component,
             **kwargs
         }
         
@@ -121,6 +146,7 @@ class InferenceClientChatModel(BaseChatModel):
             RuntimeError: If the API call fails
         """
         chat_messages = self._convert_messages_to_chat_format(messages)
+        stop = stop or self.stop
         
         # Prepare parameters - optimized for Together AI compatibility
         params = {
@@ -152,18 +178,19 @@ class InferenceClientChatModel(BaseChatModel):
             # Log request for debugging
             logger.debug(f"Sending request through Hugging Face InferenceClient to provider {self.provider} with model {self.model}")
             
-            # Try Hugging Face's API first
+            # Try Hugging Face's API first. An open circuit raises immediately,
+            # so a degraded provider is skipped instead of waiting for its timeout.
             try:
                 # Call the InferenceClient
-                completion: ChatCompletionOutput = self.client.chat_completion(**params)
+                completion: ChatCompletionOutput = get_circuit_breaker(self.component, f"hf:{self.provider}").call(
+                    _completion_with_choices, self.client.chat_completion, self.provider, **params
+                )
                 
-                # Verify we have choices before accessing
-                if not completion.choices:
-                    raise ValueError(f"No choices returned from {self.provider} API")
-                    
                 # Extract the response
                 response_message = completion.choices[0].message.content
                 finish_reason = getattr(completion.choices[0], "finish_reason", "unknown")
+                usage = getattr(completion, "usage", None)
+                model_name = self.model
                 
                 # Log successful completion
                 logger.debug(f"Received response from {self.provider} API: {finish_reason}")
@@ -177,10 +204,14 @@ class InferenceClientChatModel(BaseChatModel):
                     os.environ["TOGETHER_API_KEY"] = self.direct_api_key
                     
                     # Create Together client
+                    from together import Together
                     together_client = Together()
                     
                     # Call Together AI's API
-                    response = together_client.chat.completions.create(
+                    response = get_circuit_breaker(self.component, self.direct_provider).call(
+                        _completion_with_choices,
+                        together_client.chat.completions.create,
+                        self.direct_provider,
                         model=self.direct_model,
                         messages=chat_messages,
                         max_tokens=params["max_tokens"],
@@ -192,6 +223,8 @@ class InferenceClientChatModel(BaseChatModel):
                     # Extract the response
                     response_message = response.choices[0].message.content
                     finish_reason = getattr(response.choices[0], "finish_reason", "unknown")
+                    usage = getattr(response, "usage", None)
+                    model_name = self.direct_model
                     
                     # Log successful completion
                     logger.debug(f"Received response from Together AI direct API: {finish_reason}")
@@ -199,14 +232,27 @@ class InferenceClientChatModel(BaseChatModel):
                     # If not Together AI, re-raise the original error
                     raise hf_error
             
+            # Report the provider's own token counts so usage tracking does not have to estimate them
+            token_usage = self._token_usage(usage)
+            message = AIMessage(content=response_message)
+            if token_usage:
+                message.usage_metadata = {
+                    "input_tokens": token_usage["prompt_tokens"],
+                    "output_tokens": token_usage["completion_tokens"],
+                    "total_tokens": token_usage["total_tokens"],
+                }
+            
             # Create a ChatGeneration object
             generation = ChatGeneration(
-                message=AIMessage(content=response_message),
+                message=message,
                 generation_info={"finish_reason": finish_reason},
             )
             
             # Return the ChatResult
-            return ChatResult(generations=[generation])
+            return ChatResult(
+                generations=[generation],
+                llm_output={"token_usage": token_usage, "model_name": model_name},
+            )
             
         except Exception as e:
             # Log the error
@@ -221,6 +267,20 @@ class InferenceClientChatModel(BaseChatModel):
             # Raise a more informative exception
             raise RuntimeError(f"Failed to generate response from {self.provider} API and direct {self.direct_provider} API: {str(e)}")
     
+    @staticmethod
+    def _token_usage(usage: Any) -> Dict[str, int]:
+        """Normalize the usage block of an OpenAI-style completion response."""
+        if usage is None:
+            return {}
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        total_tokens = getattr(usage, "total_tokens", None) or prompt_tokens + completion_tokens
+        return {
+            "prompt_tokens": int(prompt_tokens),
+            "completion_tokens": int(completion_tokens),
+            "total_tokens": int(total_tokens),
+        }
+    
     @property
     def _llm_type(self) -> str:
         """Return the type of LLM."""
@@ -236,6 +296,7 @@ class InferenceClientEmbeddings:
     provider: str
     direct_provider: str
     direct_api_key: str
+    component: str
     
     def __init__(
         self,
@@ -244,6 +305,7 @@ class InferenceClientEmbeddings:
         api_key: str,
         direct_api_key: str,
         model: List[str],
+        component: str = "embeddings",
         **kwargs: Any,
     ):
         """Initialize the InferenceClientEmbeddings.
@@ -252,6 +314,7 @@ class InferenceClientEmbeddings:
             provider: The provider to use (e.g., "together", "perplexity", "anyscale")
             api_key: The API key for the provider
             model: The model to use (should be a list of two models, the first is for the InferenceClient and the second is for the Together AI direct API)
+            component: The model component, used to key circuit breakers
             **kwargs: Additional keyword arguments
         """
         self.client = InferenceClient(provider=provider, api_key=api_key)
@@ -260,14 +323,16 @@ class InferenceClientEmbeddings:
         self.provider = provider
         self.direct_provider = direct_provider
         self.direct_api_key = direct_api_key
+        self.component = component
         logger.info(f"Initialized InferenceClientEmbeddings with provider: {provider}, model: {model[0]}")
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Embed a list of documents using the InferenceClient."""
         embeddings = []
         try:
+            breaker = get_circuit_breaker(self.component, f"hf:{self.provider}")
             for text in texts:
-                embedding = self.client.feature_extraction(text, model=self.model)
+                embedding = breaker.call(self.client.feature_extraction, text, model=self.model)
                 embeddings.append(embedding)
             return embeddings
         except Exception as e:
@@ -280,11 +345,15 @@ class InferenceClientEmbeddings:
                     os.environ["TOGETHER_API_KEY"] = self.direct_api_key
                     
                     # Create Together client
+                    from together import Together
                     together_client = Together()
                     
-                    # Get embeddings for each text
+                    # Re-embed every text so all vectors come from the same model
+                    embeddings = []
+                    breaker = get_circuit_breaker(self.component, self.direct_provider)
                     for text in texts:
-                        response = together_client.embeddings.create(
+                        response = breaker.call(
+                            together_client.embeddings.create,
                             model=self.direct_model,
                             input=text
                         )
@@ -300,7 +369,9 @@ class InferenceClientEmbeddings:
     def embed_query(self, text: str) -> List[float]:
         """Embed a query using the InferenceClient."""
         try:
-            return self.client.feature_extraction(text, model=self.model)
+            return get_circuit_breaker(self.component, f"hf:{self.provider}").call(
+                self.client.feature_extraction, text, model=self.model
+            )
         except Exception as e:
             logger.warning(f"Hugging Face API failed, falling back to Together AI direct API: {str(e)}")
             
@@ -311,10 +382,12 @@ class InferenceClientEmbeddings:
                     os.environ["TOGETHER_API_KEY"] = self.direct_api_key
                     
                     # Create Together client
+                    from together import Together
                     together_client = Together()
                     
                     # Get embedding
-                    response = together_client.embeddings.create(
+                    response = get_circuit_breaker(self.component, self.direct_provider).call(
+                        together_client.embeddings.create,
                         model=self.direct_model,
                         input=text
                     )
@@ -0,0 +1,110 @@
+"""Startup preloading and capacity checks for Ollama deployments.
+
+Loading a model into Ollama takes seconds to minutes on CPU boxes. Preloading
+every configured model at startup, with the same options the components use at
+request time, moves that cost out of the first request. The keep-alive setting
+then keeps the models resident between requests.
+
+Every worker runs up to ADMISSION_MAX_CONCURRENT agent runs at once, and
+all workers share one Ollama server, so its parallel slots are checked
+against that times the number of workers.
+
+Environment Variables:
+    WEB_CONCURRENCY: Workers sharing the Ollama server (default: 1; set by gunicorn_conf.py)
+"""
+
+import os
+import time
+import logging
+from typing import Dict, List
+import aiohttp
+from agent.graph.utils.admission import ADMISSION_MAX_CONCURRENT
+from .config import (
+    OLLAMA_BASE_URL,
+    OLLAMA_MAX_LOADED_MODELS,
+    OLLAMA_MODELS,
+    OLLAMA_NUM_PARALLEL,
+    get_ollama_config,
+    get_ollama_model_kwargs,
+)
+
+logger = logging.getLogger(__name__)
+
+# Loading is slow on CPU, so allow much longer than a request timeout
+PRELOAD_TIMEOUT = 600
+
+SERVER_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY") or "1"))
+
+
+def check_ollama_capacity(max_concurrent: int = ADMISSION_MAX_CONCURRENT, workers: int = SERVER_WORKERS) -> List[str]:
+    """Check that the Ollama server settings match our concurrency limits.
+
+    Args:
+        max_concurrent: Agent runs each worker executes at once
+        workers: Workers sharing the Ollama server
+
+    Returns:
+        List of warnings; empty when the settings are consistent
+    """
+    warnings = []
+    concurrent_runs = max_concurrent * workers
+    limits = f"ADMISSION_MAX_CONCURRENT={max_concurrent} x {workers} worker(s) = {concurrent_runs}"
+    if OLLAMA_NUM_PARALLEL < concurrent_runs:
+        warnings.append(
+            f"OLLAMA_NUM_PARALLEL={OLLAMA_NUM_PARALLEL} is below {limits}; "
+            f"concurrent requests will queue inside Ollama. Start the server with OLLAMA_NUM_PARALLEL={concurrent_runs}."
+        )
+    elif OLLAMA_NUM_PARALLEL > concurrent_runs:
+        warnings.append(
+            f"OLLAMA_NUM_PARALLEL={OLLAMA_NUM_PARALLEL} exceeds {limits}; "
+            "the extra parallel slots reserve context memory that is never used."
+        )
+    distinct_models = set(OLLAMA_MODELS.values())
+    if len(distinct_models) > OLLAMA_MAX_LOADED_MODELS:
+        warnings.append(
+            f"{len(distinct_models)} distinct models are configured but OLLAMA_MAX_LOADED_MODELS={OLLAMA_MAX_LOADED_MODELS}; "
+            "models will be evicted and reloaded between pipeline steps."
+        )
+    for warning in warnings:
+        logger.warning(warning)
+    return warnings
+
+
+async def preload_ollama_models() -> Dict[str, float]:
+    """Load every configured Ollama model so the first request does not pay for it.
+
+    Models are loaded one at a time, since loading several at once on a CPU box
+    only makes each of them slower.
+
+    Returns:
+        Seconds spent loading each model; failures are logged and reported as -1
+    """
+    config = get_ollama_config()
+    timings: Dict[str, float] = {}
+    timeout = aiohttp.ClientTimeout(total=PRELOAD_TIMEOUT)
+    async with aiohttp.ClientSession(base_url=OLLAMA_BASE_URL, timeout=timeout) as session:
+        for component, model in OLLAMA_MODELS.items():
+            if model in timings:
+                continue
+            # Use the request-time options so Ollama does not reload the model for a different context size
+            kwargs = get_ollama_model_kwargs(component)
+            options = {key: config[key] for key in ("num_ctx", "num_gpu", "num_thread")}
+            if component == "embeddings":
+                path = "/api/embed"
+                payload = {"model": model, "input": "", "keep_alive": kwargs["keep_alive"], "options": options}
+            else:
+                # A generate request without a prompt loads the model and returns immediately
+                path = "/api/generate"
+                payload = {"model": model, "keep_alive": kwargs["keep_alive"], "options": options}
+            start = time.perf_counter()
+            try:
+                async with session.post(path, json=payload) as response:
+                    if response.status != 200:
+                        raise RuntimeError(f"HTTP {response.status}: {await response.text()}")
+                    await response.read()
+                timings[model] = time.perf_counter() - start
+                logger.info(f"Preloaded Ollama model {model} in {timings[model]:.1f}s")
+            except Exception as e:
+                timings[model] = -1
+                logger.error(f"Failed to preload Ollama model {model}: {str(e)}")
+    return timings
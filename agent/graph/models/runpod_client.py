@@ -5,6 +5,7 @@ import aiohttp
 from typing import Dict, Any, Optional
 import logging
 from asyncio import sleep as async_sleep
+from agent.graph.utils.circuit_breaker import get_circuit_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +24,8 @@ class RunPodClient:
         presence_penalty: float = 0.1,
         frequency_penalty: float = 0.1,
         use_vllm: bool = True,
-        trust_remote_code: bool = True
+        trust_remote_code: bool = True,
+        component: str = "generator"
     ):
         """Initialize RunPod client.
         
@@ -39,6 +41,7 @@ class RunPodClient:
             frequency_penalty: Frequency penalty
             use_vllm: Whether to use vLLM for faster inference
             trust_remote_code: Whether to trust remote code (needed for models like DeepSeek)
+            component: Model component served by this endpoint, used to key its circuit breaker
         """
         self.api_key = api_key
         self.endpoint_id = endpoint_id
@@ -51,6 +54,7 @@ class RunPodClient:
         self.frequency_penalty = frequency_penalty
         self.use_vllm = use_vllm
         self.trust_remote_code = trust_remote_code
+        self.breaker = get_circuit_breaker(component, "runpod")
         self.base_url = f"https://api.runpod.ai/v2/{endpoint_id}"
         self.headers = {
             "Authorization": f"Bearer {api_key}",
@@ -90,6 +94,7 @@ class RunPodClient:
                 "top_k": kwargs.get("top_k", self.top_k),
                 "presence_penalty": kwargs.get("presence_penalty", self.presence_penalty),
                 "frequency_penalty": kwargs.get("frequency_penalty", self.frequency_penalty),
+                "stop": kwargs.get("stop") or [],
                 "use_vllm": self.use_vllm,
                 "serverless": True,
                 "trust_remote_code": self.trust_remote_code,
@@ -111,47 +116,57 @@ class RunPodClient:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                # Start generation
-                async with session.post(
-                    f"{self.base_url}/run",
-                    headers=self.headers,
-                    json=payload
+            return await self.breaker.acall(self._run_job, payload)
+        except Exception as e:
+            logger.error(f"Error in RunPod generation: {str(e)}")
+            raise
+
+    async def _run_job(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Submit a job to the endpoint and poll until it completes.
+        
+        Args:
+            payload: Request payload for the /run endpoint
+            
+        Returns:
+            The job output
+        """
+        async with aiohttp.ClientSession() as session:
+            # Start generation
+            async with session.post(
+                f"{self.base_url}/run",
+                headers=self.headers,
+                json=payload
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"RunPod API error: {error_text}")
+                    raise Exception(f"RunPod API error: {error_text}")
+                
+                result = await response.json()
+                job_id = result["id"]
+            
+            # Poll for completion with exponential backoff
+            backoff = 1
+            max_backoff = 10
+            while True:
+                async with session.get(
+                    f"{self.base_url}/status/{job_id}",
+                    headers=self.headers
                 ) as response:
                     if response.status != 200:
                         error_text = await response.text()
-                        logger.error(f"RunPod API error: {error_text}")
-                        raise Exception(f"RunPod API error: {error_text}")
+                        logger.error(f"RunPod status error: {error_text}")
+                        raise Exception(f"RunPod status error: {error_text}")
                     
-                    result = await response.json()
-                    job_id = result["id"]
-                
-                # Poll for completion with exponential backoff
-                backoff = 1
-                max_backoff = 10
-                while True:
-                    async with session.get(
-                        f"{self.base_url}/status/{job_id}",
-                        headers=self.headers
-                    ) as response:
-                        if response.status != 200:
-                            error_text = await response.text()
-                            logger.error(f"RunPod status error: {error_text}")
-                            raise Exception(f"RunPod status error: {error_text}")
-                        
-                        status = await response.json()
-                        if status["status"] == "COMPLETED":
-                            return status["output"]
-                        elif status["status"] == "FAILED":
-                            raise Exception(f"RunPod job failed: {status.get('error', 'Unknown error')}")
-                        
-                        # Exponential backoff
-                        await async_sleep(backoff)
-                        backoff = min(backoff * 2, max_backoff)
-        
-        except Exception as e:
-            logger.error(f"Error in RunPod generation: {str(e)}")
-            raise
+                    status = await response.json()
+                    if status["status"] == "COMPLETED":
+                        return status["output"]
+                    elif status["status"] == "FAILED":
+                        raise Exception(f"RunPod job failed: {status.get('error', 'Unknown error')}")
+                    
+                    # Exponential backoff
+                    await async_sleep(backoff)
+                    backoff = min(backoff * 2, max_backoff)
     
     @classmethod
     def from_env(cls) -> "RunPodClient":
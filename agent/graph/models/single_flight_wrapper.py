@@ -0,0 +1,167 @@
+"""
+Single-flight wrappers for LangChain chat models and embeddings.
+
+These wrappers sit in front of the configured models and coalesce identical
+in-flight calls (same component, model, messages and generation options)
+issued by concurrent requests in this worker, so only one upstream call is made.
+
+A streaming call (e.g. the generator under astream_events) is not coalesced:
+its tokens go straight from the wrapped model to the caller. Only models
+wrapped with stream=True stream; the others keep coalescing when streamed.
+"""
+
+import copy
+import json
+import logging
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from agent.graph.utils.single_flight import (
+    SINGLE_FLIGHT_ENABLED,
+    chat_flight,
+    embeddings_flight,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightChatModel(BaseChatModel):
+    """Chat model wrapper that shares one upstream call between identical concurrent calls."""
+
+    llm: BaseChatModel
+    component: str = ""
+
+    def _call_key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> str:
+        """Build the identity of a call from everything that affects its output."""
+        return json.dumps(
+            [
+                self.component,
+                id(self.llm),
+                [(message.type, message.content) for message in messages],
+                stop,
+                kwargs,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Generate a response, joining an identical in-flight call if there is one."""
+        key = self._call_key(messages, stop, kwargs)
+        result, shared = chat_flight.do(key, self.llm._generate, messages, stop=stop, run_manager=run_manager, **kwargs)
+        return self._own_copy(result, shared)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Async variant of _generate."""
+        key = self._call_key(messages, stop, kwargs)
+        result, shared = await chat_flight.ado(key, self.llm._agenerate, messages, stop=stop, run_manager=run_manager, **kwargs)
+        return self._own_copy(result, shared)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """Stream the wrapped model's response; streams are not shared."""
+        yield from self.llm._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """Async variant of _stream."""
+        async for chunk in self.llm._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+
+    @staticmethod
+    def _own_copy(result: ChatResult, shared: bool) -> ChatResult:
+        """Copy a result for one caller, flagging results shared from another caller's call."""
+        # Callers tag the returned messages with their own run ids, so never hand out the same objects
+        result = copy.deepcopy(result)
+        if shared:
+            for generation in result.generations:
+                generation.generation_info = {**(generation.generation_info or {}), "cache_hit": True}
+        return result
+
+    @property
+    def _llm_type(self) -> str:
+        """Return the type of LLM."""
+        return self.llm._llm_type
+
+
+class SingleFlightEmbeddings(Embeddings):
+    """Embeddings wrapper that shares one upstream call between identical concurrent calls."""
+
+    def __init__(self, embeddings: Any, component: str = "embeddings"):
+        """Initialize the SingleFlightEmbeddings.
+
+        Args:
+            embeddings: The embeddings object to wrap
+            component: The model component name, used in the call key
+        """
+        self.embeddings = embeddings
+        self.component = component
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents, joining an identical in-flight call if there is one."""
+        key = (self.component, "documents", tuple(texts))
+        vectors, _ = embeddings_flight.do(key, self.embeddings.embed_documents, texts)
+        return [list(vector) for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, joining an identical in-flight call if there is one."""
+        key = (self.component, "query", text)
+        vector, _ = embeddings_flight.do(key, self.embeddings.embed_query, text)
+        return list(vector)
+
+
+def _streams(llm: BaseChatModel) -> bool:
+    """Check whether a chat model implements streaming rather than falling back to generating."""
+    return type(llm)._stream is not BaseChatModel._stream or type(llm)._astream is not BaseChatModel._astream
+
+
+def with_single_flight(llm: BaseChatModel, component: str, stream: bool = False) -> BaseChatModel:
+    """Wrap a chat model for single-flight coalescing unless it is disabled.
+
+    Args:
+        llm: The chat model to wrap
+        component: The model component name, used in the call key
+        stream: Let streaming callers stream from the wrapped model, uncoalesced, if it can stream
+
+    Returns:
+        The wrapped model, or the model itself when single-flight is disabled
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return llm
+    return SingleFlightChatModel(llm=llm, component=component, disable_streaming=not (stream and _streams(llm)))
+
+
+def with_single_flight_embeddings(embeddings: Any, component: str = "embeddings") -> Any:
+    """Wrap an embeddings object for single-flight coalescing unless it is disabled."""
+    if not SINGLE_FLIGHT_ENABLED:
+        return embeddings
+    return SingleFlightEmbeddings(embeddings, component=component)
@@ -0,0 +1,42 @@
+"""Tests for the single-flight chat model wrapper
+
+Run with: python -m pytest agent/graph/models/tests
+"""
+
+import asyncio
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from agent.graph.models.single_flight_wrapper import with_single_flight
+
+
+def _model(answers=("streamed answer",)):
+    return GenericFakeChatModel(messages=iter([AIMessage(answer) for answer in answers]))
+
+
+def _astream(llm):
+    async def collect():
+        return [chunk.content async for chunk in llm.astream("question")]
+
+    return asyncio.run(collect())
+
+
+def test_streaming_model_streams_through_the_wrapper():
+    llm = with_single_flight(_model(), "generator", stream=True)
+    chunks = _astream(llm)
+    assert len(chunks) > 1
+    assert "".join(chunks) == "streamed answer"
+
+
+def test_coalescing_model_answers_streams_in_one_chunk():
+    llm = with_single_flight(_model(), "router")
+    assert _astream(llm) == ["streamed answer"]
+
+
+def test_generation_is_coalesced_while_streaming_is_allowed():
+    llm = with_single_flight(_model(("first", "second")), "generator", stream=True)
+
+    async def concurrent_calls():
+        return await asyncio.gather(llm.ainvoke("question"), llm.ainvoke("question"))
+
+    first, second = asyncio.run(concurrent_calls())
+    assert first.content == second.content == "first"
@@ -12,5 +12,22 @@ from agent.graph.nodes.post_human_in_loop import post_human_in_loop
 from agent.graph.nodes.summarize import summarize
 from agent.graph.nodes.immediate_message_one import immediate_message_one
 from agent.graph.nodes.immediate_message_two import immediate_message_two
+from agent.graph.utils.metrics import timed_node
+
+# Record every node's duration under its name
+generate = timed_node("generate", generate)
+regenerate = timed_node("regenerate", regenerate)
+grade_documents = timed_node("grade_documents", grade_documents)
+retrieve = timed_node("retrieve", retrieve)
+decide_vectorstore = timed_node("decide_vectorstore", decide_vectorstore)
+decide_language = timed_node("decide_language", decide_language)
+web_search = timed_node("web_search", web_search)
+human_in_loop = timed_node("human_in_loop", human_in_loop)
+initialize = timed_node("initialize", initialize)
+pre_human_in_loop = timed_node("pre_human_in_loop", pre_human_in_loop)
+post_human_in_loop = timed_node("post_human_in_loop", post_human_in_loop)
+summarize = timed_node("summarize", summarize)
+immediate_message_one = timed_node("immediate_message_one", immediate_message_one)
+immediate_message_two = timed_node("immediate_message_two", immediate_message_two)
 
 __all__ = ["generate", "regenerate", "grade_documents", "retrieve", "decide_vectorstore", "decide_language", "web_search", "human_in_loop", "initialize", "pre_human_in_loop", "post_human_in_loop", "summarize", "immediate_message_one", "immediate_message_two"]
@@ -1,18 +1,21 @@
 from typing import Any, Dict
 from agent.graph.state import GraphState
 from agent.graph.chains.language_router import get_language_route
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.api_utils import standard_sleep
+import logging
+logger = logging.getLogger(__name__)
+
 
 async def decide_language(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    print("---DECIDE LANGUAGE---")
+    logger.info("---DECIDE LANGUAGE---")
     if config:
         generating_state = {
             **state,
             "current_node": "DECIDE_LANGUAGE"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
 
     query = state.get("query", "")
@@ -4,10 +4,9 @@ from agent.graph.chains.generation import generation_chain
 from agent.graph.state import GraphState
 from langchain_core.messages import AIMessage
 from agent.graph.utils.message_utils import get_content
-from copilotkit.langgraph import copilotkit_emit_state, copilotkit_emit_message
+from agent.graph.utils.state_emitter import emit_state, emit_message
 from agent.graph.utils.api_utils import (
     GENERATION_TIMEOUT,
-    cost_tracker,
 )
 from agent.graph.utils.message_utils import convert_to_raw_documents
 from agent.graph.utils.api_utils import standard_sleep
@@ -15,7 +14,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 async def generate(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    print("---GENERATE---")
+    logger.info("---GENERATE---")
     # Emit only one "GENERATE" state update before generation
     if config:
         generating_state = {
@@ -23,7 +22,7 @@ async def generate(state: GraphState, config: Dict[str, Any] = None) -> Dict[str
             "current_node": "GENERATE"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
     rewritten_query = state.get("rewritten_query", "")
     documents = state.get("documents", [])
@@ -53,14 +52,6 @@ async def generate(state: GraphState, config: Dict[str, Any] = None) -> Dict[str
             timeout=GENERATION_TIMEOUT
         )
         
-        # Track API usage
-        cost_tracker.track_usage(
-            'generator',
-            tokens=len(llm_generation.split()),  # Approximate token count
-            cost=0.0,  # Update cost based on actual pricing
-            requests=1
-        )
-        
         messages.append(AIMessage(
             content=llm_generation,
             additional_kwargs={
@@ -69,7 +60,7 @@ async def generate(state: GraphState, config: Dict[str, Any] = None) -> Dict[str
             }
         ))
         if config:
-            await copilotkit_emit_message(config, llm_generation)
+            await emit_message(config, llm_generation)
 
         return {
             "messages": messages,
@@ -87,7 +78,7 @@ async def generate(state: GraphState, config: Dict[str, Any] = None) -> Dict[str
             }
         ))
         if config:
-            await copilotkit_emit_message(config, warning_message)
+            await emit_message(config, warning_message)
         return {
             "messages": messages,
             "documents": raw_documents,
@@ -107,7 +98,7 @@ async def generate(state: GraphState, config: Dict[str, Any] = None) -> Dict[str
             }
         ))
         if config:
-            await copilotkit_emit_message(config, warning_message)
+            await emit_message(config, warning_message)
         return {
             "messages": messages,
             "documents": raw_documents,
@@ -1,5 +1,6 @@
 from typing import Any, Dict
 import logging
+import contextvars
 from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
 from agent.graph.chains.retrieval_grader import grade_single_document
 from agent.graph.state import GraphState
@@ -7,10 +8,9 @@ from agent.graph.utils.message_utils import get_content
 from agent.graph.utils.api_utils import (
     handle_api_error,
     GRADER_TIMEOUT,
-    cost_tracker,
     GradingResponse
 )
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.api_utils import standard_sleep
 
 logger = logging.getLogger("graph.grade_documents")
@@ -32,7 +32,7 @@ async def grade_documents(state: GraphState, config: Dict[str, Any] = None) -> D
             "current_node": "GRADE_DOCUMENTS"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
 
     query = state.get("query", "")
@@ -53,13 +53,6 @@ async def grade_documents(state: GraphState, config: Dict[str, Any] = None) -> D
                 query=query,
                 document=document_content
             )
-            # Track API usage
-            cost_tracker.track_usage(
-                'grader',
-                tokens=len(document_content.split()),  # Approximate token count
-                cost=0.0,  # Update cost based on actual pricing
-                requests=1
-            )
             return GradingResponse(
                 success=True,
                 binary_score=score.binary_score,
@@ -84,9 +77,10 @@ async def grade_documents(state: GraphState, config: Dict[str, Any] = None) -> D
     
     try:
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all grading tasks
+            # Submit all grading tasks, each in a copy of our context so the
+            # model calls keep their run tree and usage attribution
             future_to_doc = {
-                executor.submit(process_document, doc): doc 
+                executor.submit(contextvars.copy_context().run, process_document, doc): doc 
                 for doc in documents
             }
             
@@ -1,7 +1,7 @@
 from typing import Any, Dict
 from agent.graph.state import GraphState
 from langgraph.types import interrupt
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.api_utils import standard_sleep
 import logging
 
@@ -15,7 +15,7 @@ async def human_in_loop(state: GraphState, config: Dict[str, Any] = None) -> Dic
             "current_node": "HUMAN_IN_LOOP"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
     
     # Create result state with current_node
@@ -2,11 +2,14 @@ from agent.graph.utils.message_utils import get_last_message_type
 from agent.graph.state import GraphState
 from typing import Dict, Any
 from langchain_core.messages import AIMessage
-from copilotkit.langgraph import copilotkit_emit_state, copilotkit_emit_message
+from agent.graph.utils.state_emitter import emit_state, emit_message
 from agent.graph.utils.api_utils import standard_sleep
+import logging
+logger = logging.getLogger(__name__)
+
 
 async def immediate_message_one(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    print("---IMMEDIATE MESSAGE 1---")
+    logger.info("---IMMEDIATE MESSAGE 1---")
     messages = state.get("messages", [])
 
     last_message_type = get_last_message_type(messages)
@@ -26,8 +29,8 @@ async def immediate_message_one(state: GraphState, config: Dict[str, Any] = None
             "current_node": "IMMEDIATE_MESSAGE_1"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
-        await copilotkit_emit_message(config, content)
+        await emit_state(config, generating_state)
+        await emit_message(config, content)
         await standard_sleep()
         # await asyncio.sleep(10)
 
@@ -3,7 +3,7 @@ from typing import Any, Dict
 from agent.graph.state import GraphState
 from agent.graph.utils.message_utils import get_last_message_type
 from agent.graph.utils.firebase_utils import save_conversation_message_api
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.message_utils import trim_messages
 from agent.graph.utils.api_utils import standard_sleep
 
@@ -11,14 +11,14 @@ logger = logging.getLogger("graph.graph")
 
 async def initialize(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
     """Initialize the graph with the necessary state."""
-    print("---INITIALIZE---")
+    logger.info("---INITIALIZE---")
     if config:
         generating_state = {
             **state,
             "current_node": "INITIALIZE"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
     # Get and trim messages
     messages = trim_messages(state.get("messages", []))
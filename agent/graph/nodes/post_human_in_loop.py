@@ -1,12 +1,15 @@
 from typing import Any, Dict
 from agent.graph.state import GraphState
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.state_emitter import emit_state
 from langchain_core.messages import AIMessage
 from agent.graph.utils.flow_state import reset_flow_state
 from agent.graph.utils.api_utils import standard_sleep
+import logging
+logger = logging.getLogger(__name__)
+
 
 async def post_human_in_loop(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    print("---POST HUMAN IN LOOP---")
+    logger.info("---POST HUMAN IN LOOP---")
     messages = state.get("messages", [])
 
     if config:
@@ -15,7 +18,7 @@ async def post_human_in_loop(state: GraphState, config: Dict[str, Any] = None) -
             "current_node": "POST_HUMAN_IN_LOOP"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
     # Find and modify the last AI message
     for i in range(len(messages) - 1, -1, -1):
@@ -34,7 +37,7 @@ async def post_human_in_loop(state: GraphState, config: Dict[str, Any] = None) -
 
     # Reset flow_state counters since we're at the end of the conversation
     reset_flow_state()
-    print("Flow state counters reset")
+    logger.debug("Flow state counters reset")
 
     return {
         "messages": messages
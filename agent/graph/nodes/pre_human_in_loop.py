@@ -1,17 +1,20 @@
 from typing import Any, Dict
 from agent.graph.state import GraphState
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.api_utils import standard_sleep
+import logging
+logger = logging.getLogger(__name__)
+
 
 async def pre_human_in_loop(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    print("---PRE HUMAN IN LOOP---")
+    logger.info("---PRE HUMAN IN LOOP---")
     if config:
         generating_state = {
             **state,
             "current_node": "PRE_HUMAN_IN_LOOP"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
         
     need_human_feedback = state.get("need_human_feedback", False)
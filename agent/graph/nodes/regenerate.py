@@ -6,10 +6,9 @@ from agent.graph.state import GraphState
 from langchain_core.messages import AIMessage
 from agent.graph.utils.message_utils import get_last_message_type
 from agent.graph.utils.message_utils import get_content
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.api_utils import (
     GENERATION_TIMEOUT,
-    cost_tracker,
 )
 from agent.graph.utils.message_utils import convert_to_raw_documents
 from agent.graph.utils.api_utils import standard_sleep
@@ -18,7 +17,7 @@ logger = logging.getLogger(__name__)
 
 
 async def regenerate(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    print("---REGENERATE---")
+    logger.info("---REGENERATE---")
     
     # Get state variables
     rewritten_query = state.get("rewritten_query", "")
@@ -35,7 +34,7 @@ async def regenerate(state: GraphState, config: Dict[str, Any] = None) -> Dict[s
             "current_node": "REGENERATE"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
     last_message_type = get_last_message_type(messages)
     if last_message_type == "human":
@@ -69,14 +68,6 @@ async def regenerate(state: GraphState, config: Dict[str, Any] = None) -> Dict[s
             timeout=GENERATION_TIMEOUT
         )
         
-        # Track API usage
-        cost_tracker.track_usage(
-            'generator',
-            tokens=len(llm_generation.split()),  # Approximate token count
-            cost=0.0,  # Update cost based on actual pricing
-            requests=1
-        )
-        
         messages.append(AIMessage(
             content=llm_generation,
             additional_kwargs={
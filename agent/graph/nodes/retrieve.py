@@ -1,18 +1,22 @@
 from typing import Any, Dict
 from agent.graph.state import GraphState
 from agent.graph.retrievers import get_retriever
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.api_utils import standard_sleep
+from agent.graph.utils.metrics import RETRIEVAL_DURATION
+import logging
+logger = logging.getLogger(__name__)
+
 
 async def retrieve(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    print("---RETRIEVE---")
+    logger.info("---RETRIEVE---")
     if config:
         generating_state = {
             **state,
             "current_node": "RETRIEVE"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)   
+        await emit_state(config, generating_state)   
         await standard_sleep()
         
     query = state.get("query", "")
@@ -23,5 +27,6 @@ async def retrieve(state: GraphState, config: Dict[str, Any] = None) -> Dict[str
     if retriever is None:
         return {"documents": []}
     else:
-        documents = retriever.invoke(query)
+        with RETRIEVAL_DURATION.time(vectorstore):
+            documents = retriever.invoke(query)
         return {"documents": documents}
\ No newline at end of file
@@ -1,14 +1,10 @@
 from typing import Any, Dict
 import asyncio
-from agent.graph.chains.summary import summary_chain
 from agent.graph.state import GraphState
-from copilotkit.langgraph import copilotkit_emit_state
-from agent.graph.utils.api_utils import (
-    cost_tracker,
-)
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.message_utils import trim_messages
 from agent.graph.utils.api_utils import standard_sleep
-from agent.graph.chains.summary import invoke_summary_chain
+from agent.graph.chains.summary import ainvoke_summary_chain
 
 import logging
 logger = logging.getLogger(__name__)
@@ -27,7 +23,7 @@ def simplify_messages(messages: list) -> list:
     return simplified_messages
 
 async def summarize(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    print("---SUMMARIZE---")
+    logger.info("---SUMMARIZE---")
     # Emit state update for summarization
     query = state.get("query", "")
     if "Please write code in" in query:
@@ -42,22 +38,19 @@ async def summarize(state: GraphState, config: Dict[str, Any] = None) -> Dict[st
             "current_node": "SUMMARIZE"
         }
         # print(f"Emitting summarizing state: {summarizing_state}")
-        await copilotkit_emit_state(config, summarizing_state)
+        await emit_state(config, summarizing_state)
         await standard_sleep()
     messages = state.get("messages", [])
     messages = trim_messages(messages)
     messages = simplify_messages(messages)
 
     try:
-        # Use asyncio to handle concurrent summarization requests with timeout
+        # Summarize on the event loop, bounded by the timeout
         summary_result = await asyncio.wait_for(
-            asyncio.to_thread(
-                invoke_summary_chain(messages, instructions)
-            ),
+            ainvoke_summary_chain(messages, instructions),
             timeout=SUMMARIZE_TIMEOUT
         )
         
-        # Track API usage
         if summary_result is not None:
             try:
                 result_text = summary_result.rewritten_query
@@ -66,13 +59,6 @@ async def summarize(state: GraphState, config: Dict[str, Any] = None) -> Dict[st
         else:
             result_text = ""
 
-        cost_tracker.track_usage(
-            'summarizer',
-            tokens=len(result_text.split()),  # Approximate token count
-            cost=0.0,  # Update cost based on actual pricing
-            requests=1
-        )
-
         # Update the query in state with the summarized result
         rewritten_query = result_text
 
@@ -1,7 +1,7 @@
 from typing import Any, Dict
+import time
 import logging
 from langchain.schema import Document
-from langchain_community.tools.tavily_search import TavilySearchResults
 from agent.graph.state import GraphState
 from agent.graph.utils.timeout import timeout
 from agent.graph.utils.api_utils import (
@@ -11,20 +11,29 @@ from agent.graph.utils.api_utils import (
     APIResponse
 )
 from agent.graph.utils.message_utils import get_content
-from copilotkit.langgraph import copilotkit_emit_state
+from agent.graph.utils.circuit_breaker import get_circuit_breaker
+from agent.graph.utils.state_emitter import emit_state
 from agent.graph.utils.api_utils import standard_sleep
+from agent.graph.utils.lazy import LazyRunnable
 
 logger = logging.getLogger("graph.web_search")
 
-web_search_tool = TavilySearchResults(k=3)
+def build_web_search_tool():
+    """Build the Tavily search tool; it checks TAVILY_API_KEY, so this runs on first use, not on import."""
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    return TavilySearchResults(k=3)
+
+web_search_tool = LazyRunnable("web_search_tool", build_web_search_tool)
+web_search_breaker = get_circuit_breaker("web_search", "tavily")
 
 @timeout(STANDARD_TIMEOUT)
 @handle_api_error
 async def perform_web_search(query: str) -> APIResponse:
     """Perform web search with timeout and error handling."""
     try:
-        docs = web_search_tool.invoke({"query": query})
-        cost_tracker.track_usage('web_search', tokens=0, cost=0.0, requests=1)  # Update cost based on actual pricing
+        started = time.perf_counter()
+        docs = web_search_breaker.call(web_search_tool.invoke, {"query": query})
+        cost_tracker.record('web_search', latency_ms=(time.perf_counter() - started) * 1000)  # Update cost based on actual pricing
         return APIResponse(
             success=True,
             data=docs
@@ -45,7 +54,7 @@ async def web_search(state: GraphState, config: Dict[str, Any] = None) -> Dict[s
             "current_node": "WEBSEARCH"
         }
         # print(f"Emitting generating state: {generating_state}")
-        await copilotkit_emit_state(config, generating_state)
+        await emit_state(config, generating_state)
         await standard_sleep()
         
     query = state.get("query", "")
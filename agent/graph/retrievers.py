@@ -1,5 +1,7 @@
 from agent.graph.models.embeddings import embeddings
 from agent.graph.vector_stores import get_vector_store
+import logging
+logger = logging.getLogger(__name__)
 
 
 def get_retriever(collection_name):
@@ -22,5 +24,5 @@ def get_retriever(collection_name):
             return None
             
     except Exception as e:
-        print(f"Error getting retriever for {collection_name}: {e}")
+        logger.error("Error getting retriever for %s: %s", collection_name, e)
         return None
@@ -10,45 +10,11 @@ load_dotenv()
 
 import logging
 import uvicorn
+from agent.graph.utils.logging_setup import setup_logging
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
-def configure_logging():
-    """Configure logging for the server."""
-    # Configure uvicorn logging
-    log_config = uvicorn.config.LOGGING_CONFIG
-    log_config["formatters"]["default"]["fmt"] = "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s"
-    log_config["formatters"]["access"]["fmt"] = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    
-    # Add our graph logger to uvicorn's config
-    log_config["loggers"]["graph.graph"] = {
-        "handlers": ["default"],
-        "level": "DEBUG",
-        "propagate": False
-    }
-    
-    # Add more loggers to uvicorn's config
-    log_config["loggers"]["uvicorn"] = {
-        "handlers": ["default"],
-        "level": "DEBUG",
-        "propagate": False
-    }
-    
-    log_config["loggers"]["fastapi"] = {
-        "handlers": ["default"],
-        "level": "DEBUG",
-        "propagate": False
-    }
-    
-    log_config["loggers"]["copilotkit"] = {
-        "handlers": ["default"],
-        "level": "DEBUG",
-        "propagate": False
-    }
-    
-    return log_config
-
 def start_server():
     """Start the uvicorn server."""
     # Check if we should start the server based on SERVER_TYPE
@@ -62,21 +28,15 @@ def start_server():
     port = int(os.getenv("PORT", "8000"))
     logger.info(f"Starting local server on port {port}")
     
-    log_config = configure_logging()
-    
-    logger.info("Starting uvicorn server with logging configuration")
+    # Logging is set up by the app; uvicorn's loggers propagate to its queue
+    logger.info("Starting uvicorn server")
     uvicorn.run(
         "agent.graph.app:app",
         host="0.0.0.0",
         port=port,
-        log_config=log_config,
+        log_config=None,
     )
 
 if __name__ == "__main__":
-    # Configure root logger
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
-        force=True
-    )
+    setup_logging()
     start_server() 
\ No newline at end of file
@@ -26,15 +26,13 @@ import os
 import logging
 from dotenv import load_dotenv
 from agent.graph.app import app
+from agent.graph.utils.logging_setup import setup_logging
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-)
+# Configure logging (a no-op if the app already did)
+setup_logging()
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
@@ -101,15 +99,9 @@ elif SERVER_TYPE == "gcp":
         
         # Configuration for production
         if os.getenv("ENVIRONMENT") == "production":
-            options = {
-                "bind": f"0.0.0.0:{port}",
-                "workers": int(os.getenv("GUNICORN_WORKERS", "1")),
-                "worker_class": "uvicorn.workers.UvicornWorker",
-                "timeout": 120,
-                "keepalive": 5,
-                "errorlog": "-",
-                "accesslog": "-",
-            }
+            # Same profile as the Dockerfile: preloaded app, one uvloop worker per available CPU
+            from agent.graph import gunicorn_conf
+            options = vars(gunicorn_conf)
             
             StandaloneApplication(app, options).run()
         else:
@@ -0,0 +1,229 @@
+"""Admission control for agent runs.
+
+Every agent run fans out into several model and search calls, so a burst
+of runs queues on the providers and every run slows down until they all
+time out together. The admission controller caps the runs a worker
+executes at once. Runs over the cap wait in a bounded queue, and a run
+that cannot be queued is turned away immediately. That keeps overload a
+fast 503 with Retry-After instead of a slow timeout.
+
+Queued runs are admitted by priority class (high, normal, low) and then
+in arrival order. When the queue is full, a higher-priority arrival takes
+the place of the newest waiter of the lowest class below it, and that
+waiter is rejected. Runs that wait longer than the queue timeout are
+rejected too. Retry-After estimates when the queue will have drained,
+from the recent service time of a run.
+
+Limits are per worker, like the local rate limiter, so N workers admit up
+to N times ADMISSION_MAX_CONCURRENT runs.
+
+Environment Variables:
+    ADMISSION_MAX_CONCURRENT: Agent runs a worker executes at once (default: CONCURRENCY_LIMIT or 5)
+    ADMISSION_MAX_QUEUE: Agent runs that may wait for a slot (default: 2 x ADMISSION_MAX_CONCURRENT)
+    ADMISSION_QUEUE_TIMEOUT: Seconds a run may wait before it is rejected (default: 10)
+    ADMISSION_PATHS: Comma-separated path prefixes under admission control (default: /api/copilotkitagent)
+    ADMISSION_EXEMPT_PATHS: Comma-separated path prefixes exempt from it (default: /api/copilotkitagent/info)
+    ADMISSION_PRIORITY_HEADER: Request header naming the priority class (default: X-Priority)
+"""
+
+import os
+import math
+import heapq
+import asyncio
+import logging
+import itertools
+import statistics
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT") or os.getenv("CONCURRENCY_LIMIT", "5"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE") or 2 * ADMISSION_MAX_CONCURRENT)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+ADMISSION_PATHS = [path.strip() for path in os.getenv("ADMISSION_PATHS", "/api/copilotkitagent").split(",") if path.strip()]
+ADMISSION_EXEMPT_PATHS = [
+    path.strip() for path in os.getenv("ADMISSION_EXEMPT_PATHS", "/api/copilotkitagent/info").split(",") if path.strip()
+]
+ADMISSION_PRIORITY_HEADER = os.getenv("ADMISSION_PRIORITY_HEADER", "X-Priority").lower()
+
+# Priority classes; lower values are admitted first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+DEFAULT_PRIORITY = "normal"
+
+# Bounds of the Retry-After estimate, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+
+# Queue times kept for the percentiles in stats
+QUEUE_TIME_SAMPLES = 1000
+
+
+class AdmissionRejected(Exception):
+    """A run was not admitted."""
+
+    def __init__(self, reason: str, retry_after: int):
+        """Initialize the rejection.
+
+        Args:
+            reason: "queue_full", "timeout" or "evicted"
+            retry_after: Seconds the client should wait before retrying
+        """
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded priority queue in front of it."""
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+    ):
+        """Initialize the controller.
+
+        Args:
+            max_concurrent: Runs executed at once
+            max_queue: Runs that may wait for a slot
+            queue_timeout: Seconds a run may wait before it is rejected
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.queued = 0
+        self.admitted = 0
+        self.admitted_after_queueing = 0
+        self.rejected = {"queue_full": 0, "timeout": 0, "evicted": 0}
+        # (priority, arrival, future); futures resolved elsewhere are skipped when popped
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._queue_times: Deque[float] = deque(maxlen=QUEUE_TIME_SAMPLES)
+        self._service_seconds: Optional[float] = None
+
+    def retry_after(self) -> int:
+        """Estimate the seconds until the queue has drained."""
+        service_seconds = self._service_seconds or self.queue_timeout
+        seconds = (self.queued + 1) * service_seconds / self.max_concurrent
+        return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, math.ceil(seconds)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        return AdmissionRejected(reason, self.retry_after())
+
+    def _evict_for(self, priority: int) -> bool:
+        """Reject the newest waiter of the lowest class below `priority` to make room, if there is one."""
+        waiting = [waiter for waiter in self._waiters if not waiter[2].done() and waiter[0] > priority]
+        if not waiting:
+            return False
+        _, _, future = max(waiting, key=lambda waiter: (waiter[0], waiter[1]))
+        self.queued -= 1
+        future.set_exception(self._reject("evicted"))
+        return True
+
+    async def acquire(self, priority: str = DEFAULT_PRIORITY) -> float:
+        """Wait for a slot.
+
+        Args:
+            priority: Priority class of the run (high, normal, low)
+
+        Returns:
+            Seconds spent in the queue
+
+        Raises:
+            AdmissionRejected: The queue is full, the wait timed out, or a higher-priority run took the place
+        """
+        if self.running < self.max_concurrent and not self.queued:
+            self.running += 1
+            self.admitted += 1
+            self._queue_times.append(0.0)
+            return 0.0
+
+        rank = PRIORITIES.get(priority, PRIORITIES[DEFAULT_PRIORITY])
+        if self.queued >= self.max_queue and not self._evict_for(rank):
+            raise self._reject("queue_full")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (rank, next(self._arrivals), future))
+        self.queued += 1
+        started = loop.time()
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except AdmissionRejected:
+            raise
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as the wait ended; pass it on
+                self.release()
+            elif not future.done() or future.cancelled():
+                self.queued -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("timeout")
+            raise
+        waited = loop.time() - started
+        self.admitted += 1
+        self.admitted_after_queueing += 1
+        self._queue_times.append(waited)
+        return waited
+
+    def release(self, service_seconds: Optional[float] = None) -> None:
+        """Free a slot and hand it to the next waiter.
+
+        Args:
+            service_seconds: How long the run held the slot, for the Retry-After estimate
+        """
+        if service_seconds is not None:
+            # Exponentially weighted, so the estimate follows changes in provider latency
+            previous = self._service_seconds
+            self._service_seconds = service_seconds if previous is None else 0.8 * previous + 0.2 * service_seconds
+        self.running -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.queued -= 1
+            self.running += 1
+            future.set_result(None)
+            break
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the controller's occupancy, counters and queue times in milliseconds."""
+        queue_times = sorted(self._queue_times)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "admitted_after_queueing": self.admitted_after_queueing,
+            "rejected": dict(self.rejected),
+            "queue_ms_p50": round(statistics.median(queue_times) * 1000, 1) if queue_times else None,
+            "queue_ms_p95": round(queue_times[int(0.95 * (len(queue_times) - 1))] * 1000, 1) if queue_times else None,
+            "queue_ms_max": round(queue_times[-1] * 1000, 1) if queue_times else None,
+            "service_ms": round(self._service_seconds * 1000, 1) if self._service_seconds is not None else None,
+        }
+
+
+def is_admission_controlled(path: str) -> bool:
+    """Whether requests to a path go through admission control."""
+    if any(path.startswith(prefix) for prefix in ADMISSION_EXEMPT_PATHS):
+        return False
+    return any(path.startswith(prefix) for prefix in ADMISSION_PATHS)
+
+
+# Global admission controller for this worker
+admission_controller = AdmissionController()
+
+
+def get_admission_stats() -> Dict[str, Any]:
+    """Get the stats of the global admission controller."""
+    return admission_controller.stats()
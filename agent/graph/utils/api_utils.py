@@ -1,14 +1,28 @@
-"""Utility functions for API error handling and response validation."""
+"""Utility functions for API error handling, response validation and usage accounting."""
 
+import os
+import copy
+import atexit
+import bisect
 import logging
-from typing import Any, Dict, Optional, TypeVar, Generic
+import threading
+from collections import OrderedDict, deque
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple, TypeVar, Generic
+from uuid import UUID
 from pydantic import BaseModel, field_validator
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import LLMResult
 import json
 from datetime import datetime
 from pathlib import Path
 import asyncio
 import functools
 import time
+from agent.graph.utils.metrics import LLM_CALL_DURATION, LLM_CALLS, LLM_TOKENS
 logger = logging.getLogger(__name__)
 
 # Standard timeout settings
@@ -61,20 +75,134 @@ class GenerationResponse(APIResponse[str]):
             raise ValueError('Content cannot be empty')
         return v
 
+# Usage accounting settings
+USAGE_FILE = os.getenv("USAGE_FILE", "api_usage.json")
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "30"))  # seconds
+USAGE_MAX_TRACKED_REQUESTS = int(os.getenv("USAGE_MAX_TRACKED_REQUESTS", "1000"))
+USAGE_MAX_PENDING = 10000
+# Upper bounds of the output-length histogram buckets, in completion tokens;
+# a final bucket counts everything longer
+OUTPUT_LENGTH_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+# Request attribution for usage records; set per request by the HTTP middleware
+_usage_context: ContextVar[Dict[str, str]] = ContextVar("usage_context", default={})
+
+def set_usage_context(**attributes: Optional[str]) -> Token:
+    """Attribute usage recorded in the current context to a request, thread and user.
+
+    Args:
+        **attributes: request_id, thread_id and/or user_id; None values are ignored
+
+    Returns:
+        Token for reset_usage_context
+    """
+    context = {**_usage_context.get(), **{k: str(v) for k, v in attributes.items() if v}}
+    return _usage_context.set(context)
+
+def reset_usage_context(token: Token) -> None:
+    """Restore the usage attribution in place before set_usage_context."""
+    _usage_context.reset(token)
+
+def get_usage_context() -> Dict[str, str]:
+    """Get the usage attribution of the current context."""
+    return _usage_context.get()
+
+@dataclass(frozen=True)
+class UsageRecord:
+    """A single upstream call, as recorded on the hot path."""
+    component: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    requests: int = 1
+    latency_ms: float = 0.0
+    cache_hit: bool = False
+    model: str = ""
+    prompt: str = ""
+    finish_reason: str = ""
+    request_id: str = ""
+    thread_id: str = ""
+    user_id: str = ""
+    timestamp: float = field(default_factory=time.time)
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        'tokens': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'cost': 0.0,
+        'requests': 0,
+        'cache_hits': 0,
+        'truncated': 0,
+        'latency_ms': 0.0,
+    }
+
+def _add_to_totals(totals: Dict[str, Any], record: UsageRecord) -> None:
+    totals['tokens'] += record.prompt_tokens + record.completion_tokens
+    totals['prompt_tokens'] += record.prompt_tokens
+    totals['completion_tokens'] += record.completion_tokens
+    totals['cost'] += record.cost
+    totals['requests'] += record.requests
+    totals['cache_hits'] += int(record.cache_hit)
+    # Output cut off by max_tokens; a profile limit set too low shows up here
+    totals['truncated'] += int(record.finish_reason == "length")
+    totals['latency_ms'] += record.latency_ms
+
+def _observe_output_length(totals: Dict[str, Any], record: UsageRecord) -> None:
+    """Count a call's completion tokens in the component's output-length histogram."""
+    # Shared results and providers that report no usage say nothing about output length
+    if record.cache_hit or not record.completion_tokens:
+        return
+    histogram = totals.get('output_length_histogram')
+    if not histogram or len(histogram) != len(OUTPUT_LENGTH_BUCKETS) + 1:
+        histogram = totals['output_length_histogram'] = [0] * (len(OUTPUT_LENGTH_BUCKETS) + 1)
+    histogram[bisect.bisect_left(OUTPUT_LENGTH_BUCKETS, record.completion_tokens)] += 1
+
+def _summarize_histogram(histogram: List[int]) -> Dict[str, Any]:
+    """Label the buckets of an output-length histogram and estimate its percentiles."""
+    labels = [f"<={bound}" for bound in OUTPUT_LENGTH_BUCKETS] + [f">{OUTPUT_LENGTH_BUCKETS[-1]}"]
+    count = sum(histogram)
+    summary: Dict[str, Any] = {'count': count, 'buckets': dict(zip(labels, histogram))}
+    for name, quantile in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+        # Upper bound of the bucket holding the quantile; None when it is the overflow bucket
+        seen, value = 0, None
+        for index, bucket_count in enumerate(histogram):
+            seen += bucket_count
+            if count and seen >= quantile * count:
+                value = OUTPUT_LENGTH_BUCKETS[index] if index < len(OUTPUT_LENGTH_BUCKETS) else None
+                break
+        summary[name] = value
+    return summary
+
 class APICostTracker:
-    """Tracks API usage and costs."""
+    """Tracks API usage and costs.
+
+    Recording only appends to a deque, which is atomic, so model calls on any
+    thread never wait on a lock. The records are folded into the per-component
+    and per-request totals in batches, by the background flush task or when
+    the totals are queried, and the component totals are written to disk in
+    the background.
+    """
     
-    def __init__(self):
-        self.usage = {
-            'embeddings': {'tokens': 0, 'cost': 0.0, 'requests': 0},
-            'router': {'tokens': 0, 'cost': 0.0, 'requests': 0},
-            'grader': {'tokens': 0, 'cost': 0.0, 'requests': 0},
-            'generator': {'tokens': 0, 'cost': 0.0, 'requests': 0},
-            'web_search': {'tokens': 0, 'cost': 0.0, 'requests': 0}
+    def __init__(
+        self,
+        usage_file: str = USAGE_FILE,
+        flush_interval: float = USAGE_FLUSH_INTERVAL,
+        max_tracked_requests: int = USAGE_MAX_TRACKED_REQUESTS,
+    ):
+        self.usage: Dict[str, Dict[str, Any]] = {
+            component: _empty_totals()
+            for component in ('embeddings', 'router', 'grader', 'generator', 'web_search')
         }
-        self.last_save = datetime.now()
-        self.save_interval = 300  # 5 minutes
-        self.usage_file = Path('api_usage.json')
+        # Most recent requests only, oldest first
+        self.requests: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.usage_file = Path(usage_file)
+        self.flush_interval = flush_interval
+        self.max_tracked_requests = max_tracked_requests
+        self._pending: Deque[UsageRecord] = deque()
+        self._aggregate_lock = threading.Lock()
+        self._dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
         self._load_usage()
 
     def _load_usage(self):
@@ -82,44 +210,358 @@ class APICostTracker:
         if self.usage_file.exists():
             try:
                 with open(self.usage_file, 'r') as f:
-                    self.usage = json.load(f)
+                    stored = json.load(f)
+                # Older files only have tokens, cost and requests
+                for component, totals in stored.items():
+                    self.usage[component] = {**_empty_totals(), **totals}
             except Exception as e:
                 logger.error(f"Error loading usage data: {e}")
 
-    def _save_usage(self):
+    def _save_usage(self, usage: Dict[str, Dict[str, Any]]):
         """Save usage data to file."""
         try:
             with open(self.usage_file, 'w') as f:
-                json.dump(self.usage, f, indent=2, default=str)
+                json.dump(usage, f, indent=2, default=str)
         except Exception as e:
             logger.error(f"Error saving usage data: {e}")
 
+    def record(
+        self,
+        component: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cost: float = 0.0,
+        requests: int = 1,
+        latency_ms: float = 0.0,
+        cache_hit: bool = False,
+        model: str = "",
+        prompt: str = "",
+        finish_reason: str = "",
+        request_id: Optional[str] = None,
+        thread_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> None:
+        """Record one upstream call.
+
+        Args:
+            component: Component that made the call (router, generator, ...)
+            prompt_tokens: Prompt tokens reported by the provider
+            completion_tokens: Completion tokens reported by the provider
+            cost: Cost of the call
+            requests: Number of upstream requests made
+            latency_ms: Wall time of the call in milliseconds
+            cache_hit: Whether the result was served without an upstream call
+            model: Model that served the call
+            prompt: Prompt the call was made with, as "name@version#hash"
+            finish_reason: Why generation stopped ("stop", "length", ...)
+            request_id: Request to attribute the call to (default: current context)
+            thread_id: Thread to attribute the call to (default: current context)
+            user_id: User to attribute the call to (default: current context)
+        """
+        context = _usage_context.get()
+        self._pending.append(UsageRecord(
+            component=component,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=cost,
+            requests=requests,
+            latency_ms=latency_ms,
+            cache_hit=cache_hit,
+            model=model,
+            prompt=prompt,
+            finish_reason=finish_reason or "",
+            request_id=request_id or context.get("request_id", ""),
+            thread_id=thread_id or context.get("thread_id", ""),
+            user_id=user_id or context.get("user_id", ""),
+        ))
+        # Without a running flush task (scripts, tests), fold records in before they pile up
+        if len(self._pending) >= USAGE_MAX_PENDING and self._flush_task is None:
+            self._aggregate()
+
     def track_usage(self, api_type: str, tokens: int = 0, cost: float = 0.0, requests: int = 0):
-        """Track API usage and costs."""
-        if api_type not in self.usage:
-            self.usage[api_type] = {'tokens': 0, 'cost': 0.0, 'requests': 0}
+        """Track API usage and costs for calls that do not report token usage."""
+        self.record(api_type, completion_tokens=tokens, cost=cost, requests=requests)
 
-        print(tokens, cost, requests)
-        self.usage[api_type]['tokens'] += tokens
-        self.usage[api_type]['cost'] += cost
-        self.usage[api_type]['requests'] += requests
+    def _aggregate(self) -> int:
+        """Fold pending records into the totals.
 
-        # Save if interval has passed
-        if (datetime.now() - self.last_save).total_seconds() >= self.save_interval:
-            self._save_usage()
-            self.last_save = datetime.now()
+        Returns:
+            Number of records folded in
+        """
+        count = 0
+        with self._aggregate_lock:
+            while True:
+                try:
+                    record = self._pending.popleft()
+                except IndexError:
+                    break
+                totals = self.usage.setdefault(record.component, _empty_totals())
+                _add_to_totals(totals, record)
+                _observe_output_length(totals, record)
+                if record.request_id:
+                    self._add_to_request(record)
+                count += 1
+            if count:
+                self._dirty = True
+        return count
 
-    def get_usage_summary(self) -> Dict[str, Any]:
-        """Get a summary of API usage."""
+    def _add_to_request(self, record: UsageRecord) -> None:
+        """Add a record to its request's totals, evicting the oldest requests."""
+        entry = self.requests.get(record.request_id)
+        if entry is None:
+            entry = {
+                'request_id': record.request_id,
+                'thread_id': record.thread_id,
+                'user_id': record.user_id,
+                'started_at': record.timestamp,
+                'models': [],
+                'prompts': [],
+                'by_component': {},
+            }
+            self.requests[record.request_id] = entry
+            while len(self.requests) > self.max_tracked_requests:
+                self.requests.popitem(last=False)
+        if record.model and record.model not in entry['models']:
+            entry['models'].append(record.model)
+        if record.prompt and record.prompt not in entry['prompts']:
+            entry['prompts'].append(record.prompt)
+        _add_to_totals(entry['by_component'].setdefault(record.component, _empty_totals()), record)
+
+    def flush(self) -> None:
+        """Fold pending records in and write the totals to disk if they changed."""
+        self._aggregate()
+        with self._aggregate_lock:
+            if not self._dirty:
+                return
+            snapshot = copy.deepcopy(self.usage)
+            self._dirty = False
+        self._save_usage(snapshot)
+
+    async def aflush(self) -> None:
+        """Async variant of flush; the file write runs in a worker thread."""
+        self._aggregate()
+        with self._aggregate_lock:
+            if not self._dirty:
+                return
+            snapshot = copy.deepcopy(self.usage)
+            self._dirty = False
+        await asyncio.to_thread(self._save_usage, snapshot)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.aflush()
+            except Exception as e:
+                logger.error(f"Error flushing usage data: {e}")
+
+    def start_background_flush(self) -> None:
+        """Start flushing usage in batches on the running event loop."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def stop_background_flush(self) -> None:
+        """Stop the background flush task and write out everything recorded so far."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.aflush()
+
+    @staticmethod
+    def _summarize(by_component: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Add totals and average latencies to a set of per-component totals."""
+        by_type = {}
+        for component, totals in by_component.items():
+            totals = dict(totals)
+            upstream = totals['requests'] - totals['cache_hits']
+            histogram = totals.pop('output_length_histogram', None)
+            by_type[component] = {
+                **totals,
+                'avg_latency_ms': round(totals['latency_ms'] / totals['requests'], 1) if totals['requests'] else 0.0,
+                'upstream_requests': max(upstream, 0),
+            }
+            if histogram:
+                by_type[component]['output_length'] = _summarize_histogram(histogram)
         return {
-            'total_tokens': sum(u['tokens'] for u in self.usage.values()),
-            'total_cost': sum(u['cost'] for u in self.usage.values()),
-            'total_requests': sum(u['requests'] for u in self.usage.values()),
-            'by_type': self.usage
+            'total_tokens': sum(u['tokens'] for u in by_component.values()),
+            'total_prompt_tokens': sum(u['prompt_tokens'] for u in by_component.values()),
+            'total_completion_tokens': sum(u['completion_tokens'] for u in by_component.values()),
+            'total_cost': sum(u['cost'] for u in by_component.values()),
+            'total_requests': sum(u['requests'] for u in by_component.values()),
+            'by_type': by_type,
         }
 
+    def get_usage_summary(self) -> Dict[str, Any]:
+        """Get a summary of API usage."""
+        self._aggregate()
+        with self._aggregate_lock:
+            return self._summarize(copy.deepcopy(self.usage))
+
+    def get_component_usage(self, component: str) -> Optional[Dict[str, Any]]:
+        """Get the usage totals of one component, or None if it has no usage."""
+        return self.get_usage_summary()['by_type'].get(component)
+
+    def get_request_usage(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Get the usage of one recent request, broken down by component.
+
+        Args:
+            request_id: The request id (X-Request-ID)
+
+        Returns:
+            The request's usage, or None if it is unknown or no longer tracked
+        """
+        self._aggregate()
+        with self._aggregate_lock:
+            entry = self.requests.get(request_id)
+            if entry is None:
+                return None
+            entry = copy.deepcopy(entry)
+        by_component = entry.pop('by_component')
+        return {**entry, **self._summarize(by_component)}
+
+    def get_recent_requests(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get the usage of the most recent requests, newest first."""
+        self._aggregate()
+        with self._aggregate_lock:
+            request_ids = list(self.requests)[-limit:]
+        return [usage for usage in map(self.get_request_usage, reversed(request_ids)) if usage]
+
 # Global cost tracker instance
 cost_tracker = APICostTracker()
+atexit.register(cost_tracker.flush)
+
+def _prompt_label(metadata: Dict[str, Any]) -> str:
+    """Label a call's prompt from the run metadata the prompt registry attaches to chains."""
+    if not metadata.get("prompt_name"):
+        return ""
+    return f"{metadata['prompt_name']}@{metadata.get('prompt_version', '')}#{metadata.get('prompt_hash', '')}"
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Records provider-reported token usage and latency of a model's calls."""
+
+    def __init__(self, component: str, tracker: Optional[APICostTracker] = None):
+        """Initialize the handler.
+
+        Args:
+            component: Component the model serves (router, generator, ...)
+            tracker: Tracker to record into (default: the global cost tracker)
+        """
+        self.component = component
+        self.tracker = tracker or cost_tracker
+        self._runs: Dict[UUID, Tuple[float, Dict[str, Any]]] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._runs[run_id] = (time.perf_counter(), metadata or {})
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        self._runs[run_id] = (time.perf_counter(), metadata or {})
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started, metadata = self._runs.pop(run_id, (None, {}))
+        latency_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        generation_info = (generation.generation_info if generation else None) or {}
+        llm_output = response.llm_output or {}
+        # Ollama reports why it stopped as done_reason
+        finish_reason = generation_info.get("finish_reason") or generation_info.get("done_reason") or ""
+        cache_hit = bool(generation_info.get("cache_hit"))
+
+        prompt_tokens = completion_tokens = 0
+        usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage_metadata:
+            prompt_tokens = usage_metadata.get("input_tokens", 0)
+            completion_tokens = usage_metadata.get("output_tokens", 0)
+        elif llm_output.get("token_usage"):
+            prompt_tokens = llm_output["token_usage"].get("prompt_tokens", 0)
+            completion_tokens = llm_output["token_usage"].get("completion_tokens", 0)
+        if cache_hit:
+            # The tokens were paid for by the call this result was shared from
+            prompt_tokens = completion_tokens = 0
+
+        LLM_CALL_DURATION.observe(latency_ms / 1000, self.component)
+        LLM_CALLS.inc(self.component, "hit" if cache_hit else "miss")
+        if prompt_tokens:
+            LLM_TOKENS.inc(self.component, "prompt", amount=prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.inc(self.component, "completion", amount=completion_tokens)
+
+        self.tracker.record(
+            self.component,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_ms=latency_ms,
+            cache_hit=cache_hit,
+            model=llm_output.get("model_name") or generation_info.get("model", ""),
+            prompt=_prompt_label(metadata),
+            finish_reason=finish_reason,
+            thread_id=metadata.get("thread_id"),
+        )
+
+def with_usage_tracking(llm: BaseChatModel, component: str) -> BaseChatModel:
+    """Attach a UsageCallbackHandler for the component to a chat model.
+
+    Args:
+        llm: The chat model
+        component: Component the model serves
+
+    Returns:
+        The same model, with the handler added to its callbacks
+    """
+    llm.callbacks = [*(llm.callbacks or []), UsageCallbackHandler(component)]
+    return llm
+
+class UsageTrackingEmbeddings(Embeddings):
+    """Records the latency of an embeddings model's calls; embeddings run no callbacks to hook into."""
+
+    def __init__(self, embeddings: Any, component: str = "embeddings", tracker: Optional[APICostTracker] = None):
+        """Initialize the wrapper.
+
+        Args:
+            embeddings: The embeddings object to wrap
+            component: Component the model serves
+            tracker: Tracker to record into (default: the global cost tracker)
+        """
+        self.embeddings = embeddings
+        self.component = component
+        self.tracker = tracker or cost_tracker
+
+    def _record(self, started: float) -> None:
+        latency_ms = (time.perf_counter() - started) * 1000
+        LLM_CALL_DURATION.observe(latency_ms / 1000, self.component)
+        LLM_CALLS.inc(self.component, "miss")
+        # Embedding providers report no token usage through LangChain
+        self.tracker.record(self.component, latency_ms=latency_ms, model=getattr(self.embeddings, "model", "") or "")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        self._record(started)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        started = time.perf_counter()
+        vector = self.embeddings.embed_query(text)
+        self._record(started)
+        return vector
+
+def with_embeddings_usage_tracking(embeddings: Any, component: str = "embeddings") -> Embeddings:
+    """Wrap an embeddings model to record its calls, the counterpart of with_usage_tracking.
+
+    Args:
+        embeddings: The embeddings object
+        component: Component the model serves
+
+    Returns:
+        The wrapped embeddings
+    """
+    return UsageTrackingEmbeddings(embeddings, component)
 
 def handle_api_error(func):
     """Decorator for handling API errors with retries."""
@@ -213,21 +655,22 @@ def _sanitize_sensitive_data(data: Any) -> Any:
 
 def extract_properties_and_update_state(request_body: Dict[str, Any]) -> Dict[str, Any]:
     """Extract properties from request and update state.
+
+    The body is updated in place, so a body parsed once can be transformed
+    and handed on without being copied or re-serialized.
     
     Args:
         request_body: The request body containing state and properties
         
     Returns:
-        Updated request body with properties in state
+        The same request body, with properties in state
     """
-    state = request_body.get("state", {})
-    properties = request_body.get("properties", {})
+    properties = request_body.get("properties") or {}
+    state = request_body.get("state")
+    if not isinstance(state, dict):
+        state = request_body["state"] = {}
     
     # Update state with user_id if present
-    for key, value in properties.items():
-        state[key] = value
-    
-    # Update request body with modified state
-    request_body["state"] = state
+    state.update(properties)
     
     return request_body
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""Per-provider circuit breakers and health scoring for model calls.
+
+Every upstream dependency (a model component on a given provider, the RunPod
+endpoint, Tavily) gets its own breaker. A breaker opens after a run of
+consecutive failures, rejects calls immediately while open, and lets a limited
+number of probe calls through once the reset timeout has elapsed (half-open).
+A successful probe closes it again; a failed probe re-opens it.
+
+Each breaker also keeps an exponentially weighted health score in [0, 1],
+reported with its state in /api/health, which shows a provider degrading
+before its breaker trips.
+
+A call that is cancelled (e.g. by a timeout around it) counts as neither a
+success nor a failure, but a cancelled probe gives its slot back, so the
+next call can probe instead of the circuit staying half-open forever.
+
+Environment Variables:
+    PROVIDER_CIRCUIT_FAILURE_THRESHOLD: Consecutive failures before opening (default: 5)
+    PROVIDER_CIRCUIT_RESET_TIMEOUT: Seconds to stay open before probing (default: 30)
+    PROVIDER_CIRCUIT_HALF_OPEN_PROBES: Concurrent probe calls allowed when half-open (default: 1)
+    PROVIDER_HEALTH_DECAY: Weight of the latest call in the health score (default: 0.2)
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("PROVIDER_CIRCUIT_FAILURE_THRESHOLD", "5"))
+PROVIDER_CIRCUIT_RESET_TIMEOUT = float(os.getenv("PROVIDER_CIRCUIT_RESET_TIMEOUT", "30"))
+PROVIDER_CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("PROVIDER_CIRCUIT_HALF_OPEN_PROBES", "1"))
+PROVIDER_HEALTH_DECAY = float(os.getenv("PROVIDER_HEALTH_DECAY", "0.2"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because its circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker with half-open probing and a health score."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = PROVIDER_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = PROVIDER_CIRCUIT_RESET_TIMEOUT,
+        half_open_max_calls: int = PROVIDER_CIRCUIT_HALF_OPEN_PROBES,
+        health_decay: float = PROVIDER_HEALTH_DECAY,
+    ):
+        """Initialize the circuit breaker.
+
+        Args:
+            name: Name used in logs and errors, e.g. "router:together"
+            failure_threshold: Consecutive failures before the circuit opens
+            reset_timeout: Seconds the circuit stays open before probing
+            half_open_max_calls: Number of concurrent probe calls when half-open
+            health_decay: Weight of the latest call in the health score
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.health_decay = health_decay
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_in_flight = 0
+        self.health_score = 1.0
+        self.total_calls = 0
+        self.total_failures = 0
+        self.rejected_calls = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check whether a call may proceed, moving open circuits to half-open when due."""
+        return self._admit() is not None
+
+    def _admit(self) -> Optional[bool]:
+        """Admit a call; returns None if it is rejected, else whether it holds a probe slot."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected_calls += 1
+                    return None
+                logger.info(f"Circuit {self.name} half-open, probing")
+                self.state = HALF_OPEN
+                self.half_open_in_flight = 0
+            if self.half_open_in_flight < self.half_open_max_calls:
+                self.half_open_in_flight += 1
+                return True
+            self.rejected_calls += 1
+            return None
+
+    def release_probe(self) -> None:
+        """Give back a probe slot whose call ended without a result, e.g. because it was cancelled."""
+        with self._lock:
+            if self.state == HALF_OPEN and self.half_open_in_flight > 0:
+                self.half_open_in_flight -= 1
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit will accept a probe call."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        """Record a successful call."""
+        with self._lock:
+            self.total_calls += 1
+            self.consecutive_failures = 0
+            self.health_score += self.health_decay * (1.0 - self.health_score)
+            if self.state == HALF_OPEN:
+                logger.info(f"Circuit {self.name} closed after successful probe")
+                self.state = CLOSED
+                self.half_open_in_flight = 0
+
+    def record_failure(self, error: Optional[BaseException] = None) -> None:
+        """Record a failed call, opening the circuit if the threshold is reached."""
+        with self._lock:
+            self.total_calls += 1
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            self.health_score -= self.health_decay * self.health_score
+            self.last_error = str(error) if error is not None else None
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"Circuit {self.name} opened after {self.consecutive_failures} consecutive failures: {self.last_error}")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.half_open_in_flight = 0
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a synchronous callable through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        probe = self._admit()
+        if probe is None:
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        except BaseException:
+            # Cancelled or interrupted: no verdict on the provider, but free the probe slot
+            if probe:
+                self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run an async callable through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        probe = self._admit()
+        if probe is None:
+            raise CircuitOpenError(self.name, self.retry_after())
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        except BaseException:
+            # Cancelled or interrupted: no verdict on the provider, but free the probe slot
+            if probe:
+                self.release_probe()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a point-in-time view of the breaker for health reporting."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "health_score": round(self.health_score, 3),
+                "consecutive_failures": self.consecutive_failures,
+                "total_calls": self.total_calls,
+                "total_failures": self.total_failures,
+                "rejected_calls": self.rejected_calls,
+                "last_error": self.last_error,
+            }
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(component: str, provider: str) -> CircuitBreaker:
+    """Get the shared circuit breaker for a model component and provider.
+
+    Args:
+        component: Component name (embeddings, router, generator, web_search, ...)
+        provider: Provider name (together, hf:together, runpod, tavily, ...)
+
+    Returns:
+        The breaker for this (component, provider) pair
+    """
+    key = (component or "default", (provider or "default").lower())
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(name=f"{key[0]}:{key[1]}")
+                _breakers[key] = breaker
+    return breaker
+
+
+def get_breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Get a snapshot of every breaker, keyed by "component:provider"."""
+    return {breaker.name: breaker.snapshot() for breaker in list(_breakers.values())}
@@ -0,0 +1,186 @@
+"""Lazily built, memoized components.
+
+Models and tools are expensive to construct: their modules import large
+client libraries, and some of them talk to the network while being built
+(checking an API key). Building them when their module is imported puts all
+of that on every cold start, before the first request can be served.
+
+Instead, a module declares the component with a factory and exports a
+stand-in for it. LazyRunnable stands in for a Runnable (a model or a tool)
+and can be composed with `|` like one; LazyEmbeddings stands in for an
+embeddings model. The component is built on first use, once per process
+even when concurrent requests race for it, and every later call goes
+straight to the built object. build_components() builds them ahead of
+traffic, e.g. from a warm-up hook, and get_component_stats() reports which
+ones are built and how long each took.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable, RunnableConfig
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class LazyComponent:
+    """A component built by its factory on first use and kept for the life of the process."""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        """Initialize the component.
+
+        Args:
+            name: Name in stats and logs, e.g. "router" or "web_search_tool"
+            factory: Builds the component; called at most once unless the build fails
+        """
+        self.name = name
+        self.factory = factory
+        self.build_seconds: Optional[float] = None
+        self._value: Any = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def get(self) -> Any:
+        """Get the component, building it if this is the first use."""
+        if self._built:
+            return self._value
+        with self._lock:
+            if not self._built:
+                started = time.perf_counter()
+                self._value = self.factory()
+                self.build_seconds = time.perf_counter() - started
+                self._built = True
+                logger.info("Built %s in %.1f ms", self.name, self.build_seconds * 1000)
+        return self._value
+
+
+# name -> component, in declaration order
+_components: Dict[str, LazyComponent] = {}
+
+
+def lazy_component(name: str, factory: Callable[[], Any]) -> LazyComponent:
+    """Declare a lazily built component.
+
+    Args:
+        name: Unique name of the component
+        factory: Builds the component
+
+    Returns:
+        The component; call get() to build or fetch it
+    """
+    component = _components[name] = LazyComponent(name, factory)
+    return component
+
+
+def build_components(names: Optional[List[str]] = None) -> Dict[str, float]:
+    """Build components ahead of their first use.
+
+    Args:
+        names: Components to build (default: all declared ones)
+
+    Returns:
+        Seconds each component took to build, 0 for ones that already were built
+    """
+    timings = {}
+    for name in names or list(_components):
+        component = _components[name]
+        was_built = component.built
+        component.get()
+        timings[name] = 0.0 if was_built else component.build_seconds
+    return timings
+
+
+def get_component_stats() -> Dict[str, Dict[str, Any]]:
+    """Get whether each declared component is built, and its build time in milliseconds."""
+    return {
+        name: {
+            "built": component.built,
+            "build_ms": round(component.build_seconds * 1000, 1) if component.build_seconds is not None else None,
+        }
+        for name, component in _components.items()
+    }
+
+
+class LazyRunnable(Runnable[Any, Any]):
+    """Runnable that builds the wrapped Runnable on first use and delegates every call to it."""
+
+    def __init__(self, name: str, factory: Callable[[], Runnable]):
+        """Initialize the stand-in.
+
+        Args:
+            name: Unique name of the component
+            factory: Builds the Runnable
+        """
+        self.component = lazy_component(name, factory)
+        self.name = name
+
+    @property
+    def runnable(self) -> Runnable:
+        """The wrapped Runnable, built if needed."""
+        return self.component.get()
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.runnable.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.runnable.ainvoke(input, config, **kwargs)
+
+    def batch(self, inputs: List[Any], config: Any = None, *, return_exceptions: bool = False, **kwargs: Any) -> List[Any]:
+        return self.runnable.batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+    async def abatch(self, inputs: List[Any], config: Any = None, *, return_exceptions: bool = False, **kwargs: Any) -> List[Any]:
+        return await self.runnable.abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        yield from self.runnable.stream(input, config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        async for chunk in self.runnable.astream(input, config, **kwargs):
+            yield chunk
+
+    def transform(self, input: Iterator[Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        yield from self.runnable.transform(input, config, **kwargs)
+
+    async def atransform(self, input: AsyncIterator[Any], config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        async for chunk in self.runnable.atransform(input, config, **kwargs):
+            yield chunk
+
+    def __repr__(self) -> str:
+        return f"LazyRunnable({self.name!r}, built={self.component.built})"
+
+
+class LazyEmbeddings(Embeddings):
+    """Embeddings that build the wrapped embeddings model on first use and delegate to it."""
+
+    def __init__(self, name: str, factory: Callable[[], Embeddings]):
+        """Initialize the stand-in.
+
+        Args:
+            name: Unique name of the component
+            factory: Builds the embeddings model
+        """
+        self.component = lazy_component(name, factory)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """The wrapped embeddings model, built if needed."""
+        return self.component.get()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
@@ -0,0 +1,293 @@
+"""Non-blocking, sampled logging for the API and the graph.
+
+setup_logging() replaces the root logger's handlers with one QueueHandler.
+Logging a record then only formats its message and puts it on a bounded
+in-memory queue; a QueueListener thread writes the queue to stderr. The
+event loop never waits on a terminal, pipe or log collector, and when the
+queue is full records are dropped and counted instead of blocking.
+
+Cost is kept down before a record is even created: levels are set per
+logger, so disabled calls return at the level check, and messages should
+use %-style arguments (logger.debug("Read %s", key)) so they are only
+interpolated for records that are emitted. Noisy loggers can be sampled:
+below WARNING, only the given share of their records is kept. Warnings
+and errors are never sampled.
+
+The writer thread does not survive fork, so a process forked after
+setup_logging() (a pre-forked server worker) starts its own queue and
+writer.
+
+Records can be written as text or as one JSON object per line. JSON
+records carry the request, thread and user the record was logged for (see
+set_usage_context in api_utils), so logs of one request can be joined.
+
+Environment Variables:
+    LOG_LEVEL: Level of the root logger (default: INFO)
+    LOG_LEVELS: Comma-separated <logger>=<level> overrides, e.g. uvicorn.access=WARNING (default: none)
+    LOG_FORMAT: "text" or "json" (default: text)
+    LOG_SAMPLE_RATES: Comma-separated <logger prefix>=<share kept> sampling below WARNING,
+        e.g. agent.graph.utils.middleware=0.1 (default: none)
+    LOG_QUEUE_SIZE: Records buffered for the writer thread before new ones are dropped (default: 10000)
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from agent.graph.utils.api_utils import get_usage_context
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_setup_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+def _parse_pairs(spec: str, setting: str) -> List[Tuple[str, str]]:
+    """Parse a comma-separated list of <name>=<value> entries."""
+    pairs = []
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        name, separator, value = entry.partition("=")
+        if not separator:
+            logger.warning("Ignoring malformed %s entry: %r", setting, entry)
+            continue
+        pairs.append((name.strip(), value.strip()))
+    return pairs
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse LOG_SAMPLE_RATES into {logger prefix: share of records kept}."""
+    rates = {}
+    for name, value in _parse_pairs(spec, "LOG_SAMPLE_RATES"):
+        try:
+            rates[name] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            logger.warning("Ignoring malformed LOG_SAMPLE_RATES entry: %s=%s", name, value)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of the records below WARNING of the configured loggers."""
+
+    def __init__(self, rates: Dict[str, float]):
+        """Initialize the filter.
+
+        Args:
+            rates: Share of records kept per logger name prefix; the longest matching prefix applies
+        """
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda rate: len(rate[0]), reverse=True)
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> float:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class ContextFilter(logging.Filter):
+    """Adds the request, thread and user being served to each record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for attribute, value in get_usage_context().items():
+            if not hasattr(record, attribute):
+                setattr(record, attribute, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        # Fields passed through `extra` or added by ContextFilter
+        for attribute, value in vars(record).items():
+            if attribute not in _RECORD_ATTRIBUTES and attribute not in entry:
+                entry[attribute] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode()
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking or raising."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpolate the message in the caller, where its arguments are still current,
+        # but leave formatting to the writer thread
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames; render them now so the record can outlive them
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _make_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "json":
+        return JsonFormatter()
+    if log_format != "text":
+        logger.warning("Unknown LOG_FORMAT %r; using text", log_format)
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    sample_rates: Optional[Dict[str, float]] = None,
+    force: bool = False,
+) -> None:
+    """Route all logging through the queue and configure levels, sampling and format.
+
+    Safe to call from every entry point: only the first call (or one with
+    force=True) configures logging.
+
+    Args:
+        level: Root level (default: LOG_LEVEL)
+        log_format: "text" or "json" (default: LOG_FORMAT)
+        sample_rates: Share of records kept per logger prefix (default: LOG_SAMPLE_RATES)
+        force: Reconfigure even if logging was already set up
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None and not force:
+            return
+        _stop_listener()
+
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(_make_formatter(log_format or LOG_FORMAT))
+
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(SamplingFilter(sample_rates if sample_rates is not None else parse_sample_rates(LOG_SAMPLE_RATES)))
+        _queue_handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            handler.close()
+        root.addHandler(_queue_handler)
+        root.setLevel(level or LOG_LEVEL)
+
+        for name, logger_level in _parse_pairs(LOG_LEVELS, "LOG_LEVELS"):
+            try:
+                logging.getLogger(name).setLevel(logger_level.upper())
+            except ValueError:
+                logger.warning("Ignoring unknown level %r for logger %s", logger_level, name)
+
+        # Let server loggers configured elsewhere (e.g. uvicorn's) go through the queue too
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "gunicorn.error", "gunicorn.access"):
+            server_logger = logging.getLogger(name)
+            for handler in server_logger.handlers[:]:
+                server_logger.removeHandler(handler)
+            server_logger.propagate = True
+
+        _listener = QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+
+
+def _stop_listener() -> None:
+    """Write out the queued records and stop the writer thread. Call with _setup_lock held."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def shutdown_logging() -> None:
+    """Flush the queued records and stop the writer thread; records logged afterwards are queued but not written."""
+    with _setup_lock:
+        _stop_listener()
+
+
+def get_logging_stats() -> Dict[str, Any]:
+    """Get the queue depth and the records dropped or sampled out so far."""
+    if _queue_handler is None:
+        return {"configured": False}
+    sampled_out = sum(f.sampled_out for f in _queue_handler.filters if isinstance(f, SamplingFilter))
+    return {
+        "configured": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sampled_out": sampled_out,
+    }
+
+
+def _restart_after_fork() -> None:
+    """Give a forked child its own queue and writer thread in place of the parent's."""
+    global _setup_lock, _listener
+    # The parent's writer thread is gone and its locks may have been held at fork, so nothing is reused
+    _setup_lock = threading.Lock()
+    if _listener is not None:
+        _listener = None
+        setup_logging(force=True)
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
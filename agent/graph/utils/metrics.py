@@ -0,0 +1,570 @@
+"""Process-local metrics in the Prometheus text format.
+
+A small metrics registry for the hot path. Counters, gauges and histograms
+are plain dicts of label values to numbers behind one lock per metric, so
+recording is a dict lookup and an add, and a histogram observation adds a
+bisect into fixed buckets. Nothing is formatted until /metrics is scraped.
+
+What is recorded:
+
+- agent_node_duration_seconds{node}: every graph node (see nodes/__init__.py)
+- agent_llm_call_duration_seconds{component}, agent_llm_tokens_total{component,kind}
+  and agent_llm_calls_total{component,cache}: every model call, from the usage callback
+- agent_retrieval_duration_seconds{collection}: vector store retrieval
+- agent_checkpoint_operation_duration_seconds{operation}: every checkpointer call
+- agent_emit_duration_seconds{kind}: state and message emits to the client
+- agent_http_requests_in_flight: requests inside the app
+
+Queue depths, in-flight runs and cache hits and misses that other modules
+already count (admission control, single-flight, the logging queue, the
+checkpointer) are read when /metrics is scraped; see
+register_runtime_collectors().
+
+Metrics are recorded per process. A single process labels every sample
+with a worker label holding its process id. Under gunicorn each scrape
+lands on a random worker, so gunicorn_conf.py gives the workers a shared
+directory (set_multiprocess_dir()). Every worker writes a snapshot of its
+registry there every METRICS_FLUSH_INTERVAL seconds, and /metrics merges
+the snapshots: counters and histograms are summed over every worker that
+has run, including ones that have exited, so they never appear to reset.
+Gauges keep a worker label and are only reported for live workers.
+
+Environment Variables:
+    METRICS_ENABLED: Record metrics and serve /metrics (default: true)
+    METRICS_MULTIPROC_DIR: Directory the workers share their snapshots through (default: set by gunicorn_conf.py when running several workers)
+    METRICS_FLUSH_INTERVAL: Seconds between snapshots of a worker's metrics (default: 5)
+"""
+
+import os
+import glob
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or None
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+PREFIX = "agent_"
+
+# Seconds; from a cache hit to a long generation
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], worker: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if worker is not None:
+        pairs.append(f'worker="{worker}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """Base of the registry's metrics: a name, help text and label names."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """Initialize the metric.
+
+        Args:
+            name: Metric name, without the agent_ prefix
+            documentation: Help text
+            labelnames: Names of the labels, whose values are passed positionally when recording
+        """
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Drop every recorded value."""
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """Yield (sample name, label names, label values, value) for rendering."""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic count per label values."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        """Add to the count of the label values."""
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for labelvalues, value in values:
+            yield self.name, self.labelnames, labelvalues, value
+
+
+class Gauge(Metric):
+    """Current value per label values."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for labelvalues, value in values:
+            yield self.name, self.labelnames, labelvalues, value
+
+
+class Histogram(Metric):
+    """Distribution per label values over fixed buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        """Initialize the histogram.
+
+        Args:
+            name: Metric name, without the agent_ prefix
+            documentation: Help text
+            labelnames: Names of the labels
+            buckets: Upper bounds of the buckets, ascending; +Inf is implied
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Record one observation."""
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        """Observe the seconds the block takes, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values = {}
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        with self._lock:
+            values = [(labelvalues, list(counts), total) for labelvalues, (counts, total) in self._values.items()]
+        names = self.labelnames + ("le",)
+        for labelvalues, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", names, labelvalues + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, labelvalues, total
+            yield f"{self.name}_count", self.labelnames, labelvalues, cumulative
+
+
+class CallbackMetric(Metric):
+    """Gauge or counter whose values are read from another module when scraped."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Dict[Labels, float]], type: str = "gauge"):
+        """Initialize the metric.
+
+        Args:
+            name: Metric name, without the agent_ prefix
+            documentation: Help text
+            labelnames: Names of the labels
+            collect: Returns the current value per label values
+            type: "gauge" or "counter"
+        """
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+        self.type = type
+
+    def reset(self) -> None:
+        pass
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.warning("Error collecting metric %s: %s", self.name, e)
+            return
+        for labelvalues, value in values.items():
+            yield self.name, self.labelnames, labelvalues, value
+
+
+class MetricsRegistry:
+    """Metrics by name, rendered together in the Prometheus text format."""
+
+    def __init__(self, multiproc_dir: Optional[str] = METRICS_MULTIPROC_DIR):
+        """Initialize the registry.
+
+        Args:
+            multiproc_dir: Directory to share snapshots with the other workers through, or None to report only this process
+        """
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self.multiproc_dir = multiproc_dir
+        self._flush_thread: Optional[threading.Thread] = None
+        self._flush_stop = threading.Event()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric, replacing one of the same name."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def reset(self) -> None:
+        """Drop every recorded value, e.g. in a forked child."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get every metric's samples in a JSON-serializable form, as shared with the other workers."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "pid": os.getpid(),
+            "metrics": [
+                {
+                    "name": metric.name,
+                    "type": metric.type,
+                    "documentation": metric.documentation,
+                    "samples": [[name, list(labelnames), list(labelvalues), value] for name, labelnames, labelvalues, value in metric.samples()],
+                }
+                for metric in metrics
+            ],
+        }
+
+    def write_snapshot(self) -> None:
+        """Write this worker's snapshot to the shared directory, replacing the previous one atomically."""
+        if self.multiproc_dir is None:
+            return
+        path = os.path.join(self.multiproc_dir, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Error writing metrics snapshot to %s: %s", path, e)
+
+    def _read_snapshots(self) -> List[Dict[str, Any]]:
+        """Read the other workers' snapshots from the shared directory."""
+        snapshots = []
+        own = os.path.join(self.multiproc_dir, f"{os.getpid()}.json")
+        for path in sorted(glob.glob(os.path.join(self.multiproc_dir, "*.json"))):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning("Error reading metrics snapshot %s: %s", path, e)
+        return snapshots
+
+    def start_flush(self, interval: float = METRICS_FLUSH_INTERVAL) -> None:
+        """Start writing this worker's snapshot to the shared directory every interval seconds."""
+        if self.multiproc_dir is None or (self._flush_thread is not None and self._flush_thread.is_alive()):
+            return
+        self._flush_stop.clear()
+
+        def flush_loop() -> None:
+            while not self._flush_stop.wait(interval):
+                self.write_snapshot()
+
+        self.write_snapshot()
+        self._flush_thread = threading.Thread(target=flush_loop, name="metrics-flush", daemon=True)
+        self._flush_thread.start()
+
+    def stop_flush(self) -> None:
+        """Stop the flush thread and write out the final snapshot."""
+        if self._flush_thread is not None:
+            self._flush_stop.set()
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.write_snapshot()
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        if self.multiproc_dir is not None:
+            return self._render_merged()
+        worker = str(os.getpid())
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labelnames, labelvalues, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, labelvalues, worker)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _render_merged(self) -> str:
+        """Render this worker's metrics merged with the other workers' latest snapshots."""
+        # metric name -> [type, documentation, {(sample name, label names, label values, worker): value}]
+        merged: Dict[str, List[Any]] = {}
+        for snapshot in [self.snapshot()] + self._read_snapshots():
+            pid = snapshot.get("pid")
+            alive = _pid_alive(pid)
+            for metric in snapshot.get("metrics", []):
+                entry = merged.setdefault(metric["name"], [metric["type"], metric["documentation"], {}])
+                is_gauge = metric["type"] == "gauge"
+                if is_gauge and not alive:
+                    continue
+                for name, labelnames, labelvalues, value in metric["samples"]:
+                    key = (name, tuple(labelnames), tuple(labelvalues), str(pid) if is_gauge else None)
+                    entry[2][key] = entry[2].get(key, 0) + value
+        lines = []
+        for metric_name, (metric_type, documentation, samples) in merged.items():
+            lines.append(f"# HELP {metric_name} {documentation}")
+            lines.append(f"# TYPE {metric_name} {metric_type}")
+            for (name, labelnames, labelvalues, worker), value in samples.items():
+                lines.append(f"{name}{_format_labels(labelnames, labelvalues, worker)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: Any) -> bool:
+    """Check whether a worker's process still exists."""
+    if not isinstance(pid, int):
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except (OSError, OverflowError):
+        return False
+    return True
+
+
+# Global metrics registry
+registry = MetricsRegistry()
+
+if hasattr(os, "register_at_fork"):
+    # A forked worker reports only what it records itself
+    os.register_at_fork(after_in_child=registry.reset)
+
+
+def set_multiprocess_dir(directory: str) -> None:
+    """Share the global registry's metrics with the other workers through a directory.
+
+    Called from gunicorn_conf.py before the workers are forked, since this
+    module is imported (and has read METRICS_MULTIPROC_DIR) by then.
+
+    Args:
+        directory: Directory every worker writes its snapshot to
+    """
+    registry.multiproc_dir = directory
+
+
+def clear_multiprocess_dir(directory: str) -> None:
+    """Remove the snapshots a previous server left in a directory, before its workers start."""
+    for path in glob.glob(os.path.join(directory, "*.json*")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning("Error removing metrics snapshot %s: %s", path, e)
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Create and register a counter."""
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Create and register a gauge."""
+    return registry.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    """Create and register a histogram."""
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+NODE_DURATION = histogram("node_duration_seconds", "Time spent in each graph node", ["node"])
+LLM_CALL_DURATION = histogram("llm_call_duration_seconds", "Latency of model calls per component", ["component"])
+LLM_TOKENS = counter("llm_tokens_total", "Tokens reported by the provider per component", ["component", "kind"])
+LLM_CALLS = counter("llm_calls_total", "Model calls per component, by whether a concurrent identical call served them", ["component", "cache"])
+RETRIEVAL_DURATION = histogram("retrieval_duration_seconds", "Latency of vector store retrieval per collection", ["collection"])
+CHECKPOINT_DURATION = histogram("checkpoint_operation_duration_seconds", "Latency of checkpointer operations", ["operation"])
+EMIT_DURATION = histogram("emit_duration_seconds", "Latency of state and message emits to the client", ["kind"])
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "Requests being handled by the app")
+
+
+def timed_node(name: str, node: Callable) -> Callable:
+    """Wrap an async graph node so its duration is recorded under its name.
+
+    Args:
+        name: Node name for the node label
+        node: The async node function, taking (state, config)
+
+    Returns:
+        A node with the same name, docstring and signature shape
+    """
+    async def wrapped(state: Any, config: Optional[Dict[str, Any]] = None) -> Any:
+        started = time.perf_counter()
+        try:
+            return await node(state, config)
+        finally:
+            NODE_DURATION.observe(time.perf_counter() - started, name)
+
+    wrapped.__name__ = node.__name__
+    wrapped.__doc__ = node.__doc__
+    wrapped.__wrapped__ = node
+    return wrapped
+
+
+def register_runtime_collectors(checkpointer: Any = None) -> None:
+    """Register the metrics read from other modules' counters when /metrics is scraped.
+
+    Args:
+        checkpointer: The graph's checkpointer, for its buffer and cache counters
+    """
+    from agent.graph.utils.admission import admission_controller
+    from agent.graph.utils.single_flight import get_single_flight_stats
+    from agent.graph.utils.logging_setup import get_logging_stats
+    from agent.graph.utils.lazy import get_component_stats
+
+    registry.register(CallbackMetric(
+        "admission_runs", "Agent runs running or waiting for admission", ["state"],
+        lambda: {("running",): admission_controller.running, ("queued",): admission_controller.queued},
+    ))
+    registry.register(CallbackMetric(
+        "admission_rejected_total", "Agent runs turned away by admission control", ["reason"],
+        lambda: {(reason,): count for reason, count in admission_controller.rejected.items()},
+        type="counter",
+    ))
+    registry.register(CallbackMetric(
+        "single_flight_calls_total", "Coalesced calls per group: upstream calls (misses) and shared results (hits)", ["group", "result"],
+        lambda: {
+            key: value
+            for group, stats in get_single_flight_stats().items()
+            for key, value in (((group, "miss"), stats["upstream_calls"]), ((group, "hit"), stats["shared_hits"]))
+        },
+        type="counter",
+    ))
+    registry.register(CallbackMetric(
+        "single_flight_in_flight", "Upstream calls in flight per single-flight group", ["group"],
+        lambda: {(group,): stats["in_flight"] for group, stats in get_single_flight_stats().items()},
+    ))
+    registry.register(CallbackMetric(
+        "log_queue_depth", "Log records waiting for the writer thread", [],
+        lambda: {(): get_logging_stats().get("queued", 0)},
+    ))
+    registry.register(CallbackMetric(
+        "log_records_dropped_total", "Log records dropped because the queue was full", [],
+        lambda: {(): get_logging_stats().get("dropped", 0)},
+        type="counter",
+    ))
+    registry.register(CallbackMetric(
+        "components_built", "Lazily built models and tools that are built", [],
+        lambda: {(): sum(1 for stats in get_component_stats().values() if stats["built"])},
+    ))
+    if checkpointer is not None and hasattr(checkpointer, "get_stats"):
+        def checkpoint_buffer() -> Dict[Labels, float]:
+            buffer = checkpointer.get_stats().get("buffer")
+            if not buffer:
+                return {}
+            return {("threads",): buffer["pending_threads"], ("ops",): buffer["pending_ops"]}
+
+        def checkpoint_cache() -> Dict[Labels, float]:
+            cache = checkpointer.get_stats().get("latest_cache")
+            if not cache:
+                return {}
+            return {("hit",): cache["hits"], ("miss",): cache["misses"]}
+
+        registry.register(CallbackMetric(
+            "checkpoint_buffer_depth", "Checkpoint threads and operations waiting to be persisted", ["kind"], checkpoint_buffer,
+        ))
+        registry.register(CallbackMetric(
+            "checkpoint_latest_cache_total", "Latest-checkpoint cache lookups in this worker", ["result"], checkpoint_cache,
+            type="counter",
+        ))
+
+
+def render_metrics() -> str:
+    """Render the global registry for /metrics, merged across workers when they share a directory."""
+    return registry.render()
+
+
+def start_metrics_flush() -> None:
+    """Start sharing this worker's metrics with the other workers, if they share a directory."""
+    registry.start_flush()
+
+
+def stop_metrics_flush() -> None:
+    """Write this worker's final metrics for the other workers to report."""
+    registry.stop_flush()
@@ -0,0 +1,366 @@
+"""Pure ASGI middleware for the API.
+
+The middlewares wrap the ASGI callable directly instead of going through
+BaseHTTPMiddleware. Each request therefore costs no extra task or memory
+stream, and response bodies (the CopilotKit event stream in particular)
+pass through chunk by chunk as the app sends them. Only request bodies are
+read up front, and only by RequestContextMiddleware, which needs the JSON
+payload to attribute usage. It parses the body once and hands the parsed
+object to the route (see request_body.py), and replays the raw bytes to
+anything that reads the stream.
+
+RequestGuardMiddleware rejects requests before they reach the app (open
+per-client circuit, oversized body, rate limit) and enforces a deadline
+per route. Deadlines are matched by the longest configured path prefix,
+and 0 disables the deadline, e.g. for agent runs that legitimately stream
+for minutes. A deadline that expires before the response starts yields a
+504; one that expires mid-stream cuts the stream, since the status is
+already sent.
+
+AdmissionMiddleware sits innermost and puts agent runs through the
+worker's admission controller (see admission.py). A run waits for a slot
+in a bounded priority queue or is turned away at once with a 503 and
+Retry-After, and holds its slot until its response has finished
+streaming.
+
+Every request reports where its time went in a Server-Timing header:
+`context` and `guard` are the time each middleware spent before handing
+the request on, `queue` is the time an agent run waited for admission,
+and `app` is the time from that hand-off to the first response byte.
+
+Environment Variables:
+    ROUTE_DEADLINES: Comma-separated <path prefix>=<seconds> deadlines; other routes use REQUEST_TIMEOUT
+        (default: /api/copilotkitagent=0,/api/warmup=0; warm-up steps bound themselves)
+"""
+
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from agent.graph.utils.admission import (
+    ADMISSION_PRIORITY_HEADER,
+    AdmissionController,
+    AdmissionRejected,
+    admission_controller,
+    is_admission_controlled,
+)
+from agent.graph.utils.metrics import HTTP_IN_FLIGHT
+from agent.graph.utils.request_body import loads, set_parsed_body
+from agent.graph.utils.api_utils import (
+    _sanitize_sensitive_data,
+    extract_properties_and_update_state,
+    set_usage_context,
+    reset_usage_context
+)
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ROUTE_DEADLINES = os.getenv("ROUTE_DEADLINES", "/api/copilotkitagent=0,/api/warmup=0")
+
+# Scope key under which the middlewares collect their Server-Timing entries
+SERVER_TIMING_SCOPE_KEY = "server_timing"
+
+
+def parse_route_deadlines(spec: str) -> List[Tuple[str, float]]:
+    """Parse ROUTE_DEADLINES into (path prefix, seconds) pairs, longest prefix first.
+
+    Args:
+        spec: Comma-separated <path prefix>=<seconds> entries
+
+    Returns:
+        The deadlines, ordered for longest-prefix matching
+    """
+    deadlines = []
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        prefix, _, seconds = entry.partition("=")
+        try:
+            deadlines.append((prefix.strip(), float(seconds)))
+        except ValueError:
+            logger.warning(f"Ignoring malformed ROUTE_DEADLINES entry: {entry!r}")
+    return sorted(deadlines, key=lambda deadline: len(deadline[0]), reverse=True)
+
+
+def _record_timing(scope: Scope, name: str, seconds: float) -> None:
+    """Add a Server-Timing entry for the current request."""
+    scope.setdefault(SERVER_TIMING_SCOPE_KEY, []).append((name, seconds))
+
+
+def _server_timing(scope: Scope) -> str:
+    """Format the request's entries as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in scope.get(SERVER_TIMING_SCOPE_KEY, []))
+
+
+async def _read_body(receive: Receive) -> bytes:
+    """Read a complete request body from the ASGI receive channel."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay(body: bytes, receive: Receive) -> Receive:
+    """Make a receive channel that yields an already read body, then defers to the original channel."""
+    sent = False
+
+    async def replay_receive() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay_receive
+
+
+class RequestGuardMiddleware:
+    """Per-client circuit breaker, size limit, rate limit and per-route deadlines."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rate_limiter: Any,
+        max_request_size: int,
+        default_timeout: float,
+        circuit_breaker_threshold: float,
+        circuit_breaker_reset: float,
+        route_deadlines: Optional[List[Tuple[str, float]]] = None,
+    ):
+        """Initialize the middleware.
+
+        Args:
+            app: The ASGI app to guard
+            rate_limiter: A limiter from agent.graph.utils.rate_limiter
+            max_request_size: Largest accepted Content-Length in bytes
+            default_timeout: Deadline in seconds of routes without a ROUTE_DEADLINES entry
+            circuit_breaker_threshold: Share of the rate limit a client may spend on errors before its circuit opens
+            circuit_breaker_reset: Seconds a client's circuit stays open
+            route_deadlines: (path prefix, seconds) pairs, longest first (default: ROUTE_DEADLINES)
+        """
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.max_request_size = max_request_size
+        self.default_timeout = default_timeout
+        self.circuit_breaker_threshold = circuit_breaker_threshold
+        self.circuit_breaker_reset = circuit_breaker_reset
+        self.route_deadlines = route_deadlines if route_deadlines is not None else parse_route_deadlines(ROUTE_DEADLINES)
+        self.error_counts = defaultdict(int)
+        self.circuit_breaker_state = defaultdict(lambda: {"open": False, "last_failure": 0})
+
+    def deadline(self, path: str) -> Optional[float]:
+        """Deadline in seconds for a path, or None for no deadline."""
+        for prefix, seconds in self.route_deadlines:
+            if path.startswith(prefix):
+                return seconds or None
+        return self.default_timeout or None
+
+    def _reject(self, client_ip: str, current_time: float, headers: Headers) -> Optional[JSONResponse]:
+        """Get the response rejecting a request before it reaches the app, if it must be rejected."""
+        # Check circuit breaker (no awaits between reads and writes, so no lock is needed)
+        if self.circuit_breaker_state[client_ip]["open"]:
+            if current_time - self.circuit_breaker_state[client_ip]["last_failure"] < self.circuit_breaker_reset:
+                return JSONResponse(
+                    status_code=503,
+                    content={"detail": "Service temporarily unavailable due to high error rate"}
+                )
+            self.circuit_breaker_state[client_ip]["open"] = False
+            self.error_counts[client_ip] = 0
+
+        # Check request size
+        content_length = headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_request_size:
+            return JSONResponse(status_code=413, content={"detail": "Request too large"})
+        return None
+
+    def _record_error(self, client_ip: str, current_time: float) -> None:
+        """Count a failed request against the client's circuit."""
+        self.error_counts[client_ip] += 1
+        if self.error_counts[client_ip] / self.rate_limiter.limit > self.circuit_breaker_threshold:
+            self.circuit_breaker_state[client_ip]["open"] = True
+            self.circuit_breaker_state[client_ip]["last_failure"] = current_time
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        current_time = time.time()
+        rejection = self._reject(client_ip, current_time, Headers(scope=scope))
+        if rejection is None:
+            # Check rate limit
+            decision = await self.rate_limiter.ahit(client_ip)
+            if not decision.allowed:
+                rejection = JSONResponse(status_code=429, content={"detail": "Too many requests"}, headers=decision.headers())
+        _record_timing(scope, "guard", time.perf_counter() - started)
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            return
+
+        handed_off = time.perf_counter()
+        status_code = None
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                _record_timing(scope, "app", time.perf_counter() - handed_off)
+            await send(message)
+
+        deadline = self.deadline(scope["path"])
+        try:
+            if deadline is None:
+                await self.app(scope, receive, guarded_send)
+            else:
+                await asyncio.wait_for(self.app(scope, receive, guarded_send), timeout=deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"{scope['method']} {scope['path']} exceeded its {deadline}s deadline")
+            if status_code is None:
+                await JSONResponse(status_code=504, content={"detail": "Request timeout"})(scope, receive, send)
+            # A started response cannot change its status; returning cuts the stream
+            return
+        except Exception:
+            self._record_error(client_ip, current_time)
+            raise
+
+        if status_code is not None and status_code >= 500:
+            self._record_error(client_ip, current_time)
+        elif self.error_counts[client_ip] > 0:
+            # Update circuit breaker on success
+            self.error_counts[client_ip] = max(0, self.error_counts[client_ip] - 1)
+
+
+class AdmissionMiddleware:
+    """Admits agent runs through the admission controller, answering 503 with Retry-After on overload."""
+
+    def __init__(self, app: ASGIApp, controller: Optional[AdmissionController] = None):
+        """Initialize the middleware.
+
+        Args:
+            app: The ASGI app to wrap
+            controller: Controller to admit runs through (default: the worker's global one)
+        """
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not is_admission_controlled(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        priority = Headers(scope=scope).get(ADMISSION_PRIORITY_HEADER, "normal").lower()
+        try:
+            queued = await self.controller.acquire(priority)
+        except AdmissionRejected as e:
+            logger.info("Rejected %s %s: %s, retry after %ss", scope["method"], scope["path"], e.reason, e.retry_after)
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server busy, please retry", "reason": e.reason},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        _record_timing(scope, "queue", queued)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - started)
+
+
+class RequestContextMiddleware:
+    """Logs requests, attributes model usage to them and tags responses with a request id and Server-Timing."""
+
+    def __init__(self, app: ASGIApp, max_body_size: Optional[int] = None):
+        """Initialize the middleware.
+
+        Args:
+            app: The ASGI app to wrap
+            max_body_size: Bodies with a larger Content-Length are passed on unread, for the guard to reject
+        """
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def _prepare_body(self, scope: Scope, receive: Receive) -> Tuple[Receive, Dict[str, Any]]:
+        """Read and parse a JSON request body once and hand the transformed object to the route.
+
+        Returns:
+            The receive channel the app should read the body from, and the parsed body
+        """
+        body = await _read_body(receive)
+        payload = None
+        if body:
+            try:
+                payload = loads(body)
+            except Exception as e:
+                logger.warning("Could not parse request body: %s", e)
+        if isinstance(payload, dict):
+            # Sanitizing walks the whole body, so only do it when the log line is emitted
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Request body: %s", _sanitize_sensitive_data(payload))
+            # Extract user_id and update state
+            extract_properties_and_update_state(payload)
+            set_parsed_body(scope, payload)
+        else:
+            payload = {}
+        return _replay(body, receive), payload
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        headers = Headers(scope=scope)
+        # Log request details
+        logger.info("Request: %s %s", scope["method"], scope["path"])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Headers: %s", _sanitize_sensitive_data(dict(headers)))
+        request_id = headers.get("x-request-id") or uuid.uuid4().hex
+        thread_id = user_id = None
+
+        content_length = headers.get("content-length", "")
+        too_large = self.max_body_size is not None and content_length.isdigit() and int(content_length) > self.max_body_size
+        if scope["method"] in ("POST", "PUT", "PATCH") and not too_large:
+            receive, payload = await self._prepare_body(scope, receive)
+            thread_id = payload.get("threadId") or payload.get("thread_id")
+            state = payload.get("state")
+            user_id = state.get("user_id") if isinstance(state, dict) else None
+        _record_timing(scope, "context", time.perf_counter() - started)
+
+        async def tagged_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Log response details
+                logger.info("Response status: %s", message["status"])
+                response_headers = MutableHeaders(scope=message)
+                response_headers["X-Request-ID"] = request_id
+                response_headers["Server-Timing"] = _server_timing(scope)
+            await send(message)
+
+        # Attribute model usage during this request to it, its thread and its user
+        usage_token = set_usage_context(request_id=request_id, thread_id=thread_id, user_id=user_id)
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, tagged_send)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            reset_usage_context(usage_token)
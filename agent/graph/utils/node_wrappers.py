@@ -31,7 +31,7 @@ def wrap_node_for_state_emission(func: T) -> T:
     async def wrapped(state: GraphState, config: Dict[str, Any] = None) -> Dict[str, Any]:
         # Log before node execution 
         node_name = func.__name__
-        logger.debug(f"Executing node {node_name}")
+        logger.debug("Executing node %s", node_name)
         
         # Execute the original function
         result = await func(state, config)
@@ -46,11 +46,11 @@ def wrap_node_for_state_emission(func: T) -> T:
                 setattr(new_state, key, value)
         
         # Log the result keys for debugging
-        logger.debug(f"Node {node_name} returned keys: {list(result.keys())}")
+        logger.debug("Node %s returned keys: %s", node_name, list(result))
         
         # Emit state changes if config is provided
         if config:
-            logger.debug(f"Emitting state changes after node {node_name}")
+            logger.debug("Emitting state changes after node %s", node_name)
             await emit_state_changes(new_state, config)
             
         return result
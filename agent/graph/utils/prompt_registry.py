@@ -0,0 +1,181 @@
+"""Versioned prompt registry.
+
+Every chain gets its prompt from here instead of building it inline or
+pulling it from LangSmith. A prompt is registered under a name with its
+built-in template. If the prompt snapshot has an entry for that name, the
+snapshot's template replaces the built-in one. The snapshot is a JSON
+file that scripts/snapshot_prompts.py writes at build time from LangSmith.
+Serving therefore never waits on the network for a prompt, and the
+prompts a deployment serves are the ones that were built into it.
+
+Each prompt is compiled once per process, with its partial variables
+(e.g. format instructions) already applied, and carries a version and a
+content hash:
+
+- The version is the LangSmith commit it was pulled at, or "builtin".
+- The hash covers the serialized template.
+
+Chains attach both as run metadata (see Prompt.run_config), so every model
+call records which prompt produced it. Prompts that are rendered per
+message, like the summarizer's, can skip the Runnable machinery and call
+Prompt.format_messages directly.
+
+The LANGSMITH_PROMPTS are maintained in LangSmith and their built-in
+templates are only a fallback, so registering one that the snapshot lacks
+logs a warning.
+
+Environment Variables:
+    PROMPT_SNAPSHOT_PATH: Prompt snapshot written by scripts/snapshot_prompts.py
+        (default: agent/graph/prompts/snapshot.json)
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import warnings
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from langchain_core.load import dumpd, load
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROMPT_SNAPSHOT_PATH = os.getenv(
+    "PROMPT_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts", "snapshot.json"),
+)
+
+BUILTIN_VERSION = "builtin"
+
+# Prompts maintained in LangSmith, which scripts/snapshot_prompts.py pulls by default
+LANGSMITH_PROMPTS = ["generation_prompt", "regeneration_prompt"]
+
+
+def serialize_prompt(template: ChatPromptTemplate) -> Dict[str, Any]:
+    """Serialize a prompt template to the JSON stored in a snapshot."""
+    return dumpd(template)
+
+
+def hash_prompt(serialized: Dict[str, Any]) -> str:
+    """Content hash of a serialized prompt template."""
+    return hashlib.sha256(json.dumps(serialized, sort_keys=True).encode()).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """A compiled prompt template with its version and content hash."""
+    name: str
+    template: ChatPromptTemplate
+    version: str
+    hash: str
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+    def format_messages(self, **variables: Any) -> List[BaseMessage]:
+        """Render the prompt to messages; the cheap path for prompts rendered per call."""
+        return self.template.format_messages(**variables)
+
+    def run_config(self) -> Dict[str, Any]:
+        """Config recording this prompt's name, version and hash on a chain's runs, for with_config()."""
+        return {"metadata": self.metadata}
+
+
+def _make_prompt(name: str, template: ChatPromptTemplate, version: str, prompt_hash: Optional[str] = None) -> Prompt:
+    prompt_hash = prompt_hash or hash_prompt(serialize_prompt(template))
+    return Prompt(
+        name=name,
+        template=template,
+        version=version,
+        hash=prompt_hash,
+        metadata={"prompt_name": name, "prompt_version": version, "prompt_hash": prompt_hash},
+    )
+
+
+class PromptRegistry:
+    """Prompts by name: the snapshot's version if it has one, else the built-in template."""
+
+    def __init__(self, snapshot_path: str = PROMPT_SNAPSHOT_PATH):
+        """Initialize the registry.
+
+        Args:
+            snapshot_path: Prompt snapshot to prefer over built-in templates; read on first use
+        """
+        self.snapshot_path = snapshot_path
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._prompts: Dict[str, Prompt] = {}
+        self._lock = threading.Lock()
+
+    def _load_snapshot(self) -> Dict[str, Any]:
+        """Read the snapshot file once; a missing or unreadable one counts as empty."""
+        if self._snapshot is None:
+            snapshot = {}
+            if os.path.exists(self.snapshot_path):
+                try:
+                    with open(self.snapshot_path) as f:
+                        snapshot = json.load(f)
+                    logger.info(
+                        "Loaded %d prompts from snapshot %s taken at %s",
+                        len(snapshot.get("prompts", {})), self.snapshot_path, snapshot.get("snapshot_version"),
+                    )
+                except Exception as e:
+                    logger.error("Error loading prompt snapshot %s: %s", self.snapshot_path, e)
+            self._snapshot = snapshot
+        return self._snapshot
+
+    def register(self, name: str, default: ChatPromptTemplate) -> Prompt:
+        """Register a prompt and get its compiled version.
+
+        Args:
+            name: Prompt name, the LangSmith prompt name for snapshotted prompts
+            default: Built-in template, used when the snapshot has no entry for the name
+
+        Returns:
+            The snapshot's prompt if there is one, else the built-in template
+        """
+        with self._lock:
+            prompt = self._prompts.get(name)
+            if prompt is not None:
+                return prompt
+            entry = self._load_snapshot().get("prompts", {}).get(name)
+            if entry is not None:
+                try:
+                    with warnings.catch_warnings():
+                        # langchain_core.load is marked beta
+                        warnings.simplefilter("ignore")
+                        template = load(entry["template"])
+                    prompt = _make_prompt(name, template, entry["version"], entry.get("hash"))
+                except Exception as e:
+                    logger.error("Error loading prompt %s from the snapshot, using the built-in one: %s", name, e)
+            if prompt is None:
+                if name in LANGSMITH_PROMPTS:
+                    logger.warning(
+                        "Prompt %s is not in the snapshot %s; serving its built-in template instead of the LangSmith "
+                        "prompt. Run scripts/snapshot_prompts.py at build time.", name, self.snapshot_path,
+                    )
+                prompt = _make_prompt(name, default, BUILTIN_VERSION)
+            self._prompts[name] = prompt
+            return prompt
+
+    def get(self, name: str) -> Prompt:
+        """Get a registered prompt."""
+        return self._prompts[name]
+
+    def get_versions(self) -> Dict[str, Dict[str, str]]:
+        """Get the version and hash of every registered prompt."""
+        return {name: {"version": prompt.version, "hash": prompt.hash} for name, prompt in self._prompts.items()}
+
+
+# Global prompt registry
+prompt_registry = PromptRegistry()
+
+
+def register_prompt(name: str, default: ChatPromptTemplate) -> Prompt:
+    """Register a prompt with the global registry; see PromptRegistry.register."""
+    return prompt_registry.register(name, default)
@@ -0,0 +1,321 @@
+"""Sliding-window rate limiting per client.
+
+Limits use the sliding window counter approximation: a key keeps the
+request counts of the current and the previous fixed window, and a
+request is allowed while
+
+    previous * (1 - elapsed / window) + current < limit
+
+where `elapsed` is the time since the current window started. That is two
+integers per key however high the limit, against a list of timestamps
+for an exact sliding log, and it smooths the burst a plain fixed window
+allows at window boundaries.
+
+The local limiter keeps its counters in process. Keys are spread over
+lock stripes, so concurrent requests only contend when they hash to the
+same stripe, and keys idle for two windows are evicted as each stripe is
+touched. Limits are per worker, so N workers admit up to N times the limit.
+
+The Redis limiter keeps the counters in Redis and checks and increments
+them in one Lua script, so one limit holds across every worker and
+instance. Its keys expire on their own after two windows. If Redis cannot
+be reached, requests are limited by a local limiter until it recovers.
+Calls to Redis go through a circuit breaker (utils/circuit_breaker.py), so
+while Redis is down requests go straight to the local limiter instead of
+each waiting out a connection timeout, and the fallback is logged at most
+once per FALLBACK_LOG_INTERVAL.
+
+Environment Variables:
+    RATE_LIMIT_BACKEND: "memory" for per-worker limits, "redis" for shared ones (default: memory)
+    RATE_LIMIT_REDIS_URL: Redis for the redis backend (default: REDIS_URL)
+    RATE_LIMIT_LOCK_STRIPES: Lock stripes of the local limiter (default: 64)
+"""
+
+import os
+import time
+import zlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from agent.graph.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from agent.graph.utils.redis_client import get_async_redis, get_redis, hash_tag
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL") or os.getenv("REDIS_URL")
+RATE_LIMIT_LOCK_STRIPES = int(os.getenv("RATE_LIMIT_LOCK_STRIPES", "64"))
+
+RATE_LIMIT_KEY_PREFIX = "rate_limit"
+
+# Seconds between warnings about limiting locally while Redis is unavailable
+FALLBACK_LOG_INTERVAL = 60
+
+# Check and count one request against a sliding window counter.
+# KEYS[1] and KEYS[2] are the counters of the current and the previous window;
+# ARGV holds the limit, the window and the time elapsed in the current window,
+# in milliseconds. Returns {allowed, current count, previous count}.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * (window - elapsed) / window + current >= limit then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('PEXPIRE', KEYS[1], 2 * window)
+end
+return {1, current, previous}
+"""
+
+
+@dataclass
+class RateLimitDecision:
+    """Outcome of counting one request."""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+
+    def headers(self) -> Dict[str, str]:
+        """Rate limit response headers for this decision."""
+        headers = {"X-RateLimit-Limit": str(self.limit), "X-RateLimit-Remaining": str(self.remaining)}
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, round(self.retry_after)))
+        return headers
+
+
+def _decide(limit: int, window: float, elapsed: float, current: int, previous: int, allowed: bool) -> RateLimitDecision:
+    """Build the decision for counts seen `elapsed` seconds into the current window.
+
+    `current` already includes the request if it was allowed.
+    """
+    weight = previous * (window - elapsed) / window
+    remaining = max(0, int(limit - weight - current))
+    retry_after = 0.0
+    if not allowed:
+        if current >= limit:
+            # Only the next window can make room
+            retry_after = window - elapsed
+        else:
+            # The previous window's weight must decay until one request fits
+            retry_after = min(window - elapsed, (weight + current - limit + 1) * window / max(previous, 1))
+    return RateLimitDecision(allowed=allowed, limit=limit, remaining=remaining, retry_after=retry_after)
+
+
+class _Stripe:
+    """One lock and the counters of the keys that hash to it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [window start, current count, previous count]
+        self.counters: Dict[str, List[float]] = {}
+        self.last_sweep = time.monotonic()
+
+
+class LocalRateLimiter:
+    """Per-worker sliding window counter limiter with lock striping."""
+
+    def __init__(self, limit: int, window: float, stripes: int = RATE_LIMIT_LOCK_STRIPES):
+        """Initialize the limiter.
+
+        Args:
+            limit: Requests allowed per key and window
+            window: Window length in seconds
+            stripes: Number of lock stripes keys are spread over
+        """
+        self.limit = limit
+        self.window = window
+        self._stripes = [_Stripe() for _ in range(max(1, stripes))]
+        self.allowed = 0
+        self.rejected = 0
+
+    def _stripe(self, key: str) -> _Stripe:
+        return self._stripes[zlib.crc32(key.encode()) % len(self._stripes)]
+
+    def _sweep(self, stripe: _Stripe, now: float) -> None:
+        """Evict the keys of a stripe that have been idle for two windows. Call with its lock held."""
+        if now - stripe.last_sweep < self.window:
+            return
+        stripe.last_sweep = now
+        cutoff = now - 2 * self.window
+        for key in [key for key, counter in stripe.counters.items() if counter[0] < cutoff]:
+            del stripe.counters[key]
+
+    def hit(self, key: str) -> RateLimitDecision:
+        """Count a request for a key, if the limit allows it.
+
+        Args:
+            key: The client key, e.g. its IP address
+
+        Returns:
+            Whether the request is allowed, with the remaining budget and when to retry
+        """
+        now = time.monotonic()
+        stripe = self._stripe(key)
+        with stripe.lock:
+            self._sweep(stripe, now)
+            counter = stripe.counters.get(key)
+            if counter is None:
+                counter = stripe.counters[key] = [now - now % self.window, 0, 0]
+            windows_passed = int((now - counter[0]) // self.window)
+            if windows_passed:
+                # Roll forward: the current window becomes the previous one, or both reset after a gap
+                counter[2] = counter[1] if windows_passed == 1 else 0
+                counter[1] = 0
+                counter[0] += windows_passed * self.window
+            elapsed = now - counter[0]
+            allowed = counter[2] * (self.window - elapsed) / self.window + counter[1] < self.limit
+            if allowed:
+                counter[1] += 1
+            current, previous = counter[1], counter[2]
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return _decide(self.limit, self.window, elapsed, current, previous, allowed)
+
+    async def ahit(self, key: str) -> RateLimitDecision:
+        """Async variant of hit(); the critical section never blocks, so it runs inline."""
+        return self.hit(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get decision counters and the number of tracked keys."""
+        return {
+            "backend": "memory",
+            "limit": self.limit,
+            "window": self.window,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "keys": sum(len(stripe.counters) for stripe in self._stripes),
+        }
+
+
+class RedisRateLimiter:
+    """Sliding window counter limiter shared by every worker through Redis."""
+
+    def __init__(self, limit: int, window: float, redis_url: Optional[str] = None, prefix: str = RATE_LIMIT_KEY_PREFIX):
+        """Initialize the limiter.
+
+        Args:
+            limit: Requests allowed per key and window
+            window: Window length in seconds
+            redis_url: Redis URL (default: RATE_LIMIT_REDIS_URL)
+            prefix: Prefix of the counter keys
+        """
+        self.limit = limit
+        self.window = window
+        self.prefix = prefix
+        self.redis_url = redis_url or RATE_LIMIT_REDIS_URL
+        if not self.redis_url:
+            raise ValueError("Redis URL is required for RATE_LIMIT_BACKEND=redis. Set RATE_LIMIT_REDIS_URL or REDIS_URL.")
+        self._script = get_redis(self.redis_url).register_script(SLIDING_WINDOW_SCRIPT)
+        self._async_script = get_async_redis(self.redis_url).register_script(SLIDING_WINDOW_SCRIPT)
+        # Used while Redis is unreachable
+        self._fallback = LocalRateLimiter(limit, window)
+        self.breaker = get_circuit_breaker("rate_limiter", "redis")
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+        self.short_circuited = 0
+        self._last_fallback_warning = float("-inf")
+        self._suppressed_warnings = 0
+
+    def _script_args(self, key: str, now: float) -> Dict[str, List[Any]]:
+        """Keys and arguments of SLIDING_WINDOW_SCRIPT for a key at a time."""
+        window_ms = int(self.window * 1000)
+        now_ms = int(now * 1000)
+        index = now_ms // window_ms
+        # The counters of one key share a hash tag, so they live on one cluster slot
+        base = f"{self.prefix}:{hash_tag(key)}"
+        return {
+            "keys": [f"{base}:{index}", f"{base}:{index - 1}"],
+            "args": [self.limit, window_ms, now_ms - index * window_ms],
+        }
+
+    def _record(self, args: Dict[str, List[Any]], reply: List[Any]) -> RateLimitDecision:
+        allowed, current, previous = (int(value) for value in reply)
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return _decide(self.limit, self.window, args["args"][2] / 1000, current, previous, bool(allowed))
+
+    def _fall_back(self, key: str, error: Exception) -> RateLimitDecision:
+        if isinstance(error, CircuitOpenError):
+            self.short_circuited += 1
+        else:
+            self.errors += 1
+        now = time.monotonic()
+        if now - self._last_fallback_warning >= FALLBACK_LOG_INTERVAL:
+            suppressed = f" ({self._suppressed_warnings} more since the last warning)" if self._suppressed_warnings else ""
+            logger.warning(f"Rate limiting locally, Redis is unavailable: {error}{suppressed}")
+            self._last_fallback_warning = now
+            self._suppressed_warnings = 0
+        else:
+            self._suppressed_warnings += 1
+        return self._fallback.hit(key)
+
+    def hit(self, key: str) -> RateLimitDecision:
+        """Count a request for a key, if the shared limit allows it.
+
+        Args:
+            key: The client key, e.g. its IP address
+
+        Returns:
+            Whether the request is allowed, with the remaining budget and when to retry
+        """
+        args = self._script_args(key, time.time())
+        try:
+            return self._record(args, self.breaker.call(self._script, **args))
+        except Exception as e:
+            return self._fall_back(key, e)
+
+    async def ahit(self, key: str) -> RateLimitDecision:
+        """Async variant of hit()."""
+        args = self._script_args(key, time.time())
+        try:
+            return self._record(args, await self.breaker.acall(self._async_script, **args))
+        except Exception as e:
+            return self._fall_back(key, e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get decision counters, Redis errors and the fallback's counters."""
+        return {
+            "backend": "redis",
+            "limit": self.limit,
+            "window": self.window,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "short_circuited": self.short_circuited,
+            "fallback": self._fallback.get_stats(),
+        }
+
+
+def get_rate_limiter(limit: int, window: float) -> Any:
+    """Create the rate limiter selected by RATE_LIMIT_BACKEND.
+
+    Args:
+        limit: Requests allowed per key and window
+        window: Window length in seconds
+
+    Returns:
+        A LocalRateLimiter or RedisRateLimiter
+    """
+    if RATE_LIMIT_BACKEND == "redis":
+        logger.info(f"Rate limiting to {limit} requests per {window}s across workers via Redis")
+        return RedisRateLimiter(limit, window)
+    if RATE_LIMIT_BACKEND != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND {RATE_LIMIT_BACKEND!r}; using the per-worker limiter")
+    logger.info(f"Rate limiting to {limit} requests per {window}s per worker")
+    return LocalRateLimiter(limit, window)
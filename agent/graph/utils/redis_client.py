@@ -0,0 +1,154 @@
+"""Shared Redis connection pools.
+
+Every component that talks to Redis gets its clients from here, so a worker
+holds one bounded sync pool and one bounded async pool per Redis URL instead
+of an unbounded pool per client. Pools block for a free connection when they
+are exhausted rather than failing the request.
+
+With REDIS_CLUSTER=true the clients are Redis Cluster clients. Callers keep
+related keys on one shard with hash_tag(), e.g. every key of a checkpoint
+thread is tagged with its thread id, so multi-key pipelines and scripts for
+one thread stay on a single node while threads spread across the cluster.
+
+Environment Variables:
+    REDIS_CLUSTER: Set to "true" to connect to a Redis Cluster (default: false)
+    REDIS_MAX_CONNECTIONS: Connections per pool (default: 50)
+    REDIS_POOL_TIMEOUT: Seconds to wait for a free connection (default: 5)
+    REDIS_SOCKET_TIMEOUT: Seconds to wait for a reply (default: 5)
+    REDIS_SOCKET_CONNECT_TIMEOUT: Seconds to wait for a new connection (default: 5)
+    REDIS_HEALTH_CHECK_INTERVAL: Seconds a connection may idle before it is checked (default: 30)
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REDIS_CLUSTER = os.getenv("REDIS_CLUSTER", "false").lower() == "true"
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# (url, async) -> client
+_clients: Dict[Tuple[str, bool], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def hash_tag(value: str) -> str:
+    """Wrap a key part in a Redis Cluster hash tag, so keys sharing it map to one slot."""
+    return f"{{{value}}}"
+
+
+def strip_hash_tag(value: str) -> str:
+    """Undo hash_tag()."""
+    if value.startswith("{") and value.endswith("}"):
+        return value[1:-1]
+    return value
+
+
+def _connect(url: str, asynchronous: bool) -> Any:
+    """Create a client with its own bounded connection pool."""
+    import redis
+
+    options = {
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+    }
+    if REDIS_CLUSTER:
+        # Cluster clients keep one pool per node
+        cluster_module = redis.asyncio.cluster if asynchronous else redis.cluster
+        return cluster_module.RedisCluster.from_url(url, max_connections=REDIS_MAX_CONNECTIONS, **options)
+
+    client_module = redis.asyncio if asynchronous else redis
+    pool = client_module.BlockingConnectionPool.from_url(
+        url,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        **options,
+    )
+    return client_module.Redis(connection_pool=pool)
+
+
+def _get_client(url: str, asynchronous: bool) -> Any:
+    key = (url, asynchronous)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _connect(url, asynchronous)
+            logger.info(
+                f"Created {'async' if asynchronous else 'sync'} Redis {'cluster ' if REDIS_CLUSTER else ''}client "
+                f"with up to {REDIS_MAX_CONNECTIONS} connections"
+            )
+        return client
+
+
+def get_redis(url: str) -> Any:
+    """Get the shared sync client for a Redis URL.
+
+    Args:
+        url: The Redis URL
+
+    Returns:
+        A redis.Redis, or redis.cluster.RedisCluster with REDIS_CLUSTER=true
+    """
+    return _get_client(url, asynchronous=False)
+
+
+def get_async_redis(url: str) -> Any:
+    """Get the shared async client for a Redis URL.
+
+    Args:
+        url: The Redis URL
+
+    Returns:
+        A redis.asyncio.Redis, or redis.asyncio.cluster.RedisCluster with REDIS_CLUSTER=true
+    """
+    return _get_client(url, asynchronous=True)
+
+
+async def close_redis_clients() -> None:
+    """Close every shared client and its connections."""
+    with _clients_lock:
+        clients = list(_clients.items())
+        _clients.clear()
+    for (_, asynchronous), client in clients:
+        try:
+            if asynchronous:
+                await client.aclose() if hasattr(client, "aclose") else await client.close()
+            else:
+                client.close()
+        except Exception as e:
+            logger.warning(f"Error closing Redis client: {e}")
+
+
+async def warm_redis_clients(connections: int = 1) -> Dict[str, int]:
+    """Open connections in every shared pool ahead of traffic.
+
+    Args:
+        connections: Connections to open per pool, by pinging concurrently
+
+    Returns:
+        Number of pools warmed per kind ("sync", "async")
+    """
+    with _clients_lock:
+        clients = list(_clients.items())
+    warmed = {"sync": 0, "async": 0}
+    for (_, asynchronous), client in clients:
+        count = max(1, min(connections, REDIS_MAX_CONNECTIONS))
+        if asynchronous:
+            await asyncio.gather(*(client.ping() for _ in range(count)))
+        else:
+            await asyncio.gather(*(asyncio.to_thread(client.ping) for _ in range(count)))
+        warmed["async" if asynchronous else "sync"] += 1
+    return warmed
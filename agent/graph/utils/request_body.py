@@ -0,0 +1,82 @@
+"""Single-parse JSON request bodies.
+
+RequestContextMiddleware parses a request's JSON body once, applies the
+request transforms to the parsed object in place, and stores the object
+in the request scope. Routes built with ParsedBodyRoute receive a
+ParsedBodyRequest, whose json() returns that object instead of parsing the
+body again. Its body() serializes the object only if someone asks for the
+raw bytes, so the property injection is visible either way. Raw ASGI
+consumers of the stream still read the body the client sent.
+
+Parsing and serialization use orjson when it is installed and the json
+module otherwise.
+"""
+
+import json
+import logging
+from typing import Any
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Key of the parsed body in the request scope's state
+PARSED_BODY_STATE_KEY = "parsed_body"
+
+_MISSING = object()
+
+
+def loads(body: bytes) -> Any:
+    """Parse a JSON body."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a value to a JSON body."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value).encode()
+
+
+def set_parsed_body(scope: dict, payload: Any) -> None:
+    """Hand a parsed (and transformed) body to the route handling the request."""
+    scope.setdefault("state", {})[PARSED_BODY_STATE_KEY] = payload
+
+
+class ParsedBodyRequest(Request):
+    """A request whose JSON body may already have been parsed by the middleware."""
+
+    def _parsed_body(self) -> Any:
+        return self.scope.get("state", {}).get(PARSED_BODY_STATE_KEY, _MISSING)
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            payload = self._parsed_body()
+            self._json = payload if payload is not _MISSING else loads(await self.body())
+        return self._json
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            payload = self._parsed_body()
+            self._body = dumps(payload) if payload is not _MISSING else await super().body()
+        return self._body
+
+
+class ParsedBodyRoute(APIRoute):
+    """Route class handing endpoints a ParsedBodyRequest; set it as app.router.route_class before adding routes."""
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def parsed_body_route_handler(request: Request) -> Response:
+            return await route_handler(ParsedBodyRequest(request.scope, request.receive))
+
+        return parsed_body_route_handler
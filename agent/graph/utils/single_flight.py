@@ -0,0 +1,135 @@
+"""Single-flight coalescing of identical in-flight calls.
+
+When several requests in a worker issue the same upstream call at the same
+moment (same router prompt, same summarizer input, same embedding text), only
+the first caller (the leader) runs it. Everyone else waits for the leader's
+result instead of making their own request. Nothing is cached once the call
+finishes, so this never serves stale results.
+
+Environment Variables:
+    SINGLE_FLIGHT_ENABLED: Set to "false" to disable coalescing (default: true)
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key, for threads and coroutines."""
+
+    def __init__(self, name: str):
+        """Initialize the group.
+
+        Args:
+            name: Name used in stats, e.g. "chat" or "embeddings"
+        """
+        self.name = name
+        self.leaders = 0
+        self.shared = 0
+        self.errors = 0
+        self._calls: Dict[Hashable, Future] = {}
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, bool]:
+        """Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the call
+            fn: Callable that performs the upstream call
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The result of the call, and whether it was shared from another caller
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def ado(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Tuple[Any, bool]:
+        """Async variant of do() for coroutine functions on the running loop."""
+        # The counters are shared with threads calling do(), so they are only updated under the lock
+        while (future := self._async_calls.get(key)) is not None:
+            with self._lock:
+                self.shared += 1
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # The leader was cancelled, so take over; re-raise our own cancellation
+                if not future.cancelled():
+                    raise
+                with self._lock:
+                    self.shared -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        with self._lock:
+            self.leaders += 1
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._async_calls.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit counters for this group."""
+        total = self.leaders + self.shared
+        return {
+            "upstream_calls": self.leaders,
+            "shared_hits": self.shared,
+            "errors": self.errors,
+            "in_flight": len(self._calls) + len(self._async_calls),
+            "hit_ratio": round(self.shared / total, 3) if total else 0.0,
+        }
+
+
+chat_flight = SingleFlight("chat")
+embeddings_flight = SingleFlight("embeddings")
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Get hit counters for every single-flight group."""
+    return {group.name: group.stats() for group in (chat_flight, embeddings_flight)}
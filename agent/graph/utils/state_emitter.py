@@ -4,10 +4,21 @@ from typing import Dict, Any, Optional, List, Set, Callable, Awaitable
 import asyncio
 import logging
 from agent.graph.state import GraphState
-from copilotkit.langgraph import copilotkit_emit_state
+from copilotkit.langgraph import copilotkit_emit_state, copilotkit_emit_message
+from agent.graph.utils.metrics import EMIT_DURATION
 
 logger = logging.getLogger(__name__)
 
+async def emit_state(config: Dict[str, Any], state: Dict[str, Any]) -> Any:
+    """Emit state to the client through CopilotKit, recording how long the emit takes."""
+    with EMIT_DURATION.time("state"):
+        return await copilotkit_emit_state(config, state)
+
+async def emit_message(config: Dict[str, Any], message: str) -> Any:
+    """Emit a message to the client through CopilotKit, recording how long the emit takes."""
+    with EMIT_DURATION.time("message"):
+        return await copilotkit_emit_message(config, message)
+
 # Empty set means track all properties
 TRACKED_PROPERTIES = set()
 
@@ -75,8 +86,8 @@ class StateChangeEmitter:
         changes = self.detect_changes(state)
         
         if changes:
-            logger.info(f"Detected state changes: {changes}")
-            await copilotkit_emit_state(config, changes)
+            logger.debug("Detected state changes: %s", changes)
+            await emit_state(config, changes)
         else:
             logger.debug("No state changes detected")
 
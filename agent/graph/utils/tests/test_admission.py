@@ -0,0 +1,133 @@
+"""Tests for admission control of agent runs
+
+Run with: python -m pytest agent/graph/utils/tests
+"""
+
+import json
+import asyncio
+import pytest
+from agent.graph.utils import admission
+from agent.graph.utils.admission import AdmissionController, AdmissionRejected
+from agent.graph.utils.middleware import AdmissionMiddleware
+
+
+async def _settle():
+    """Let every ready task run until it blocks again."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_queue_full_is_answered_with_503_and_retry_after():
+    controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=1)
+    app_calls = []
+
+    async def app(scope, receive, send):
+        app_calls.append(scope["path"])
+
+    async def scenario():
+        await controller.acquire()
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/api/copilotkitagent", "headers": [], "query_string": b""}
+        await AdmissionMiddleware(app, controller)(scope, receive, send)
+        return sent
+
+    start, body = asyncio.run(scenario())
+    assert start["status"] == 503
+    assert (b"retry-after", b"1") in start["headers"]
+    assert json.loads(body["body"])["reason"] == "queue_full"
+    assert app_calls == []
+    assert controller.stats()["rejected"]["queue_full"] == 1
+
+
+def test_higher_priority_evicts_the_newest_lower_priority_waiter():
+    controller = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=5)
+
+    async def scenario():
+        await controller.acquire()
+        first_low = asyncio.create_task(controller.acquire("low"))
+        second_low = asyncio.create_task(controller.acquire("low"))
+        await _settle()
+        high = asyncio.create_task(controller.acquire("high"))
+        await _settle()
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await second_low
+        assert rejected.value.reason == "evicted"
+        assert controller.queued == 2
+
+        # The high-priority run is admitted first, then the remaining low one
+        controller.release()
+        await high
+        assert not first_low.done()
+        controller.release()
+        await first_low
+        controller.release()
+
+    asyncio.run(scenario())
+    assert (controller.running, controller.queued) == (0, 0)
+    assert controller.stats()["rejected"]["evicted"] == 1
+
+
+def test_slot_handed_over_as_the_wait_times_out_is_passed_on(monkeypatch):
+    controller = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=5)
+
+    async def scenario():
+        await controller.acquire()
+        timed_out = asyncio.Event()
+
+        async def times_out_after_handover(future, timeout):
+            await timed_out.wait()
+            assert future.done()
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", times_out_after_handover)
+        first = asyncio.create_task(controller.acquire())
+        await _settle()
+        monkeypatch.undo()
+        second = asyncio.create_task(controller.acquire())
+        await _settle()
+
+        # The slot is handed to the first waiter just as its wait times out
+        controller.release()
+        timed_out.set()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await first
+        assert rejected.value.reason == "timeout"
+        # It goes on to the next waiter rather than being lost
+        await second
+        assert (controller.running, controller.queued) == (1, 0)
+        controller.release()
+
+    asyncio.run(scenario())
+    assert (controller.running, controller.queued) == (0, 0)
+
+
+def test_cancelled_waiter_does_not_leak_its_queue_place():
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+
+    async def scenario():
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await _settle()
+        assert controller.queued == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queued == 0
+
+        # The queue has room again, and releasing does not hand the slot to the cancelled waiter
+        controller.release()
+        assert controller.running == 0
+        assert await controller.acquire() == 0.0
+        controller.release()
+
+    asyncio.run(scenario())
+    assert (controller.running, controller.queued) == (0, 0)
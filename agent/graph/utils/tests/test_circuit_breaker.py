@@ -0,0 +1,68 @@
+"""Tests for the provider circuit breakers
+
+Run with: python -m pytest agent/graph/utils/tests
+"""
+
+import asyncio
+import pytest
+from agent.graph.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def _fail():
+    raise ValueError("provider down")
+
+
+def _open_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0, half_open_max_calls=1)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            breaker.call(_fail)
+    assert breaker.state == OPEN
+    return breaker
+
+
+def test_opens_after_threshold_and_closes_after_successful_probe():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            breaker.call(_fail)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "unreachable")
+
+    breaker.reset_timeout = 0
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens():
+    breaker = _open_breaker()
+    with pytest.raises(ValueError):
+        breaker.call(_fail)
+    assert breaker.state == OPEN
+
+
+def test_cancelled_probe_frees_its_slot():
+    breaker = _open_breaker()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(breaker.acall(asyncio.sleep, 10), timeout=0.01)
+        assert breaker.state == HALF_OPEN
+        assert breaker.half_open_in_flight == 0
+        # The next call probes instead of being rejected
+        return await breaker.acall(asyncio.sleep, 0, "ok")
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_cancelled_call_while_closed_is_not_counted():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(breaker.acall(asyncio.sleep, 10), timeout=0.01)
+
+    asyncio.run(scenario())
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["total_failures"] == 0
@@ -0,0 +1,68 @@
+"""Tests for merging metrics across gunicorn workers
+
+Run with: python -m pytest agent/graph/utils/tests
+"""
+
+import os
+import json
+from agent.graph.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def _registry(directory=None):
+    registry = MetricsRegistry(multiproc_dir=directory)
+    calls = registry.register(Counter("calls_total", "Calls", ["component"]))
+    in_flight = registry.register(Gauge("in_flight", "In flight"))
+    duration = registry.register(Histogram("duration_seconds", "Duration", buckets=(1.0,)))
+    return registry, calls, in_flight, duration
+
+
+def _write_as_worker(registry, directory, pid):
+    snapshot = registry.snapshot()
+    snapshot["pid"] = pid
+    with open(os.path.join(directory, f"{pid}.json"), "w") as f:
+        json.dump(snapshot, f)
+
+
+def test_single_process_labels_every_sample_with_its_worker():
+    registry, calls, _, _ = _registry()
+    calls.inc("llm")
+    assert f'agent_calls_total{{component="llm",worker="{os.getpid()}"}} 1' in registry.render()
+
+
+def test_workers_sharing_a_directory_are_merged(tmp_path):
+    directory = str(tmp_path)
+    own, calls, in_flight, duration = _registry(directory)
+    calls.inc("llm", amount=2)
+    in_flight.set(3)
+    duration.observe(0.5)
+
+    # A live sibling and a worker that has exited
+    for pid in (os.getppid(), 2**31 - 1):
+        other, other_calls, other_in_flight, other_duration = _registry()
+        other_calls.inc("llm")
+        other_in_flight.set(7)
+        other_duration.observe(2.0)
+        _write_as_worker(other, directory, pid)
+
+    lines = own.render().splitlines()
+    # Counters and histograms are summed over every worker, including the exited one
+    assert 'agent_calls_total{component="llm"} 4' in lines
+    assert 'agent_duration_seconds_bucket{le="1"} 1' in lines
+    assert 'agent_duration_seconds_bucket{le="+Inf"} 3' in lines
+    assert "agent_duration_seconds_count 3" in lines
+    assert "agent_duration_seconds_sum 4.5" in lines
+    # Gauges are reported per live worker
+    gauges = sorted(line for line in lines if line.startswith("agent_in_flight{"))
+    assert gauges == sorted([f'agent_in_flight{{worker="{os.getpid()}"}} 3', f'agent_in_flight{{worker="{os.getppid()}"}} 7'])
+    assert lines.count("# TYPE agent_calls_total counter") == 1
+
+
+def test_flush_writes_an_atomic_snapshot(tmp_path):
+    registry, calls, _, _ = _registry(str(tmp_path))
+    calls.inc("llm")
+    registry.start_flush(interval=60)
+    registry.stop_flush()
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
+    with open(tmp_path / f"{os.getpid()}.json") as f:
+        snapshot = json.load(f)
+    assert snapshot["metrics"][0]["samples"] == [["agent_calls_total", ["component"], ["llm"], 1]]
@@ -0,0 +1,90 @@
+"""Tests for the sliding window rate limiters
+
+Run with: python -m pytest agent/graph/utils/tests
+"""
+
+import pytest
+from agent.graph.utils import rate_limiter
+from agent.graph.utils.circuit_breaker import CircuitBreaker
+from agent.graph.utils.rate_limiter import LocalRateLimiter, RedisRateLimiter, _decide
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic clock of the limiters, starting at the beginning of a 10s window."""
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _allowed(limiter, hits, key="client"):
+    return sum(limiter.hit(key).allowed for _ in range(hits))
+
+
+def test_limit_holds_within_a_window(clock):
+    limiter = LocalRateLimiter(limit=10, window=10)
+    assert _allowed(limiter, 10) == 10
+
+    clock[0] = 104.0
+    decision = limiter.hit("client")
+    assert not decision.allowed
+    assert decision.remaining == 0
+    # Only the next window can make room
+    assert decision.retry_after == pytest.approx(6.0)
+    assert decision.headers()["Retry-After"] == "6"
+    assert limiter.hit("other").allowed
+
+
+def test_previous_window_decays_after_roll_forward(clock):
+    limiter = LocalRateLimiter(limit=10, window=10)
+    assert _allowed(limiter, 10) == 10
+
+    # Halfway through the next window the previous one still weighs 5 requests
+    clock[0] = 115.0
+    assert _allowed(limiter, 10) == 5
+    decision = limiter.hit("client")
+    assert not decision.allowed
+    # One request fits once a tenth of the window has passed
+    assert decision.retry_after == pytest.approx(1.0)
+
+    clock[0] = 116.0
+    assert limiter.hit("client").allowed
+
+
+def test_gap_of_two_windows_resets_both_counts(clock):
+    limiter = LocalRateLimiter(limit=10, window=10)
+    assert _allowed(limiter, 10) == 10
+    clock[0] = 125.0
+    assert _allowed(limiter, 10) == 10
+
+
+def test_decide():
+    allowed = _decide(limit=10, window=10, elapsed=5, current=3, previous=4, allowed=True)
+    assert (allowed.remaining, allowed.retry_after) == (5, 0.0)
+    assert "Retry-After" not in allowed.headers()
+
+    # Full current window: wait for the next one
+    full = _decide(limit=10, window=10, elapsed=2.5, current=10, previous=0, allowed=False)
+    assert full.retry_after == pytest.approx(7.5)
+
+    # Weight 8 + 4 current: 3 requests of weight must decay, at 0.8 requests per second
+    decaying = _decide(limit=10, window=10, elapsed=0, current=4, previous=8, allowed=False)
+    assert decaying.retry_after == pytest.approx(3.75)
+    assert decaying.headers()["Retry-After"] == "4"
+
+
+def test_redis_limiter_short_circuits_while_redis_is_down(clock):
+    limiter = RedisRateLimiter(limit=10, window=10, redis_url="redis://localhost:1/0")
+    limiter.breaker = CircuitBreaker("rate_limiter:test", failure_threshold=2, reset_timeout=60)
+    calls = []
+
+    def unreachable(**kwargs):
+        calls.append(kwargs)
+        raise ConnectionError("Redis is down")
+
+    limiter._script = unreachable
+    assert _allowed(limiter, 5) == 5
+    # After two failures the breaker opens and the local limiter answers without trying Redis
+    assert len(calls) == 2
+    assert (limiter.errors, limiter.short_circuited) == (2, 3)
+    assert limiter.get_stats()["fallback"]["allowed"] == 5
@@ -1,5 +1,6 @@
 import asyncio
 import functools
+import contextvars
 from typing import Any, Callable, TypeVar, Union
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 import logging
@@ -23,7 +24,8 @@ def timeout(seconds: Union[int, float]) -> Callable:
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> T:
             with ThreadPoolExecutor() as executor:
-                future = executor.submit(func, *args, **kwargs)
+                # Run in a copy of our context so request attribution follows the call
+                future = executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
                 try:
                     return future.result(timeout=seconds)
                 except TimeoutError:
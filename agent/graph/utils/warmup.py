@@ -0,0 +1,184 @@
+"""Targeted warm-up of a worker.
+
+Gets a worker ready to serve without running the graph: no generator or
+grader calls, so no tokens are spent, and nothing touches the checkpointer.
+Each step is timed and reported on its own, and a failing step does not
+stop the others:
+
+- prompts: the prompt snapshot is loaded and every chain's prompt compiled
+- components: the models, embeddings and tools are built (see utils/lazy.py)
+- redis: connections are opened in every shared Redis pool
+- vector_store: the shared Pinecone index is opened and its connection made
+- ollama: every configured Ollama model is loaded (when OLLAMA_PRELOAD is on)
+- router: WARMUP_ROUTER_QUERIES are sent through the query router, which
+  opens the model provider's connection; off by default since it spends
+  (a few) tokens
+
+Warming up on startup is off by default: serverless deployments (Mangum
+runs the lifespan startup on every cold start) should build components on
+first use instead. gunicorn_conf.py turns it on for its long-lived workers
+and caps the whole warm-up below its worker timeout, since a worker still
+in startup sends the master no heartbeat.
+
+Environment Variables:
+    WARMUP_ON_STARTUP: Warm each worker up when it starts (default: false; true under gunicorn_conf.py)
+    WARMUP_REDIS_CONNECTIONS: Connections to open in each Redis pool (default: 4)
+    WARMUP_ROUTER_QUERIES: "|"-separated queries to route during warm-up (default: none)
+    WARMUP_STEP_TIMEOUT: Seconds each step may take, except loading Ollama models (default: 30)
+    WARMUP_OLLAMA_TIMEOUT: Seconds loading the Ollama models may take (default: 90)
+    WARMUP_TOTAL_TIMEOUT: Seconds the whole warm-up may take; steps left when it runs out are skipped (default: 100)
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+WARMUP_REDIS_CONNECTIONS = int(os.getenv("WARMUP_REDIS_CONNECTIONS", "4"))
+WARMUP_ROUTER_QUERIES = [query.strip() for query in os.getenv("WARMUP_ROUTER_QUERIES", "").split("|") if query.strip()]
+WARMUP_STEP_TIMEOUT = float(os.getenv("WARMUP_STEP_TIMEOUT", "30"))
+WARMUP_OLLAMA_TIMEOUT = float(os.getenv("WARMUP_OLLAMA_TIMEOUT", "90"))
+WARMUP_TOTAL_TIMEOUT = float(os.getenv("WARMUP_TOTAL_TIMEOUT", "100"))
+
+
+class SkipStep(Exception):
+    """Raised by a step that does not apply to this deployment."""
+
+
+async def warm_prompts() -> Dict[str, Any]:
+    """Load the prompt snapshot and compile every chain's prompt."""
+    # Importing the graph imports every chain, and each chain registers its prompt
+    import agent.graph.graph  # noqa: F401
+    from agent.graph.utils.prompt_registry import prompt_registry
+    return {"prompts": len(prompt_registry.get_versions())}
+
+
+async def warm_components() -> Dict[str, Any]:
+    """Build every lazily built model, embeddings model and tool."""
+    from agent.graph.utils.lazy import build_components
+    timings = await asyncio.to_thread(build_components)
+    return {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+
+
+async def warm_redis() -> Dict[str, Any]:
+    """Open connections in the shared Redis pools."""
+    from agent.graph.utils.redis_client import warm_redis_clients
+    warmed = await warm_redis_clients(WARMUP_REDIS_CONNECTIONS)
+    if not any(warmed.values()):
+        raise SkipStep("no Redis clients in use")
+    return warmed
+
+
+async def warm_vector_store() -> Dict[str, Any]:
+    """Open the shared Pinecone index and make its first connection."""
+    if not os.getenv("PINECONE_API_KEY"):
+        raise SkipStep("PINECONE_API_KEY not set")
+    from agent.graph.vector_stores import get_pinecone_index
+    index = await asyncio.to_thread(get_pinecone_index)
+    stats = await asyncio.to_thread(index.describe_index_stats)
+    return {"namespaces": len(getattr(stats, "namespaces", None) or {})}
+
+
+async def warm_ollama() -> Dict[str, Any]:
+    """Load every configured Ollama model."""
+    from agent.graph.models.config import USE_OLLAMA, OLLAMA_PRELOAD
+    if not (USE_OLLAMA and OLLAMA_PRELOAD):
+        raise SkipStep("Ollama preloading is off")
+    from agent.graph.models.ollama_preload import preload_ollama_models
+    timings = await preload_ollama_models()
+    failed = [model for model, seconds in timings.items() if seconds < 0]
+    if failed:
+        raise RuntimeError(f"failed to load {', '.join(failed)}")
+    return {model: round(seconds * 1000, 1) for model, seconds in timings.items()}
+
+
+async def warm_router() -> Dict[str, Any]:
+    """Route the configured warm-up queries."""
+    if not WARMUP_ROUTER_QUERIES:
+        raise SkipStep("WARMUP_ROUTER_QUERIES not set")
+    from agent.graph.chains.query_router import query_router
+    routes = await asyncio.gather(*(query_router.ainvoke({"query": query}) for query in WARMUP_ROUTER_QUERIES))
+    return {"queries": len(routes)}
+
+
+# (name, step, timeout in seconds), in the order they run
+STEPS: List[Tuple[str, Callable[[], Awaitable[Dict[str, Any]]], float]] = [
+    ("prompts", warm_prompts, WARMUP_STEP_TIMEOUT),
+    ("components", warm_components, WARMUP_STEP_TIMEOUT),
+    ("redis", warm_redis, WARMUP_STEP_TIMEOUT),
+    ("vector_store", warm_vector_store, WARMUP_STEP_TIMEOUT),
+    # Loading models takes minutes on CPU boxes; a model still loading then loads on its first request
+    ("ollama", warm_ollama, WARMUP_OLLAMA_TIMEOUT),
+    ("router", warm_router, WARMUP_STEP_TIMEOUT),
+]
+
+
+async def _run_step(step: Callable[[], Awaitable[Dict[str, Any]]], timeout: float) -> Dict[str, Any]:
+    """Run one step and report its status, duration and details."""
+    started = time.perf_counter()
+    try:
+        detail = await asyncio.wait_for(step(), timeout=timeout)
+        result = {"status": "ok", "detail": detail}
+    except SkipStep as e:
+        result = {"status": "skipped", "detail": str(e)}
+    except asyncio.TimeoutError:
+        result = {"status": "failed", "detail": f"timed out after {timeout:.0f}s"}
+    except Exception as e:
+        result = {"status": "failed", "detail": str(e)}
+    result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+_last_report: Optional[Dict[str, Any]] = None
+_lock: Optional[asyncio.Lock] = None
+
+
+async def run_warmup(steps: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Warm the worker up; concurrent callers wait for the run in progress instead of starting another.
+
+    Args:
+        steps: Steps to run (default: all of them, in order)
+
+    Returns:
+        Whether every step that ran succeeded, the total time, and each step's report
+    """
+    global _last_report, _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    if _lock.locked():
+        async with _lock:
+            return _last_report
+    async with _lock:
+        started = time.perf_counter()
+        deadline = started + WARMUP_TOTAL_TIMEOUT
+        reports = {}
+        for name, step, timeout in STEPS:
+            if steps is None or name in steps:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    reports[name] = {"status": "skipped", "detail": f"warm-up took its {WARMUP_TOTAL_TIMEOUT:.0f}s", "ms": 0.0}
+                else:
+                    reports[name] = await _run_step(step, min(timeout, remaining))
+                log = logger.warning if reports[name]["status"] == "failed" else logger.info
+                log("Warm-up step %s %s in %.1f ms: %s", name, reports[name]["status"], reports[name]["ms"], reports[name]["detail"])
+        _last_report = {
+            "ok": all(report["status"] != "failed" for report in reports.values()),
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            "steps": reports,
+        }
+        logger.info("Warm-up finished in %.1f ms (ok=%s)", _last_report["total_ms"], _last_report["ok"])
+        return _last_report
+
+
+def get_last_warmup() -> Optional[Dict[str, Any]]:
+    """Get the report of the last warm-up in this worker, if any."""
+    return _last_report
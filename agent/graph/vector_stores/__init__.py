@@ -6,7 +6,8 @@ It supports Chroma for local development and Pinecone for serverless deployments
 
 import os
 import logging
-from typing import Optional
+import threading
+from typing import Any, Optional
 from dotenv import load_dotenv
 from langchain_core.vectorstores import VectorStore
 
@@ -19,6 +20,46 @@ logger = logging.getLogger(__name__)
 # Get the vector store type from environment variable
 VECTOR_STORE_TYPE = os.getenv("VECTOR_STORE_TYPE", "pinecone").lower()
 
+# One Pinecone client and index handle per process, so requests reuse its connection pool
+_pinecone_index: Any = None
+_pinecone_lock = threading.Lock()
+
+def get_pinecone_index() -> Any:
+    """Get the shared Pinecone index handle, creating it on first use.
+
+    Returns:
+        The pinecone Index for PINECONE_INDEX_NAME
+    """
+    global _pinecone_index
+    with _pinecone_lock:
+        if _pinecone_index is None:
+            from pinecone import Pinecone as PineconeClient
+
+            # Get Pinecone credentials from environment variables
+            pinecone_api_key = os.getenv("PINECONE_API_KEY")
+            pinecone_index_name = os.getenv("PINECONE_INDEX_NAME")
+
+            # Validate credentials
+            if not all([pinecone_api_key, pinecone_index_name]):
+                raise ValueError(
+                    "Pinecone credentials are required. "
+                    "Set PINECONE_API_KEY and PINECONE_INDEX_NAME environment variables."
+                )
+
+            # Initialize Pinecone with the new client syntax
+            pc = PineconeClient(api_key=pinecone_api_key)
+            _pinecone_index = pc.Index(pinecone_index_name)
+        return _pinecone_index
+
+def _forget_pinecone_index() -> None:
+    """Drop the handle in a forked child; its pooled connections belong to the parent."""
+    global _pinecone_index, _pinecone_lock
+    _pinecone_index = None
+    _pinecone_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pinecone_index)
+
 def get_vector_store(
     collection_name: str,
     embedding_function: any
@@ -35,24 +76,9 @@ def get_vector_store(
     try:
         
         from langchain_pinecone import PineconeVectorStore
-        from pinecone import Pinecone as PineconeClient
-        
-        # Get Pinecone credentials from environment variables
-        pinecone_api_key = os.getenv("PINECONE_API_KEY")
-        pinecone_index_name = os.getenv("PINECONE_INDEX_NAME")
-        
-        # Validate credentials
-        if not all([pinecone_api_key, pinecone_index_name]):
-            raise ValueError(
-                "Pinecone credentials are required. "
-                "Set PINECONE_API_KEY and PINECONE_INDEX_NAME environment variables."
-            )
-        
-        # Initialize Pinecone with the new client syntax
-        pc = PineconeClient(api_key=pinecone_api_key)
-        
+
         # Get the index
-        index = pc.Index(pinecone_index_name)
+        index = get_pinecone_index()
         
         logger.info(f"Using Pinecone vector store with namespace: {collection_name}")
         return PineconeVectorStore(
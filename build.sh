@@ -28,6 +28,14 @@ fi
 echo "Installing Python dependencies..."
 pip install -r requirements.txt
 
+# Snapshot the LangSmith prompts so the server never pulls them at runtime
+if [ -n "$LANGSMITH_API_KEY" ]; then
+  echo "Snapshotting LangSmith prompts..."
+  python scripts/snapshot_prompts.py || echo "Warning: prompt snapshot incomplete, missing prompts use their built-in versions"
+else
+  echo "LANGSMITH_API_KEY not set, skipping prompt snapshot"
+fi
+
 # Make sure the database directory exists for local development
 if [ ! -d "data" ]; then
   echo "Creating data directory for database storage"
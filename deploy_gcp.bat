@@ -1,4 +1,6 @@
 @echo off
+echo Snapshotting LangSmith prompts into the build context... && ^
+(python scripts/snapshot_prompts.py || echo Warning: prompt snapshot incomplete, missing prompts use their built-in versions) && ^
 echo Building and pushing Docker image... && ^
 gcloud builds submit --tag gcr.io/documentation-helper-agent/documentation-helper-agent && ^
 echo Deploying to Cloud Run... && ^
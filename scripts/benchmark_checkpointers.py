@@ -0,0 +1,92 @@
+"""Benchmark the checkpointers on the real_flow workload
+
+Runs N conversations of M interrupted and resumed turns against each
+backend and reports throughput, per-operation p50/p99 latency, round trips
+per operation (for backends that count them) and bytes stored per
+checkpoint. See agent/graph/checkpointers/tests/workload.py for the
+workload itself.
+
+Usage:
+    python scripts/benchmark_checkpointers.py
+    python scripts/benchmark_checkpointers.py --backends redis redis+on-interrupt --threads 200 --turns 10
+    python scripts/benchmark_checkpointers.py --redis-url redis://localhost:6379/15 --json results.json
+
+Without --redis-url the Redis backends run against fakeredis, which shows
+round trips and bytes but not network latency. Against a real server, use
+a scratch database: stored bytes count every checkpoint key in it.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+import logging
+import tempfile
+import contextlib
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.graph.checkpointers.tests.workload import BACKENDS, OPERATIONS, fake_redis, make_checkpointer, run_workload
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+async def benchmark(backend: str, args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    """Run the workload against one backend and summarize it."""
+    checkpointer = make_checkpointer(backend, workdir, args.redis_url)
+    result = await run_workload(
+        checkpointer,
+        backend=backend,
+        threads=args.threads,
+        turns=args.turns,
+        concurrency=args.concurrency,
+        document_bytes=args.document_bytes,
+    )
+    return result.summary()
+
+
+def print_table(summaries: List[Dict[str, Any]]) -> None:
+    """Print the summaries as an aligned table."""
+    columns = ["backend", "ops", "ops_per_sec", "round_trips_per_op", "bytes_per_step"]
+    columns += [f"{operation}_{percentile}_ms" for operation in OPERATIONS for percentile in ("p50", "p99")]
+    columns = [column for column in columns if any(column in summary for summary in summaries)]
+    rows = [[str(summary.get(column, "-")) if summary.get(column) is not None else "-" for column in columns] for summary in summaries]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the checkpointers on the real_flow workload")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS, help="Backends to run")
+    parser.add_argument("--threads", type=int, default=50, help="Conversations")
+    parser.add_argument("--turns", type=int, default=5, help="Interrupted and resumed turns per conversation")
+    parser.add_argument("--concurrency", type=int, default=20, help="Conversations run at the same time")
+    parser.add_argument("--document-bytes", type=int, default=2048, help="Size of each retrieved document")
+    parser.add_argument("--redis-url", default=os.getenv("BENCHMARK_REDIS_URL"), help="Redis server (default: fakeredis)")
+    parser.add_argument("--json", help="Also write the summaries to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    summaries = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in args.backends:
+            # Each fakeredis backend starts from an empty server
+            context = fake_redis() if backend.startswith("redis") and not args.redis_url else contextlib.nullcontext()
+            with context:
+                summaries.append(asyncio.run(benchmark(backend, args, workdir)))
+
+    print(f"{args.threads} threads x {args.turns} turns, concurrency {args.concurrency}, "
+          f"{'Redis at ' + args.redis_url if args.redis_url else 'fakeredis'}")
+    print_table(summaries)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summaries, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
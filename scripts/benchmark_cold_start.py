@@ -0,0 +1,142 @@
+"""Benchmark the cold start of each server entry point
+
+Imports each entry point in a fresh interpreter, the way a new Lambda,
+Vercel or Cloud Run instance does, and reports:
+
+- the wall time of the import (median and worst over --runs runs)
+- the packages that take the longest to import, from `python -X importtime`
+- the network connections attempted during the import, which should be none
+- the lazy components (models, chains, tools) built during the import,
+  which should also be none
+
+Entry points:
+    asgi                  agent.graph.asgi
+    serverless:<type>     agent.graph.serverless with SERVER_TYPE=<type> (aws lambda, vercel, gcp)
+    server                agent.graph.server, then the app uvicorn loads from it
+
+Usage:
+    python scripts/benchmark_cold_start.py
+    python scripts/benchmark_cold_start.py --targets asgi "serverless:aws lambda" --runs 10 --top 15
+    python scripts/benchmark_cold_start.py --json cold_start.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# target -> (modules to import, extra environment)
+TARGETS: Dict[str, Tuple[List[str], Dict[str, str]]] = {
+    "asgi": (["agent.graph.asgi"], {}),
+    "serverless:aws lambda": (["agent.graph.serverless"], {"SERVER_TYPE": "aws lambda"}),
+    "serverless:vercel": (["agent.graph.serverless"], {"SERVER_TYPE": "vercel"}),
+    "serverless:gcp": (["agent.graph.serverless"], {"SERVER_TYPE": "gcp"}),
+    "server": (["agent.graph.server", "agent.graph.app"], {"SERVER_TYPE": "local"}),
+}
+
+# Runs in the child interpreter: import the modules, count network attempts, report as JSON
+CHILD = """
+import sys, json, time, importlib
+connections = []
+def audit(event, args):
+    if event in ("socket.connect", "socket.getaddrinfo"):
+        connections.append(f"{event} {args[1] if event == 'socket.connect' else args[0]}")
+sys.addaudithook(audit)
+started = time.perf_counter()
+for module in sys.argv[1:]:
+    importlib.import_module(module)
+seconds = time.perf_counter() - started
+from agent.graph.utils.lazy import get_component_stats
+built = [name for name, stats in get_component_stats().items() if stats["built"]]
+print(json.dumps({"seconds": seconds, "connections": connections, "built": built}))
+"""
+
+
+def run_once(modules: List[str], env: Dict[str, str]) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+    """Import the modules in a fresh interpreter.
+
+    Returns:
+        The child's report, and (package, cumulative microseconds) for each top-level import
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, *modules],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT, **env},
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("\n".join(errors[-20:]))
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    imports = []
+    for line in completed.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented package>"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line[len("import time:"):].split("|")
+        # Top-level imports only; nested ones are included in their parent's cumulative time
+        if not package.startswith("  "):
+            imports.append((package.strip(), int(cumulative)))
+    return report, imports
+
+
+def benchmark(target: str, runs: int, top: int) -> Dict[str, Any]:
+    """Cold-start one entry point `runs` times and summarize it."""
+    modules, env = TARGETS[target]
+    seconds, connections, built, slowest = [], set(), set(), {}
+    for _ in range(runs):
+        report, imports = run_once(modules, env)
+        seconds.append(report["seconds"])
+        connections.update(report["connections"])
+        built.update(report["built"])
+        for package, cumulative in imports:
+            slowest.setdefault(package, []).append(cumulative)
+    ranked = sorted(((statistics.median(values) / 1000, package) for package, values in slowest.items()), reverse=True)
+    return {
+        "target": target,
+        "import_ms_p50": round(statistics.median(seconds) * 1000, 1),
+        "import_ms_max": round(max(seconds) * 1000, 1),
+        "network_calls": sorted(connections),
+        "components_built": sorted(built),
+        "slowest_imports_ms": [[package, round(ms, 1)] for ms, package in ranked[:top]],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of each server entry point")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=TARGETS, help="Entry points to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for target in args.targets:
+        try:
+            result = benchmark(target, args.runs, args.top)
+        except RuntimeError as e:
+            print(f"{target}: import failed\n{e}\n")
+            continue
+        results.append(result)
+        print(f"{target}: {result['import_ms_p50']} ms median, {result['import_ms_max']} ms worst over {args.runs} runs")
+        print(f"  network calls during import: {len(result['network_calls'])}")
+        for call in result["network_calls"]:
+            print(f"    {call}")
+        print(f"  components built during import: {', '.join(result['components_built']) or 'none'}")
+        print("  slowest imports:")
+        for package, ms in result["slowest_imports_ms"]:
+            print(f"    {ms:>8.1f} ms  {package}")
+        print()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
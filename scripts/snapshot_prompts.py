@@ -0,0 +1,90 @@
+"""Snapshot LangSmith prompts for the prompt registry
+
+Pulls each prompt from LangSmith and writes it, with its commit and content
+hash, to the snapshot file agent/graph/utils/prompt_registry.py loads at
+startup. Run it at build time; the server then serves the snapshotted
+prompts without contacting LangSmith. A prompt can be pinned to a commit
+as name:commit. When a pull fails, the prompt's entry from the previous
+snapshot is kept, so a flaky build does not silently drop back to the
+built-in prompt. The script exits non-zero only when a prompt has neither
+a fresh pull nor a previous entry, i.e. the server would fall back to its
+built-in template.
+
+Usage:
+    python scripts/snapshot_prompts.py
+    python scripts/snapshot_prompts.py --prompts generation_prompt regeneration_prompt:0a1b2c3d
+    python scripts/snapshot_prompts.py --out /tmp/snapshot.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import datetime
+from typing import Any, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dotenv import load_dotenv
+from agent.graph.utils.prompt_registry import LANGSMITH_PROMPTS, PROMPT_SNAPSHOT_PATH, serialize_prompt, hash_prompt
+
+# Load environment variables
+load_dotenv()
+
+
+def read_snapshot(path: str) -> Dict[str, Any]:
+    """Read the previous snapshot, or an empty one."""
+    if not os.path.exists(path):
+        return {"prompts": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def pull(client: Any, identifier: str, taken_at: str) -> Dict[str, Any]:
+    """Pull one prompt and build its snapshot entry."""
+    prompt = client.pull_prompt(identifier)
+    serialized = serialize_prompt(prompt)
+    return {
+        "version": (prompt.metadata or {}).get("lc_hub_commit_hash") or taken_at,
+        "hash": hash_prompt(serialized),
+        "source": f"langsmith:{identifier}",
+        "template": serialized,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Snapshot LangSmith prompts for the prompt registry")
+    parser.add_argument("--prompts", nargs="+", default=LANGSMITH_PROMPTS, help="Prompts to pull, as name or name:commit")
+    parser.add_argument("--out", default=PROMPT_SNAPSHOT_PATH, help="Snapshot file to write")
+    args = parser.parse_args()
+
+    from langsmith import Client
+    client = Client(api_key=os.getenv("LANGSMITH_API_KEY"))
+
+    previous = read_snapshot(args.out).get("prompts", {})
+    taken_at = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    prompts, missing = {}, []
+    for identifier in args.prompts:
+        name = identifier.split(":", 1)[0]
+        try:
+            prompts[name] = pull(client, identifier, taken_at)
+            print(f"{name}: {prompts[name]['version']} ({prompts[name]['hash']})")
+        except Exception as e:
+            if name in previous:
+                prompts[name] = previous[name]
+                print(f"{name}: pull failed, keeping {previous[name]['version']}: {e}", file=sys.stderr)
+            else:
+                missing.append(name)
+                print(f"{name}: pull failed, the built-in prompt will be used: {e}", file=sys.stderr)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"snapshot_version": taken_at, "prompts": prompts}, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(prompts)} prompts to {args.out}")
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+#!/bin/bash
+# Start the production server (gunicorn with pre-forked uvicorn workers)
+# and report each worker's memory once they have all booted
+
+# Optional: Override the automatic worker count (one per available CPU)
+# export GUNICORN_WORKERS=4
+
+gunicorn -c agent/graph/gunicorn_conf.py agent.graph.app:app &
+SERVER_PID=$!
+
+# Forward shutdown signals to the gunicorn master
+trap 'kill -TERM $SERVER_PID 2>/dev/null' TERM INT
+
+if [ "${REPORT_WORKER_MEMORY:-true}" = "true" ]; then
+  WORKERS=$(python -c "from agent.graph.gunicorn_conf import workers; print(workers)")
+  python scripts/worker_memory.py --pid "$SERVER_PID" --wait "$WORKERS" &
+fi
+
+# The first wait returns when a signal arrives; the second waits for the graceful shutdown
+wait $SERVER_PID
+trap - TERM INT
+wait $SERVER_PID
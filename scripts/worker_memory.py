@@ -0,0 +1,99 @@
+"""Report the memory of a pre-forked server's workers
+
+For the gunicorn master given by --pid (or found by its command line),
+prints each worker's RSS next to its USS, the memory only that worker
+holds. The gap between the two is what preload_app shares copy-on-write
+between the master and the workers. With --wait, it first waits until the
+expected number of workers have booted, so it can follow the server start
+in a startup script.
+
+Usage:
+    python scripts/worker_memory.py
+    python scripts/worker_memory.py --pid 1234 --json memory.json
+    gunicorn -c agent/graph/gunicorn_conf.py agent.graph.app:app &
+    python scripts/worker_memory.py --pid $! --wait 4
+"""
+
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+MIB = 2 ** 20
+
+
+def find_master() -> Optional[psutil.Process]:
+    """Find the gunicorn master: a gunicorn process whose parent is not gunicorn."""
+    for process in psutil.process_iter(["cmdline"]):
+        cmdline = " ".join(process.info["cmdline"] or [])
+        if "gunicorn" not in cmdline:
+            continue
+        parent = process.parent()
+        if parent is None or "gunicorn" not in " ".join(parent.cmdline()):
+            return process
+    return None
+
+
+def wait_for_workers(master: psutil.Process, workers: int, timeout: float, settle: float) -> None:
+    """Wait until `workers` workers run and the newest has been up for `settle` seconds."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        children = master.children()
+        if len(children) >= workers and time.time() - max(child.create_time() for child in children) >= settle:
+            return
+        time.sleep(0.5)
+    print(f"Timed out waiting for {workers} workers; reporting what is running", file=sys.stderr)
+
+
+def memory_report(master: psutil.Process) -> List[Dict[str, Any]]:
+    """Memory of the master and each of its workers, in MiB."""
+    rows = []
+    for role, process in [("master", master)] + [("worker", child) for child in master.children()]:
+        memory = process.memory_full_info()
+        rows.append({
+            "role": role,
+            "pid": process.pid,
+            "rss_mib": round(memory.rss / MIB, 1),
+            "uss_mib": round(memory.uss / MIB, 1),
+            "pss_mib": round(getattr(memory, "pss", 0) / MIB, 1),
+            "shared_mib": round(getattr(memory, "shared", 0) / MIB, 1),
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report the memory of a pre-forked server's workers")
+    parser.add_argument("--pid", type=int, help="Gunicorn master pid (default: found by command line)")
+    parser.add_argument("--wait", type=int, default=0, help="Wait until this many workers have booted")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for the workers")
+    parser.add_argument("--settle", type=float, default=5, help="Seconds the newest worker must have run")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    master = psutil.Process(args.pid) if args.pid else find_master()
+    if master is None:
+        sys.exit("No gunicorn master found; pass --pid")
+    if args.wait:
+        wait_for_workers(master, args.wait, args.timeout, args.settle)
+
+    rows = memory_report(master)
+    columns = ["role", "pid", "rss_mib", "uss_mib", "pss_mib", "shared_mib"]
+    print("  ".join(f"{column:>10}" for column in columns))
+    for row in rows:
+        print("  ".join(f"{row[column]:>10}" for column in columns))
+    workers = [row for row in rows if row["role"] == "worker"]
+    if workers:
+        # What the workers cost on top of one copy of the shared pages
+        total_pss = sum(row["pss_mib"] for row in rows)
+        print(f"{len(workers)} workers: {sum(row['rss_mib'] for row in workers):.1f} MiB summed RSS, "
+              f"{sum(row['uss_mib'] for row in workers):.1f} MiB private, {total_pss:.1f} MiB total PSS")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()